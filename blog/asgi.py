@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
+
+The AI endpoints stream their completions and wait on the upstream API
+without holding a thread, so serve the site from here, e.g.
+
+    uvicorn blog.asgi:application --workers 4
 """
 
 import os
@@ -14,3 +19,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog.settings')
 
 application = get_asgi_application()
+
+# Post reads are buffered per process and written in batches
+from posts.reads import start_background_flush  # noqa: E402
+
+start_background_flush()
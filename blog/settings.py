@@ -28,6 +28,19 @@ ALLOWED_HOSTS = ['*']
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# AI writing assistant (posts/ai.py). Limits are per worker process.
+AI_BACKEND = os.getenv("AI_BACKEND", "posts.ai.OpenAIBackend")  # "posts.ai.FakeBackend" works offline
+AI_MODEL = "gpt-4o-mini"
+AI_TIMEOUT = 60  # seconds for a whole completion
+AI_QUEUE_TIMEOUT = 5  # seconds to wait for a free slot
+AI_MAX_CONCURRENT = 8
+AI_MAX_PER_USER = 1
+AI_FIX_PARALLEL = 4  # blocks of one document fixed at once in chunked mode (each takes a global slot)
+AI_FIX_TIMEOUT = 180  # seconds for a whole document in chunked mode
+AI_CACHE_ALIAS = "ai"
+AI_CACHE_TIMEOUT = 60 * 60 * 24
+AI_CACHE_MAX_CHARS = 200_000  # longer answers are not cached
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -86,6 +99,47 @@ DATABASES = {
     }
 }
 
+# Cache
+# The default cache holds the render-cache generation and the read ranking,
+# so every worker has to see the same one: redis when REDIS_URL is set, a
+# file cache on the app host otherwise. Tests swap in locmem (blog/testing.py).
+
+if os.getenv("REDIS_URL"):
+    DEFAULT_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv("REDIS_URL"),
+        'KEY_PREFIX': 'life-on-our-trails',
+    }
+else:
+    DEFAULT_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv("CACHE_DIR", str(BASE_DIR / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    }
+
+CACHES = {
+    'default': DEFAULT_CACHE,
+    # AI improve/fix answers by content hash; LRU-evicted past MAX_ENTRIES.
+    # Per process is fine here: a miss only costs a repeat backend call
+    'ai': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'life-on-our-trails-ai',
+        'OPTIONS': {'MAX_ENTRIES': 500},
+    },
+}
+
+TEST_RUNNER = 'blog.testing.LocalCacheRunner'
+
+# Seconds an anonymous page render stays cached (content changes invalidate sooner)
+PAGE_CACHE_TIMEOUT = 600
+
+# Post reads are counted in memory and written every READS_FLUSH_INTERVAL
+# seconds (posts/reads.py); "most read" covers the last READS_RANKING_DAYS,
+# is recomputed on every flush tick and invalidates the cached home page
+# when the featured posts change
+READS_FLUSH_INTERVAL = 10
+READS_RANKING_DAYS = 7
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -123,6 +177,19 @@ VENV_PATH = os.path.dirname(BASE_DIR)
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Resized/WebP/AVIF variants of uploaded images (posts/images.py):
+# "thread" = background pool after commit, "sync" = inline after commit,
+# "off" = only via manage.py process_images
+IMAGE_PROCESSING = "thread"
+IMAGE_WORKERS = 2
+
+# Editor image uploads (posts/uploads.py). Single requests are capped at
+# EDITOR_UPLOAD_MAX_SIZE; bigger images go through the resumable chunked
+# endpoints, staged on local disk until complete.
+EDITOR_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+EDITOR_UPLOAD_CHUNKED_MAX_SIZE = 50 * 1024 * 1024
+EDITOR_UPLOAD_CHUNK_SIZE = 2 * 1024 * 1024
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
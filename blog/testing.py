@@ -0,0 +1,31 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class LocalCacheRunner(DiscoverRunner):
+    """Run tests against per-process locmem caches.
+
+    The configured default cache is shared with running app workers and
+    outlives the test run, so tests would otherwise read each other's (and
+    the dev server's) pages and counters.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'test-default',
+                'OPTIONS': {'MAX_ENTRIES': 2000},
+            },
+            'ai': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'test-ai',
+                'OPTIONS': {'MAX_ENTRIES': 500},
+            },
+        })
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
@@ -57,6 +57,8 @@ urlpatterns = [
 
     # Editor image upload
     path("editor/upload/", post_views.editor_image_upload, name="editor_image_upload"),
+    path("editor/upload/chunked/", post_views.editor_upload_start, name="editor_upload_start"),
+    path("editor/upload/chunked/<uuid:upload_id>/", post_views.editor_upload_chunk, name="editor_upload_chunk"),
 
     path("business/", include(("business.urls", "marketplace"), namespace="marketplace")),
 
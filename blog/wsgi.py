@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog.settings')
 
 application = get_wsgi_application()
+
+# Post reads are buffered per process and written in batches
+from posts.reads import start_background_flush  # noqa: E402
+
+start_background_flush()
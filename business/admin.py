@@ -30,7 +30,7 @@ class BusinessServiceInline(admin.TabularInline):
 
 @admin.register(Business)
 class BusinessAdmin(admin.ModelAdmin):
-    list_display = ("name", "category", "owner", "is_active", "is_approved", "is_locked")
+    list_display = ("name", "category", "owner", "primary_city", "is_active", "is_approved", "is_locked")
     list_filter = ("category", "is_active", "is_approved", "is_locked")
     search_fields = ("name", "owner__username", "tagline")
     inlines = [BusinessLocationInline, BusinessServiceInline]
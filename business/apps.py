@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class BusinessConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'business'
+
+    def ready(self):
+        # Keeps the denormalized city columns in sync with the locations
+        from . import cities  # noqa: F401
+        # Keeps the marketplace search index in sync with businesses and services
+        from . import search  # noqa: F401
@@ -0,0 +1,81 @@
+"""
+City columns denormalized onto Business.
+
+``Business.primary_city`` and ``Business.active_cities`` summarise the active
+locations so listings and city filters never touch ``BusinessLocation``.
+The same refresh keeps one ``BusinessCity`` row per distinct normalized
+city, which marketplace search counts its city facet from. Everything is
+rewritten from the locations whenever one is saved or deleted; views that
+need the location rows themselves use ``Business.objects.with_active_locations()``.
+"""
+
+import re
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Business, BusinessCity, BusinessLocation
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_city(city):
+    """Case- and whitespace-insensitive form a city is stored and searched by."""
+    return _SPACE_RE.sub(" ", (city or "").replace("|", " ")).strip().casefold()
+
+
+def city_filter(city):
+    """
+    Lookup for businesses with an active location whose city starts with
+    ``city`` ("bengal" finds Bengaluru). Normalized cities hold no "|", so
+    a match never spans two.
+    """
+    return {"active_cities__contains": "|" + normalize_city(city)}
+
+
+def city_summary(cities):
+    """(primary_city, active_cities) for active location cities in display order."""
+    normalized = list(dict.fromkeys(normalize_city(city) for city in cities if city))
+    return (cities[0] if cities else ""), ("|" + "|".join(normalized) + "|" if normalized else "")
+
+
+def city_labels(cities):
+    """{normalized city: label} for one business, labelled by the first spelling seen."""
+    labels = {}
+    for city in cities:
+        name = normalize_city(city)
+        if name:
+            labels.setdefault(name, _SPACE_RE.sub(" ", city).strip())
+    return labels
+
+
+def refresh_cities(business_ids):
+    """Rewrite the city columns and rows of ``business_ids`` from their active locations."""
+    cities = {pk: [] for pk in business_ids}
+    rows = (
+        BusinessLocation.objects.filter(business_id__in=cities, is_active=True)
+        .order_by("business_id", "city", "label")
+        .values_list("business_id", "city")
+    )
+    for business_id, city in rows:
+        cities[business_id].append(city)
+
+    for business_id, names in cities.items():
+        primary_city, active_cities = city_summary(names)
+        Business.objects.filter(pk=business_id).update(
+            primary_city=primary_city, active_cities=active_cities
+        )
+
+    BusinessCity.objects.filter(business_id__in=cities).delete()
+    BusinessCity.objects.bulk_create([
+        BusinessCity(business_id=business_id, name=name, label=label)
+        for business_id, names in cities.items()
+        for name, label in city_labels(names).items()
+    ])
+
+
+@receiver(post_save, sender=BusinessLocation)
+@receiver(post_delete, sender=BusinessLocation)
+def location_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_cities([instance.business_id])
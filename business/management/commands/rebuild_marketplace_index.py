@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from business.search import get_backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Drop and rebuild the marketplace search index for publicly visible businesses."
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} businesses ({type(backend).__name__})."
+        ))
@@ -0,0 +1,134 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=80, unique=True)),
+                ('slug', models.SlugField(blank=True, max_length=90, unique=True)),
+                ('icon_class', models.CharField(blank=True, help_text="Optional CSS icon class (e.g. 'fa fa-wrench').", max_length=80)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Business categories',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Business',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=140)),
+                ('slug', models.SlugField(blank=True, max_length=160, unique=True)),
+                ('tagline', models.CharField(blank=True, max_length=180)),
+                ('description', models.TextField(blank=True)),
+                ('cover_image', models.ImageField(blank=True, null=True, upload_to='business/covers/')),
+                ('contact_email', models.EmailField(blank=True, max_length=254)),
+                ('contact_phone', models.CharField(blank=True, max_length=32)),
+                ('website_url', models.URLField(blank=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_approved', models.BooleanField(default=False, help_text='Admin must approve before public listing.')),
+                ('is_locked', models.BooleanField(default=False, help_text='If locked, business is hidden even if approved.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='businesses', to=settings.AUTH_USER_MODEL)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='businesses', to='business.businesscategory')),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BusinessLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(blank=True, help_text="Optional label (e.g. 'Head office', 'Workshop').", max_length=80)),
+                ('address_line1', models.CharField(max_length=200)),
+                ('address_line2', models.CharField(blank=True, max_length=200)),
+                ('city', models.CharField(max_length=80)),
+                ('state', models.CharField(blank=True, max_length=80)),
+                ('pincode', models.CharField(blank=True, max_length=20)),
+                ('country', models.CharField(default='India', max_length=80)),
+                ('google_maps_url', models.URLField(blank=True, help_text="Paste full Google Maps link here. We'll redirect user to this URL.")),
+                ('is_active', models.BooleanField(default=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='locations', to='business.business')),
+            ],
+            options={
+                'ordering': ['city', 'label'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BusinessService',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=140)),
+                ('description', models.TextField(blank=True)),
+                ('base_price', models.DecimalField(blank=True, decimal_places=2, help_text='Optional starting price.', max_digits=10, null=True)),
+                ('unit_label', models.CharField(blank=True, help_text="e.g. 'per day', 'per sq.ft', 'per service'", max_length=40)),
+                ('sort_order', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='services', to='business.business')),
+            ],
+            options={
+                'ordering': ['sort_order', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BusinessWorkImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to='business/work/')),
+                ('caption', models.CharField(blank=True, max_length=160)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='work_images', to='business.business')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuoteRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('full_name', models.CharField(max_length=140)),
+                ('email', models.EmailField(max_length=254)),
+                ('phone', models.CharField(blank=True, max_length=32)),
+                ('additional_details', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('NEW', 'New'), ('IN_REVIEW', 'In review'), ('QUOTED', 'Quoted'), ('ACCEPTED', 'Accepted'), ('REJECTED', 'Rejected'), ('CANCELLED', 'Cancelled')], default='NEW', max_length=20)),
+                ('quoted_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('owner_notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quotes', to='business.business')),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quotes', to=settings.AUTH_USER_MODEL)),
+                ('location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quotes', to='business.businesslocation')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuoteServiceItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('custom_label', models.CharField(blank=True, help_text='If no service linked, use this label.', max_length=160)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('quote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='business.quoterequest')),
+                ('service', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quote_items', to='business.businessservice')),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_approved', True), ('is_locked', False)), fields=['name'], name='business_public_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='businesslocation',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['business', 'city', 'label'], name='location_business_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='businesslocation',
+            index=models.Index(fields=['city'], name='location_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quoterequest',
+            index=models.Index(fields=['business', '-created_at'], name='quote_business_created_idx'),
+        ),
+    ]
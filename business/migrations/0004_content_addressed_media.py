@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:29
+
+import posts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0003_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='business',
+            name='cover_image',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.blob_storage, upload_to='business/covers/'),
+        ),
+        migrations.AlterField(
+            model_name='businessworkimage',
+            name='image',
+            field=models.ImageField(storage=posts.storage.blob_storage, upload_to='business/work/'),
+        ),
+    ]
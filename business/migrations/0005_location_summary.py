@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:43
+
+from django.db import migrations, models
+
+
+def fill_city_columns(apps, schema_editor):
+    from business.cities import city_summary
+
+    Business = apps.get_model("business", "Business")
+    BusinessLocation = apps.get_model("business", "BusinessLocation")
+
+    cities = {}
+    rows = (
+        BusinessLocation.objects.filter(is_active=True)
+        .order_by("business_id", "city", "label")
+        .values_list("business_id", "city")
+    )
+    for business_id, city in rows:
+        cities.setdefault(business_id, []).append(city)
+
+    for business_id, names in cities.items():
+        primary_city, active_cities = city_summary(names)
+        Business.objects.filter(pk=business_id).update(
+            primary_city=primary_city, active_cities=active_cities
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0004_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='active_cities',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='primary_city',
+            field=models.CharField(blank=True, default='', editable=False, max_length=80),
+        ),
+        migrations.RunPython(fill_city_columns, migrations.RunPython.noop),
+    ]
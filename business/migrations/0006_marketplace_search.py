@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_city_rows(apps, schema_editor):
+    from business.cities import city_labels
+
+    BusinessCity = apps.get_model("business", "BusinessCity")
+    BusinessLocation = apps.get_model("business", "BusinessLocation")
+
+    cities = {}
+    rows = (
+        BusinessLocation.objects.filter(is_active=True)
+        .order_by("business_id", "city", "label")
+        .values_list("business_id", "city")
+    )
+    for business_id, city in rows:
+        cities.setdefault(business_id, []).append(city)
+
+    BusinessCity.objects.bulk_create([
+        BusinessCity(business_id=business_id, name=name, label=label)
+        for business_id, names in cities.items()
+        for name, label in city_labels(names).items()
+    ])
+
+
+def create_search_index(apps, schema_editor):
+    from business.search import rebuild_index
+
+    rebuild_index(apps.get_model("business", "Business"), schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from business.search import get_backend
+
+    get_backend(schema_editor.connection).drop()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0005_location_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessCity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=80)),
+                ('label', models.CharField(max_length=80)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cities', to='business.business')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('business', 'name'), name='business_city_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_city_rows, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0006_marketplace_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quoteserviceitem',
+            name='unit_label',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='quoteserviceitem',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='quoteserviceitem',
+            name='custom_label',
+            field=models.CharField(blank=True, help_text='Service name at quote time, or a free-form label.', max_length=160),
+        ),
+    ]
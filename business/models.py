@@ -1,11 +1,29 @@
 from django.conf import settings
 from django.db import models
-from django.utils.text import slugify
+
+from posts import images
+from posts.slugs import UniqueSlugMixin
+from posts.storage import blob_storage
 
 User = settings.AUTH_USER_MODEL
 
 
-class BusinessCategory(models.Model):
+class BusinessCategoryQuerySet(models.QuerySet):
+    def with_listing_counts(self):
+        """Annotate ``listing_count``, the publicly visible businesses, in one grouped query."""
+        return self.annotate(
+            listing_count=models.Count(
+                "businesses",
+                filter=models.Q(
+                    businesses__is_active=True,
+                    businesses__is_approved=True,
+                    businesses__is_locked=False,
+                ),
+            )
+        )
+
+
+class BusinessCategory(UniqueSlugMixin, models.Model):
     name = models.CharField(max_length=80, unique=True)
     slug = models.SlugField(max_length=90, unique=True, blank=True)
     icon_class = models.CharField(
@@ -16,6 +34,10 @@ class BusinessCategory(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = BusinessCategoryQuerySet.as_manager()
+
+    slug_fallback = "category"
+
     class Meta:
         verbose_name_plural = "Business categories"
         ordering = ["name"]
@@ -23,19 +45,24 @@ class BusinessCategory(models.Model):
     def __str__(self):
         return self.name
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base = slugify(self.name)
-            slug = base
-            counter = 1
-            while BusinessCategory.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
 
+class BusinessQuerySet(models.QuerySet):
+    def public(self):
+        """Businesses anyone may see: active, approved and not locked."""
+        return self.filter(is_active=True, is_approved=True, is_locked=False)
+
+    def with_active_locations(self):
+        """Prefetch active locations (display order) into ``active_locations``."""
+        return self.prefetch_related(
+            models.Prefetch(
+                "locations",
+                queryset=BusinessLocation.objects.filter(is_active=True),
+                to_attr="active_locations",
+            )
+        )
 
-class Business(models.Model):
+
+class Business(UniqueSlugMixin, models.Model):
     owner = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -54,9 +81,17 @@ class Business(models.Model):
 
     cover_image = models.ImageField(
         upload_to="business/covers/",
+        storage=blob_storage,
         blank=True,
         null=True,
     )
+    cover_image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    # Denormalized from the active locations by business.cities: the first
+    # city in display order, and every active city normalized and wrapped in
+    # "|" ("|bengaluru|mysuru|") so a city filter needs no join
+    primary_city = models.CharField(max_length=80, blank=True, default="", editable=False)
+    active_cities = models.TextField(blank=True, default="", editable=False)
 
     contact_email = models.EmailField(blank=True)
     contact_phone = models.CharField(max_length=32, blank=True)
@@ -75,23 +110,27 @@ class Business(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = BusinessQuerySet.as_manager()
+
+    slug_fallback = "business"
+
     class Meta:
         ordering = ["name"]
+        indexes = [
+            # Public listing, already in name order. Partial rather than a
+            # composite on the flags: Django emits boolean filters as bare
+            # columns ("is_active" AND ...), which SQLite cannot search an
+            # index on, but it does match them against a partial index.
+            models.Index(
+                fields=["name"],
+                condition=models.Q(is_active=True, is_approved=True, is_locked=False),
+                name="business_public_name_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base = slugify(self.name)
-            slug = base
-            counter = 1
-            while Business.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
-
     def is_visible_public(self) -> bool:
         """
         Used by views: only show to public when business is on, approved and not locked.
@@ -99,9 +138,8 @@ class Business(models.Model):
         return self.is_active and self.is_approved and not self.is_locked
 
     @property
-    def primary_city(self):
-        loc = self.locations.filter(is_active=True).first()
-        return loc.city if loc else ""
+    def cover_versions(self):
+        return images.versions_for(self, "cover_image")
 
 
 class BusinessLocation(models.Model):
@@ -132,11 +170,39 @@ class BusinessLocation(models.Model):
 
     class Meta:
         ordering = ["city", "label"]
+        indexes = [
+            # Active locations of a business in display order (see Business.Meta)
+            models.Index(
+                fields=["business", "city", "label"],
+                condition=models.Q(is_active=True),
+                name="location_business_active_idx",
+            ),
+            models.Index(fields=["city"], name="location_city_idx"),
+        ]
 
     def __str__(self):
         return f"{self.business.name} - {self.city}"
 
 
+class BusinessCity(models.Model):
+    """
+    One row per distinct active city of a business, maintained by
+    business.cities. Serves the city facet counts of marketplace search.
+    """
+
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name="cities")
+    name = models.CharField(max_length=80)  # normalized
+    label = models.CharField(max_length=80)  # as first entered
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["business", "name"], name="business_city_uniq"),
+        ]
+
+    def __str__(self):
+        return self.label
+
+
 class BusinessService(models.Model):
     business = models.ForeignKey(
         Business,
@@ -174,7 +240,8 @@ class BusinessWorkImage(models.Model):
         on_delete=models.CASCADE,
         related_name="work_images",
     )
-    image = models.ImageField(upload_to="business/work/")
+    image = models.ImageField(upload_to="business/work/", storage=blob_storage)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     caption = models.CharField(max_length=160, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -184,6 +251,14 @@ class BusinessWorkImage(models.Model):
     def __str__(self):
         return f"{self.business.name} work image"
 
+    @property
+    def image_versions(self):
+        return images.versions_for(self, "image")
+
+
+images.register(Business, "cover_image", "cover_image_variants")
+images.register(BusinessWorkImage, "image", "image_variants")
+
 
 class QuoteRequest(models.Model):
     class Status(models.TextChoices):
@@ -237,6 +312,9 @@ class QuoteRequest(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["business", "-created_at"], name="quote_business_created_idx"),
+        ]
 
     def __str__(self):
         return f"Quote {self.id} for {self.business.name}"
@@ -258,15 +336,33 @@ class QuoteServiceItem(models.Model):
     custom_label = models.CharField(
         max_length=160,
         blank=True,
-        help_text="If no service linked, use this label.",
+        help_text="Service name at quote time, or a free-form label.",
     )
     quantity = models.PositiveIntegerField(default=1)
 
+    # Snapshot of the service's price when the quote was requested, so later
+    # price edits don't rewrite what the customer asked about
+    unit_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        blank=True,
+        null=True,
+    )
+    unit_label = models.CharField(max_length=40, blank=True)
+
     def __str__(self):
         return f"{self.quantity} x {self.display_name} (Quote {self.quote_id})"
 
     @property
     def display_name(self):
+        if self.custom_label:
+            return self.custom_label
         if self.service:
             return self.service.name
-        return self.custom_label or "Item"
+        return "Item"
+
+    @property
+    def line_total(self):
+        if self.unit_price is None:
+            return None
+        return self.unit_price * self.quantity
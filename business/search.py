@@ -0,0 +1,430 @@
+"""
+Marketplace search.
+
+Each publicly visible business is mirrored into a search document (name,
+active service names, tagline, category name and description). SQLite keeps
+it in an FTS5 table and PostgreSQL in a weighted ``tsvector`` table, behind
+the same small backend interface as ``posts.search``.
+
+``search_businesses`` counts the category and city facets over every match
+with one grouped query each (cities from ``BusinessCity``) and returns one
+cursor page: keyed on (score, id) for a text query, where the visibility,
+category and city filters run inside the ranked query itself, and on
+(name, id) when browsing. Nothing is capped, so every match is reachable.
+"""
+
+from django.db import connection as default_connection
+from django.db.models import Count, Min, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from posts.pagination import CursorPage, KeysetPaginator, decode_cursor, encode_cursor
+from posts.search import query_tokens, sqlite_has_fts5
+
+from .cities import city_filter
+from .models import Business, BusinessCategory, BusinessCity, BusinessService
+
+FTS_TABLE = "business_business_fts"
+PG_TABLE = "business_business_search"
+
+PAGE_SIZE = 12
+CITY_FACETS = 12
+
+PUBLIC = {"is_active": True, "is_approved": True, "is_locked": False}
+
+
+# ==========================
+# DOCUMENT HELPERS
+# ==========================
+
+def build_document(business) -> dict:
+    """Collect the searchable columns for a business (works with historical models)."""
+    return {
+        "name": business.name or "",
+        "services": " ".join(
+            business.services.filter(is_active=True).values_list("name", flat=True)
+        ),
+        "tagline": business.tagline or "",
+        "category": business.category.name if business.category_id else "",
+        "description": business.description or "",
+    }
+
+
+def is_public(business) -> bool:
+    return all(getattr(business, field) == value for field, value in PUBLIC.items())
+
+
+# ==========================
+# BACKENDS
+# ==========================
+
+class SearchBackend:
+    """
+    Plain icontains fallback for databases without a full-text engine.
+
+    ``matching`` is a ``pk__in`` right-hand side selecting every business
+    matching the query. ``search`` returns up to ``limit`` ``(business_id,
+    score)`` rows of ``within`` (a Business queryset) that match, ordered by
+    score ascending (lower is better), then id descending; ``after`` is the
+    ``(score, id)`` of the last row of the previous page.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create(self):
+        pass
+
+    def drop(self):
+        pass
+
+    def upsert(self, business_id, document):
+        pass
+
+    def delete(self, business_ids):
+        pass
+
+    def _within_sql(self, within):
+        """SQL and params selecting the ids of ``within`` on this connection."""
+        query = within.values("pk").order_by().query
+        return query.get_compiler(connection=self.connection).as_sql()
+
+    def _filtered(self, query):
+        qs = Business.objects.using(self.connection.alias).filter(**PUBLIC)
+        for token in query_tokens(query):
+            # A subquery rather than a join, so no row is repeated per service
+            services = BusinessService.objects.filter(is_active=True, name__icontains=token)
+            qs = qs.filter(
+                Q(name__icontains=token)
+                | Q(tagline__icontains=token)
+                | Q(description__icontains=token)
+                | Q(pk__in=services.values("business_id"))
+            )
+        return qs
+
+    def matching(self, query):
+        return self._filtered(query).values("pk")
+
+    def search(self, query, limit, after=None, within=None):
+        if not query_tokens(query):
+            return []
+
+        qs = self._filtered(query)
+        if within is not None:
+            qs = qs.filter(pk__in=within.values("pk"))
+        if after:
+            qs = qs.filter(id__lt=after[1])
+        # No relevance here: every row scores 0, so this is newest (highest id) first.
+        return [(pk, 0.0) for pk in qs.order_by("-id").values_list("id", flat=True)[:limit]]
+
+
+class SQLiteFTSBackend(SearchBackend):
+    # bm25 column weights: name, services, tagline, category, description
+    WEIGHTS = (10.0, 6.0, 4.0, 3.0, 1.0)
+
+    def create(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                "USING fts5(name, services, tagline, category, description, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def drop(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def upsert(self, business_id, document):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [business_id])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, services, tagline, category, description) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [business_id, document["name"], document["services"], document["tagline"],
+                 document["category"], document["description"]],
+            )
+
+    def delete(self, business_ids):
+        business_ids = list(business_ids)
+        if not business_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(business_ids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", business_ids
+            )
+
+    def _match(self, query):
+        # Every token must match, each as a prefix ("carp" finds "carpenter").
+        return " ".join(f'"{token}"*' for token in query_tokens(query))
+
+    def matching(self, query):
+        return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [self._match(query)])
+
+    def search(self, query, limit, after=None, within=None):
+        if not query_tokens(query):
+            return []
+
+        score = f"bm25({FTS_TABLE}, {', '.join(str(w) for w in self.WEIGHTS)})"
+        params = [self._match(query)]
+        where = ""
+        if within is not None:
+            sql, within_params = self._within_sql(within)
+            where += f"AND rowid IN ({sql}) "
+            params += list(within_params)
+        if after:
+            where += f"AND ({score} > %s OR ({score} = %s AND rowid < %s)) "
+            params += [after[0], after[0], after[1]]
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, {score} AS score FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s {where}"
+                "ORDER BY score, rowid DESC LIMIT %s",
+                params + [limit],
+            )
+            return cursor.fetchall()
+
+
+class PostgresSearchBackend(SearchBackend):
+    CONFIG = "english"
+    # setweight() class per document column, in build_document() order
+    WEIGHTS = (("name", "A"), ("services", "B"), ("tagline", "C"),
+               ("category", "C"), ("description", "D"))
+
+    def create(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {PG_TABLE} ("
+                "business_id bigint PRIMARY KEY "
+                "REFERENCES business_business (id) ON DELETE CASCADE, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_document_idx "
+                f"ON {PG_TABLE} USING GIN (document)"
+            )
+
+    def drop(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {PG_TABLE}")
+
+    def upsert(self, business_id, document):
+        vector = " || ".join(
+            f"setweight(to_tsvector('{self.CONFIG}', %s), '{weight}')"
+            for _, weight in self.WEIGHTS
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {PG_TABLE} (business_id, document) VALUES (%s, {vector}) "
+                "ON CONFLICT (business_id) DO UPDATE SET document = EXCLUDED.document",
+                [business_id, *(document[column] for column, _ in self.WEIGHTS)],
+            )
+
+    def delete(self, business_ids):
+        business_ids = list(business_ids)
+        if not business_ids:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {PG_TABLE} WHERE business_id = ANY(%s)", [business_ids])
+
+    def _tsquery(self, query):
+        return " & ".join(f"{token}:*" for token in query_tokens(query))
+
+    def matching(self, query):
+        return RawSQL(
+            f"SELECT business_id FROM {PG_TABLE} "
+            f"WHERE document @@ to_tsquery('{self.CONFIG}', %s)",
+            [self._tsquery(query)],
+        )
+
+    def search(self, query, limit, after=None, within=None):
+        if not query_tokens(query):
+            return []
+
+        # Negated so that, as with bm25, lower scores rank first.
+        score = "(-ts_rank_cd(document, q))"
+        params = [self._tsquery(query)]
+        where = ""
+        if within is not None:
+            sql, within_params = self._within_sql(within)
+            where += f"AND business_id IN ({sql}) "
+            params += list(within_params)
+        if after:
+            where += f"AND ({score} > %s OR ({score} = %s AND business_id < %s)) "
+            params += [after[0], after[0], after[1]]
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT business_id, {score} AS score "
+                f"FROM {PG_TABLE}, to_tsquery('{self.CONFIG}', %s) q "
+                f"WHERE document @@ q {where}"
+                "ORDER BY score, business_id DESC LIMIT %s",
+                params + [limit],
+            )
+            return cursor.fetchall()
+
+
+def get_backend(connection=None) -> SearchBackend:
+    connection = connection or default_connection
+    if connection.vendor == "sqlite" and sqlite_has_fts5(connection):
+        return SQLiteFTSBackend(connection)
+    if connection.vendor == "postgresql":
+        return PostgresSearchBackend(connection)
+    return SearchBackend(connection)
+
+
+# ==========================
+# INDEXING
+# ==========================
+
+def index_businesses(businesses, connection=None):
+    """(Re)index the given businesses; any not publicly visible is dropped from the index."""
+    backend = get_backend(connection)
+    hidden = []
+    for business in businesses:
+        if is_public(business):
+            backend.upsert(business.pk, build_document(business))
+        else:
+            hidden.append(business.pk)
+    backend.delete(hidden)
+
+
+def index_business_ids(business_ids, connection=None):
+    business_ids = list(business_ids)
+    if not business_ids:
+        return
+    found = list(Business.objects.filter(pk__in=business_ids).select_related("category"))
+    index_businesses(found, connection)
+    get_backend(connection).delete(set(business_ids) - {b.pk for b in found})
+
+
+def rebuild_index(business_model=None, connection=None):
+    """Recreate the index from scratch. Used by the migration and the management command."""
+    business_model = business_model or Business
+    backend = get_backend(connection)
+    backend.drop()
+    backend.create()
+
+    public = (
+        business_model.objects.using(backend.connection.alias)
+        .filter(**PUBLIC)
+        .select_related("category")
+    )
+    count = 0
+    for business in public.iterator():
+        backend.upsert(business.pk, build_document(business))
+        count += 1
+    return count
+
+
+# ==========================
+# SEARCH
+# ==========================
+
+class MarketplaceResults:
+    """One page of businesses plus the facets of everything that matched."""
+
+    def __init__(self, page, categories, cities, category=""):
+        self.page = page
+        # [{"slug", "name", "count"}], counted regardless of the chosen category
+        self.categories = categories
+        # [{"name", "label", "count"}], counted regardless of the chosen city
+        self.cities = cities
+        self.total = sum(
+            facet["count"] for facet in categories
+            if not category or facet["slug"] == category
+        )
+
+
+def _ranked_page(backend, query, scope, per_page, cursor):
+    after = decode_cursor(cursor)
+    try:
+        after = (float(after[0]), int(after[1])) if after and len(after) == 2 else None
+    except (TypeError, ValueError):
+        after = None
+
+    rows = backend.search(query, limit=per_page + 1, after=after, within=scope)
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    found = scope.select_related("category").in_bulk([pk for pk, _ in rows])
+    next_cursor = encode_cursor([rows[-1][1], rows[-1][0]]) if has_next else None
+    return CursorPage(
+        [found[pk] for pk, _ in rows if pk in found],
+        next_cursor=next_cursor,
+        cursor=cursor if after is not None else None,
+    )
+
+
+def search_businesses(query="", city="", category="", cursor=None, per_page=PAGE_SIZE, facets=True):
+    """
+    Public businesses matching ``query`` (best first; all of them by name when
+    empty), in ``city`` and the category with slug ``category``. Without
+    ``facets`` only the page is fetched (the facets come back empty).
+    """
+    public = Business.objects.public()
+    in_city = public.filter(**city_filter(city)) if city else public
+    in_category = public.filter(category__slug=category) if category else public
+    scope = in_city.filter(category__slug=category) if category else in_city
+
+    backend = get_backend() if query_tokens(query) else None
+    if backend is not None:
+        matched = backend.matching(query)
+        in_city = in_city.filter(pk__in=matched)
+        in_category = in_category.filter(pk__in=matched)
+
+    # Each facet is counted without its own filter, so it lists the alternatives
+    categories, cities = [], []
+    if facets:
+        categories = [
+            {"slug": row["category__slug"], "name": row["category__name"], "count": row["count"]}
+            for row in in_city.order_by()
+            .values("category__slug", "category__name")
+            .annotate(count=Count("id"))
+            .order_by("-count", "category__name")
+        ]
+        cities = list(
+            BusinessCity.objects.filter(business__in=in_category.values("pk"))
+            .values("name")
+            .annotate(label=Min("label"), count=Count("id"))
+            .order_by("-count", "name")[:CITY_FACETS]
+        )
+
+    if backend is None:
+        paginator = KeysetPaginator(
+            scope.select_related("category"), ordering=("name", "id"), per_page=per_page
+        )
+        page = paginator.page(cursor)
+    else:
+        page = _ranked_page(backend, query, scope, per_page, cursor)
+    return MarketplaceResults(page, categories, cities, category=category)
+
+
+# ==========================
+# SYNC SIGNALS
+# ==========================
+
+@receiver(post_save, sender=Business)
+def reindex_saved_business(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_businesses([instance])
+
+
+@receiver(post_delete, sender=Business)
+def unindex_deleted_business(sender, instance, **kwargs):
+    get_backend().delete([instance.pk])
+
+
+@receiver(post_save, sender=BusinessService)
+@receiver(post_delete, sender=BusinessService)
+def reindex_service_business(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_business_ids([instance.business_id])
+
+
+@receiver(post_save, sender=BusinessCategory)
+def reindex_category_businesses(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        index_business_ids(instance.businesses.filter(**PUBLIC).values_list("id", flat=True))
@@ -1,3 +1,310 @@
+import re
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import (
+    Business,
+    BusinessCategory,
+    BusinessCity,
+    BusinessLocation,
+    BusinessService,
+    QuoteRequest,
+    QuoteServiceItem,
+)
+from .search import PUBLIC, index_businesses, search_businesses
+
+
+def make_business(owner, category, name, cities=(), **fields):
+    fields = {"is_approved": True, **fields}
+    business = Business.objects.create(owner=owner, category=category, name=name, **fields)
+    for city in cities:
+        BusinessLocation.objects.create(business=business, address_line1="1 Main Road", city=city)
+    return business
+
+
+class BusinessCityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("owner", password="pass")
+        cls.category = BusinessCategory.objects.create(name="Carpentry")
+
+    def test_city_columns_follow_active_locations(self):
+        business = make_business(self.owner, self.category, "Woodworks", ["Mysuru", " new  Delhi"])
+        business.refresh_from_db()
+        self.assertEqual(business.primary_city, " new  Delhi")
+        self.assertEqual(business.active_cities, "|new delhi|mysuru|")
+
+        business.locations.filter(city=" new  Delhi").get().delete()
+        mysuru = business.locations.get()
+        mysuru.is_active = False
+        mysuru.save()
+        business.refresh_from_db()
+        self.assertEqual((business.primary_city, business.active_cities), ("", ""))
+
+    def test_listing_filters_by_city_without_joins(self):
+        make_business(self.owner, self.category, "Woodworks", ["Bengaluru"])
+        make_business(self.owner, self.category, "Chairs", ["Mysuru"])
+        response = self.client.get(reverse("marketplace:business_list"), {"city": "BENGAL"})
+        self.assertEqual([b.name for b in response.context["businesses"]], ["Woodworks"])
+
+    def test_listing_query_count_does_not_grow_with_businesses(self):
+        for i in range(3):
+            make_business(self.owner, self.category, f"Shop {i}", ["Pune", "Goa"])
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse("marketplace:business_list"))
+
+        for i in range(3, 12):
+            make_business(self.owner, self.category, f"Shop {i}", ["Pune"])
+        with self.assertNumQueries(len(small.captured_queries)):
+            response = self.client.get(reverse("marketplace:business_list"))
+        self.assertContains(response, "Pune")
+
+    def test_prefetch_fallback_loads_location_rows(self):
+        make_business(self.owner, self.category, "Woodworks", ["Pune", "Goa"])
+        with self.assertNumQueries(2):
+            business = Business.objects.with_active_locations().get()
+            self.assertEqual([loc.city for loc in business.active_locations], ["Goa", "Pune"])
+
+
+class CategoryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("owner", password="pass")
+        cls.category = BusinessCategory.objects.create(name="Carpentry")
+
+    def test_counts_only_publicly_visible_businesses(self):
+        make_business(self.owner, self.category, "Open")
+        make_business(self.owner, self.category, "Pending", is_approved=False)
+        make_business(self.owner, self.category, "Locked", is_locked=True)
+        make_business(self.owner, self.category, "Closed", is_active=False)
+        empty = BusinessCategory.objects.create(name="Painting")
+
+        counts = dict(BusinessCategory.objects.with_listing_counts().values_list("pk", "listing_count"))
+        self.assertEqual(counts, {self.category.pk: 1, empty.pk: 0})
+
+    def test_sidebar_costs_the_same_for_any_number_of_categories(self):
+        make_business(self.owner, self.category, "Open")
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(reverse("marketplace:business_list"))
+
+        for name in ("Painting", "Plumbing", "Masonry", "Gardening"):
+            make_business(self.owner, BusinessCategory.objects.create(name=name), f"{name} Co")
+        with self.assertNumQueries(len(one.captured_queries)):
+            response = self.client.get(reverse("marketplace:business_list"))
+        self.assertContains(response, "1 listing\n", count=5)
+
+
+class MarketplaceSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("owner", password="pass")
+        cls.carpentry = BusinessCategory.objects.create(name="Carpentry")
+        cls.painting = BusinessCategory.objects.create(name="Painting")
+
+    def names(self, results):
+        return [b.name for b in results.page]
+
+    def test_ranks_name_matches_first_and_lists_each_business_once(self):
+        described = make_business(self.owner, self.painting, "Brush Co", description="Also does woodwork.")
+        named = make_business(self.owner, self.carpentry, "Woodwork Studio")
+        for service in ("Woodwork repair", "Woodwork polish"):
+            BusinessService.objects.create(business=described, name=service)
+
+        self.assertEqual(self.names(search_businesses("woodwork")), ["Woodwork Studio", "Brush Co"])
+        self.assertEqual(self.names(search_businesses("polish")), ["Brush Co"])
+        self.assertEqual(self.names(search_businesses("wood studio")), [named.name])
+
+    def test_index_follows_visibility_and_services(self):
+        business = make_business(self.owner, self.carpentry, "Oak & Co", is_approved=False)
+        service = BusinessService.objects.create(business=business, name="Cabinets")
+        self.assertEqual(self.names(search_businesses("cabinets")), [])
+
+        business.is_approved = True
+        business.save()
+        self.assertEqual(self.names(search_businesses("cabinets")), ["Oak & Co"])
+
+        service.name = "Wardrobes"
+        service.save()
+        self.assertEqual(self.names(search_businesses("cabinets")), [])
+        self.assertEqual(self.names(search_businesses("wardrobes")), ["Oak & Co"])
+
+        self.carpentry.name = "Joinery"
+        self.carpentry.save()
+        self.assertEqual(self.names(search_businesses("joinery")), ["Oak & Co"])
+
+        business.delete()
+        self.assertEqual(self.names(search_businesses("wardrobes")), [])
+
+    def test_facets_count_the_matches_without_their_own_filter(self):
+        make_business(self.owner, self.carpentry, "Wood One", ["Pune", "Goa"])
+        make_business(self.owner, self.carpentry, "Wood Two", ["pune"])
+        make_business(self.owner, self.painting, "Wood Paint", ["Goa"])
+        make_business(self.owner, self.painting, "Brushes", ["Goa"])
+
+        results = search_businesses("wood", city="goa", category="carpentry")
+        self.assertEqual(self.names(results), ["Wood One"])
+        self.assertEqual(results.total, 1)
+        self.assertEqual(
+            [(f["slug"], f["count"]) for f in results.categories],
+            [("carpentry", 1), ("painting", 1)],
+        )
+        self.assertEqual([(f["name"], f["count"]) for f in results.cities], [("pune", 2), ("goa", 1)])
+        self.assertEqual(BusinessCity.objects.filter(name="pune").count(), 2)
+
+    def test_filters_and_facets_see_every_match(self):
+        Business.objects.bulk_create([
+            Business(owner=self.owner, category=self.carpentry, name=f"Shop {i}", slug=f"shop-{i}", **PUBLIC)
+            for i in range(520)
+        ])
+        # The oldest shop ranks last; it alone is in Goa and in Painting
+        oldest = Business.objects.order_by("id").first()
+        Business.objects.filter(pk=oldest.pk).update(category=self.painting, active_cities="|goa|")
+        BusinessCity.objects.create(business=oldest, name="goa", label="Goa")
+        index_businesses(Business.objects.select_related("category"))
+
+        results = search_businesses("shop", city="goa")
+        self.assertEqual(self.names(results), [oldest.name])
+        self.assertEqual(results.total, 1)
+        results = search_businesses("shop", per_page=5)
+        self.assertEqual(results.total, 520)
+        self.assertEqual(
+            [(f["slug"], f["count"]) for f in results.categories], [("carpentry", 519), ("painting", 1)]
+        )
+        self.assertEqual(self.names(search_businesses("shop", category="painting")), [oldest.name])
+
+    def test_pages_visit_every_match_once(self):
+        for i in range(7):
+            make_business(self.owner, self.carpentry, f"Shop {i}", description="carpenter")
+
+        for query in ("carpenter", ""):
+            seen, cursor = [], None
+            while True:
+                page = search_businesses(query, per_page=3, cursor=cursor).page
+                seen += [b.name for b in page]
+                if not page.has_next():
+                    break
+                cursor = page.next_cursor
+            self.assertEqual(sorted(seen), [f"Shop {i}" for i in range(7)])
+            self.assertEqual(len(seen), 7)
+
+        garbled = search_businesses("carpenter", per_page=3, cursor="not-a-cursor").page
+        self.assertFalse(garbled.has_previous())
+        self.assertEqual(len(garbled), 3)
+
+    def test_listing_shows_facets_and_pager(self):
+        for i in range(14):
+            make_business(self.owner, self.carpentry, f"Shop {i:02}", ["Pune"])
+        response = self.client.get(reverse("marketplace:business_list"), {"q": "shop"})
+        self.assertContains(response, "14 results")
+        self.assertContains(response, "More businesses")
+        self.assertEqual(len(response.context["businesses"]), 12)
+
+        response = self.client.get(reverse("marketplace:business_list"), {"q": "shop", "city": "mumbai"})
+        self.assertContains(response, "0 results")
+
+
+class ListingPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("owner", password="pass")
+        cls.category = BusinessCategory.objects.create(name="Carpentry")
+        for i in range(30):
+            make_business(cls.owner, cls.category, f"Shop {i:02}")
+
+    def test_listing_renders_one_page_in_name_order(self):
+        response = self.client.get(reverse("marketplace:business_list"))
+        page = response.context["businesses"]
+        self.assertEqual([b.name for b in page], [f"Shop {i:02}" for i in range(12)])
+        self.assertContains(response, reverse("marketplace:business_cards"))
+        self.assertContains(response, 'loading="lazy"')
+
+        response = self.client.get(reverse("marketplace:business_list"), {"cursor": page.next_cursor})
+        self.assertEqual(response.context["businesses"][0].name, "Shop 12")
+        self.assertNotContains(response, "Featured Services")
+
+    def test_cards_endpoint_walks_the_remaining_pages(self):
+        seen, cursor = [], None
+        while True:
+            params = {"q": "shop", "category": "carpentry"}
+            if cursor:
+                params["cursor"] = cursor
+            with self.assertNumQueries(2):
+                data = self.client.get(reverse("marketplace:business_cards"), params).json()
+            seen += re.findall(r"<h3>(Shop \d+)</h3>", data["html"])
+            if not data["has_next"]:
+                break
+            cursor = data["next_cursor"]
+        self.assertEqual(sorted(seen), [f"Shop {i:02}" for i in range(30)])
+
+
+class QuoteRequestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("owner", password="pass")
+        cls.customer = User.objects.create_user("customer", password="pass")
+        cls.business = make_business(cls.owner, BusinessCategory.objects.create(name="Carpentry"), "Woodworks")
+
+    def setUp(self):
+        self.client.force_login(self.customer)
+
+    def fill_cart(self, count):
+        cart = []
+        for i in range(count):
+            service = BusinessService.objects.create(
+                business=self.business, name=f"Job {i}", base_price=Decimal("10.50") + i, unit_label="per day"
+            )
+            cart.append({"service_id": service.id, "name": service.name, "quantity": 2})
+        session = self.client.session
+        session[f"quote_cart_{self.business.id}"] = cart
+        session.save()
+        return cart
+
+    def submit(self):
+        return self.client.post(
+            reverse("marketplace:request_quote", args=[self.business.id]),
+            {"full_name": "Asha", "email": "asha@example.com"},
+        )
+
+    def test_items_snapshot_the_services_in_a_fixed_number_of_queries(self):
+        self.fill_cart(2)
+        with CaptureQueriesContext(connection) as two:
+            self.submit()
+        QuoteRequest.objects.all().delete()
+
+        cart = self.fill_cart(6) + [{"service_id": 9999, "name": "Removed job", "quantity": "x"}]
+        session = self.client.session
+        session[f"quote_cart_{self.business.id}"] = cart
+        session.save()
+        with self.assertNumQueries(len(two.captured_queries)):
+            response = self.submit()
+
+        quote = QuoteRequest.objects.get()
+        self.assertRedirects(response, reverse("marketplace:quote_thank_you", args=[quote.id]))
+        items = list(quote.items.order_by("id"))
+        self.assertEqual(len(items), 7)
+        self.assertEqual(
+            (items[1].custom_label, items[1].unit_price, items[1].unit_label, items[1].line_total),
+            ("Job 1", Decimal("11.50"), "per day", Decimal("23.00")),
+        )
+        self.assertEqual(
+            (items[-1].service, items[-1].display_name, items[-1].quantity, items[-1].line_total),
+            (None, "Removed job", 1, None),
+        )
+
+        BusinessService.objects.filter(business=self.business).update(base_price=99, name="Renamed")
+        self.assertEqual(QuoteServiceItem.objects.get(pk=items[1].pk).display_name, "Job 1")
+        self.assertNotIn(f"quote_cart_{self.business.id}", self.client.session)
 
-# Create your tests here.
+    def test_failed_submission_leaves_no_partial_quote(self):
+        self.fill_cart(3)
+        with mock.patch.object(QuoteServiceItem.objects, "bulk_create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.submit()
+        self.assertFalse(QuoteRequest.objects.exists())
+        self.assertEqual(len(self.client.session[f"quote_cart_{self.business.id}"]), 3)
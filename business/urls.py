@@ -5,6 +5,7 @@ app_name = "marketplace"
 
 urlpatterns = [
     path("", views.business_list, name="business_list"),
+    path("cards/", views.business_cards, name="business_cards"),
 
     path("signup/", views.business_signup, name="business_signup"),
     path("partner/register/", views.partner_register, name="partner_register"),
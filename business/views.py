@@ -2,8 +2,10 @@ from django.contrib import messages
 from django.contrib.auth import login as auth_login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
 
 from .forms import BusinessRegistrationForm, BusinessLocationForm, QuoteRequestForm
@@ -15,6 +17,7 @@ from .models import (
     QuoteRequest,
     QuoteServiceItem,
 )
+from .search import search_businesses
 
 
 # ------------- internal helpers -----------------
@@ -37,39 +40,79 @@ def _clear_cart(request, business_id: int):
     request.session.modified = True
 
 
-# ------------- public listing & detail -----------
+def _cart_int(item, key, default=None):
+    try:
+        return int(item.get(key, default))
+    except (TypeError, ValueError):
+        return default
 
-def business_list(request):
-    q = request.GET.get("q", "").strip()
-    city = request.GET.get("city", "").strip()
-    category_slug = request.GET.get("category", "").strip()
 
-    queryset = Business.objects.filter(is_active=True, is_approved=True, is_locked=False)
+@transaction.atomic
+def _save_quote(quote, cart):
+    """
+    Save ``quote`` with one item per cart line, all or nothing. Services are
+    looked up in one query and their name and price copied onto the items.
+    """
+    services = BusinessService.objects.filter(business=quote.business).in_bulk(
+        {_cart_int(item, "service_id") for item in cart} - {None}
+    )
 
-    if q:
-        queryset = queryset.filter(
-            Q(name__icontains=q)
-            | Q(tagline__icontains=q)
-            | Q(description__icontains=q)
-            | Q(services__name__icontains=q)
-        ).distinct()
+    quote.save()
+
+    items = []
+    for item in cart:
+        service = services.get(_cart_int(item, "service_id"))
+        items.append(QuoteServiceItem(
+            quote=quote,
+            service=service,
+            custom_label=service.name if service else item.get("name", ""),
+            quantity=max(1, _cart_int(item, "quantity", 1)),
+            unit_price=service.base_price if service else None,
+            unit_label=service.unit_label if service else "",
+        ))
+    QuoteServiceItem.objects.bulk_create(items)
 
-    if city:
-        queryset = queryset.filter(locations__city__icontains=city).distinct()
 
-    active_category = None
-    if category_slug:
-        queryset = queryset.filter(category__slug=category_slug)
-        active_category = category_slug
+# ------------- public listing & detail -----------
+
+def _listing_filters(request):
+    return (
+        request.GET.get("q", "").strip(),
+        request.GET.get("city", "").strip(),
+        request.GET.get("category", "").strip(),
+    )
 
-    categories = BusinessCategory.objects.filter(is_active=True).order_by("name")
 
-    return render(request, "marketplace/business_list.html", {
-        "businesses": queryset,
+def business_list(request):
+    q, city, category_slug = _listing_filters(request)
+
+    # Ranked index matches (or every listing by name, keyset on (name, id)),
+    # with facets; further pages come from business_cards or ?cursor=
+    results = search_businesses(
+        q, city=city, category=category_slug, cursor=request.GET.get("cursor")
+    )
+    categories = BusinessCategory.objects.filter(is_active=True).with_listing_counts().order_by("name")
+
+    return render(request, "business_list.html", {
+        "businesses": results.page,
+        "results": results,
         "categories": categories,
         "q": q,
         "city": city,
-        "active_category": active_category,
+        "active_category": category_slug or None,
+    })
+
+
+def business_cards(request):
+    """Infinite scroll: the next page of listing cards as an HTML fragment in JSON."""
+    q, city, category_slug = _listing_filters(request)
+    page = search_businesses(
+        q, city=city, category=category_slug, cursor=request.GET.get("cursor"), facets=False
+    ).page
+    return JsonResponse({
+        "html": render_to_string("components/business_cards.html", {"businesses": page}),
+        "has_next": page.has_next(),
+        "next_cursor": page.next_cursor,
     })
 
 
@@ -86,7 +129,7 @@ def business_detail(request, category_slug, slug):
                 request.user.is_authenticated
                 and (request.user.is_superuser or request.user == business.owner)
         ):
-            return render(request, "marketplace/business_locked.html", {
+            return render(request, "business_locked.html", {
                 "business": business,
             })
 
@@ -96,7 +139,7 @@ def business_detail(request, category_slug, slug):
 
     cart = _get_cart(request, business.id)
 
-    return render(request, "marketplace/business_detail.html", {
+    return render(request, "business_detail.html", {
         "business": business,
         "services": services,
         "locations": locations,
@@ -199,23 +242,7 @@ def request_quote(request, business_id):
                     pass
 
             quote.status = QuoteRequest.Status.NEW
-            quote.save()
-
-            for item in cart:
-                service_id = item.get("service_id")
-                quantity = item.get("quantity", 1)
-
-                service = BusinessService.objects.filter(
-                    id=service_id,
-                    business=business
-                ).first()
-
-                QuoteServiceItem.objects.create(
-                    quote=quote,
-                    service=service,
-                    custom_label=item.get("name", ""),
-                    quantity=quantity,
-                )
+            _save_quote(quote, cart)
 
             _clear_cart(request, business.id)
             messages.success(request, "Your quote request has been submitted.")
@@ -229,7 +256,7 @@ def request_quote(request, business_id):
 
     locations = business.locations.filter(is_active=True)
 
-    return render(request, "marketplace/request_quote.html", {
+    return render(request, "request_quote.html", {
         "business": business,
         "form": form,
         "cart_items": cart,
@@ -249,7 +276,7 @@ def quote_thank_you(request, quote_id):
         messages.error(request, "You are not allowed to view this quote.")
         return redirect("marketplace:business_list")
 
-    return render(request, "marketplace/quote_thank_you.html", {
+    return render(request, "quote_thank_you.html", {
         "quote": quote,
     })
 
@@ -284,7 +311,7 @@ def business_signup(request):
         messages.success(request, "Business account created. Please register your business details.")
         return redirect("marketplace:partner_register")
 
-    return render(request, "marketplace/business_signup.html")
+    return render(request, "business_signup.html")
 
 
 @login_required
@@ -316,7 +343,7 @@ def partner_register(request):
         b_form = BusinessRegistrationForm()
         l_form = BusinessLocationForm()
 
-    return render(request, "marketplace/partner_register.html", {
+    return render(request, "partner_register.html", {
         "b_form": b_form,
         "l_form": l_form,
     })
@@ -329,7 +356,7 @@ def owner_dashboard(request):
         business__owner=request.user
     ).select_related("business").order_by("-created_at")[:50]
 
-    return render(request, "marketplace/owner_dashboard.html", {
+    return render(request, "owner_dashboard.html", {
         "businesses": businesses,
         "quotes": quotes,
     })
@@ -362,6 +389,6 @@ def owner_quote_detail(request, quote_id):
         messages.success(request, "Quote updated successfully.")
         return redirect("marketplace:owner_quote_detail", quote_id=quote.id)
 
-    return render(request, "marketplace/owner_quote_detail.html", {
+    return render(request, "owner_quote_detail.html", {
         "quote": quote,
     })
@@ -0,0 +1,506 @@
+"""
+AI writing assistant used by the editor (write / improve / fix).
+
+Completions are streamed from a pluggable backend (``settings.AI_BACKEND``)
+and relayed to the browser as server-sent events, so a slow completion
+never holds a worker thread when the site runs under ``blog/asgi.py``.
+Each worker process caps the streams in flight: ``AI_MAX_PER_USER`` per
+author (extra requests are refused at once) and ``AI_MAX_CONCURRENT`` in
+total (extra requests wait up to ``AI_QUEUE_TIMEOUT`` for a slot). Slots
+are taken and released inside the event stream itself, so a response that
+is never read holds nothing.
+
+Improve/fix results are cached by content hash in the ``AI_CACHE_ALIAS``
+cache (TTL ``AI_CACHE_TIMEOUT``; size and LRU eviction are that cache's
+``MAX_ENTRIES``), and identical requests already in flight in this process
+wait for the running completion instead of starting their own.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils.html import strip_tags
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+PROMPTS = {
+    "write": (
+        "Write a detailed, engaging blog article section in HTML. "
+        "Use <p>, <h2>, <h3>, and <ul>/<li> where helpful. "
+        "Do NOT include <html> or <body> tags.\n\n"
+        "Title: {text}"
+    ),
+    "improve": (
+        "Improve the following blog post HTML for clarity, structure, and tone. "
+        "Keep the same structure and return HTML only (no <html> or <body> tags):\n\n"
+        "{text}"
+    ),
+    "fix": (
+        "Fix grammar, punctuation, and typos in the following blog HTML. "
+        "Do NOT change meaning. Return HTML only (no <html> or <body> tags):\n\n"
+        "{text}"
+    ),
+}
+
+
+# Endpoints whose answer depends only on the submitted content
+CACHED_KINDS = ("improve", "fix")
+STATS_KEY = "posts:ai:stats:{}"
+STATS = ("hit", "miss", "coalesced")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class AIBusy(Exception):
+    """No slot came free for this request."""
+
+
+def ai_setting(name, default):
+    return getattr(settings, f"AI_{name}", default)
+
+
+def build_prompt(kind, text):
+    return PROMPTS[kind].format(text=text)
+
+
+# ==========================
+# BACKENDS
+# ==========================
+
+class OpenAIBackend:
+    """Streams chat completions from the OpenAI API."""
+
+    def __init__(self):
+        import openai
+
+        openai.api_key = os.getenv("OPENAI_API_KEY") or getattr(settings, "OPENAI_API_KEY", None)
+        self.openai = openai
+
+    async def stream(self, prompt, model):
+        response = await self.openai.ChatCompletion.acreate(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+        )
+        async for chunk in response:
+            delta = chunk["choices"][0]["delta"].get("content")
+            if delta:
+                yield delta
+
+
+class FakeBackend:
+    """
+    Offline stand-in: streams back the text after the prompt's instructions,
+    a few words at a time. ``AI_FAKE_DELAY`` adds a pause between chunks.
+    """
+
+    async def stream(self, prompt, model):
+        text = prompt.split("\n\n", 1)[-1]
+        words = text.split(" ")
+        delay = ai_setting("FAKE_DELAY", 0)
+        for i in range(0, len(words), 4):
+            if delay:
+                await asyncio.sleep(delay)
+            yield " ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "")
+
+
+_backends = {}
+
+
+def get_backend():
+    path = ai_setting("BACKEND", "posts.ai.OpenAIBackend")
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+# ==========================
+# CONCURRENCY LIMITS
+# ==========================
+
+class ConcurrencyLimiter:
+    """
+    Per-user and global caps on the AI streams this process is serving.
+
+    The counts sit behind a thread lock rather than in asyncio primitives,
+    so they hold across event loops and threads alike: ``AI_MAX_CONCURRENT``
+    is one budget for the whole process whether it runs under ASGI or WSGI.
+    Waiting for a global slot polls, so a cancelled waiter never keeps one.
+    """
+
+    POLL_INTERVAL = 0.02
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._per_user = defaultdict(int)
+        self._active = 0
+
+    def check(self, user_id):
+        """Raise ``AIBusy`` if ``user_id`` already has all their streams running."""
+        with self._lock:
+            if self._per_user[user_id] >= ai_setting("MAX_PER_USER", 1):
+                raise AIBusy("You already have an AI request running.")
+
+    @contextmanager
+    def user(self, user_id):
+        """Hold one of ``user_id``'s streams (refused at once when none is left)."""
+        with self._lock:
+            if self._per_user[user_id] >= ai_setting("MAX_PER_USER", 1):
+                raise AIBusy("You already have an AI request running.")
+            self._per_user[user_id] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._per_user[user_id] -= 1
+                if not self._per_user[user_id]:
+                    del self._per_user[user_id]
+
+    def _try_acquire(self):
+        with self._lock:
+            if self._active < ai_setting("MAX_CONCURRENT", 8):
+                self._active += 1
+                return True
+            return False
+
+    @asynccontextmanager
+    async def backend_call(self):
+        """Hold one of the process's backend calls, waiting up to ``AI_QUEUE_TIMEOUT``."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + ai_setting("QUEUE_TIMEOUT", 5)
+        while not self._try_acquire():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise AIBusy("The AI assistant is busy, please try again shortly.")
+            await asyncio.sleep(min(self.POLL_INTERVAL, remaining))
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, user_id):
+        with self.user(user_id):
+            async with self.backend_call():
+                yield
+
+
+limiter = ConcurrencyLimiter()
+
+
+# ==========================
+# EVENT HELPERS
+# ==========================
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def with_deadline(chunks, timeout):
+    """Re-yield ``chunks``, raising ``asyncio.TimeoutError`` once ``timeout`` seconds are spent."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    iterator = chunks.__aiter__()
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError
+        try:
+            yield await asyncio.wait_for(iterator.__anext__(), remaining)
+        except StopAsyncIteration:
+            return
+
+
+# ==========================
+# RESPONSE CACHE
+# ==========================
+
+def ai_cache():
+    return caches[ai_setting("CACHE_ALIAS", "default")]
+
+
+def response_key(kind, text):
+    normalized = _WHITESPACE_RE.sub(" ", text).strip()
+    digest = hashlib.sha256(normalized.encode()).hexdigest()
+    return f"posts:ai:{kind}:{ai_setting('MODEL', 'gpt-4o-mini')}:{digest}"
+
+
+async def count(stat):
+    key = STATS_KEY.format(stat)
+    if not await cache.aadd(key, 1, timeout=None):
+        try:
+            await cache.aincr(key)
+        except ValueError:
+            pass
+
+
+def cache_stats():
+    """Hit/miss/coalesced counters, shared by every process using the cache."""
+    values = cache.get_many([STATS_KEY.format(stat) for stat in STATS])
+    return {stat: values.get(STATS_KEY.format(stat), 0) for stat in STATS}
+
+
+async def store_result(key, result):
+    if len(result) <= ai_setting("CACHE_MAX_CHARS", 200_000):
+        await ai_cache().aset(key, result, ai_setting("CACHE_TIMEOUT", 86400))
+
+
+# Completions running in this process, by response key. A future belongs to
+# the event loop of the stream that claimed it, so only that loop follows it.
+_inflight = {}
+
+
+# ==========================
+# STREAMING
+# ==========================
+
+async def open_stream(kind, text, user_id, chunked=False):
+    """
+    SSE event stream answering one request: from the cache, by following an
+    identical completion already running, or from the backend. Raises
+    ``AIBusy`` up front when the user already has a stream running; the
+    limiter slot itself is taken by the stream once it is read. ``chunked``
+    fixes the document block by block instead, see ``chunked_fix_events``.
+    """
+    limiter.check(user_id)
+    if chunked and kind == "fix":
+        return chunked_fix_events(text, user_id)
+
+    key = response_key(kind, text) if kind in CACHED_KINDS else None
+    if key:
+        cached = await ai_cache().aget(key)
+        if cached is not None:
+            await count("hit")
+            return replay_events(cached)
+    return completion_events(kind, text, user_id, key)
+
+
+async def replay_events(result):
+    yield sse("delta", {"text": result})
+    yield sse("done", {})
+
+
+def running_completion(key):
+    """The in-flight future for ``key``, if one is running on this event loop."""
+    future = _inflight.get(key)
+    if future is not None and future.get_loop() is asyncio.get_running_loop():
+        return future
+    return None
+
+
+async def wait_for_completion(future):
+    """
+    The result of a completion another request is running, or None if it
+    failed. Bounded by how long that request may queue and then stream.
+    """
+    timeout = ai_setting("QUEUE_TIMEOUT", 5) + ai_setting("TIMEOUT", 60)
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+    except asyncio.TimeoutError:
+        return None
+
+
+async def follow_events(future):
+    result = await wait_for_completion(future)
+    if result is None:
+        yield sse("error", {"error": "The AI assistant failed, please try again."})
+        return
+    async for event in replay_events(result):
+        yield event
+
+
+async def completion_events(kind, text, user_id, key=None):
+    """
+    SSE stream for one completion: ``delta`` events carrying text, then
+    ``done`` or ``error``. The limiter slot is held while the stream runs and
+    released when it ends or the client goes away.
+
+    With a ``key``, an identical completion already running is followed
+    instead. Otherwise this stream claims the key once it starts (its
+    ``finally`` always settles the claim) and hands the answer to followers
+    and the cache.
+    """
+    if key:
+        running = running_completion(key)
+        if running is not None:
+            await count("coalesced")
+            async for event in follow_events(running):
+                yield event
+            return
+
+    future = None
+    if key:
+        # Claimed before the next await, so identical requests follow this one
+        future = _inflight[key] = asyncio.get_running_loop().create_future()
+    parts = []
+    try:
+        if key:
+            await count("miss")
+        async with limiter.slot(user_id):
+            chunks = get_backend().stream(build_prompt(kind, text), ai_setting("MODEL", "gpt-4o-mini"))
+            async for delta in with_deadline(chunks, ai_setting("TIMEOUT", 60)):
+                parts.append(delta)
+                yield sse("delta", {"text": delta})
+        if key:
+            result = "".join(parts)
+            await store_result(key, result)
+            future.set_result(result)
+        yield sse("done", {})
+    except AIBusy as exc:
+        yield sse("error", {"error": str(exc), "busy": True})
+    except asyncio.TimeoutError:
+        yield sse("error", {"error": "The AI assistant took too long to answer."})
+    except Exception:
+        logger.exception("AI %s completion failed", kind)
+        yield sse("error", {"error": "The AI assistant failed, please try again."})
+    finally:
+        if future is not None:
+            if not future.done():
+                # Failed or abandoned; let the followers give up too
+                future.set_result(None)
+            if _inflight.get(key) is future:
+                del _inflight[key]
+
+
+# ==========================
+# CHUNKED FIX
+# ==========================
+
+VOID_ELEMENTS = {"area", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"}
+
+
+class _TopLevelSplitter(HTMLParser):
+    """Records the offsets where each top-level element of a fragment ends."""
+
+    def __init__(self, html):
+        super().__init__(convert_charrefs=False)
+        self.html = html
+        self.line_starts = [0] + [m.end() for m in re.finditer("\n", html)]
+        self.depth = 0
+        self.cuts = []
+
+    def _offset(self):
+        line, column = self.getpos()
+        return self.line_starts[line - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in VOID_ELEMENTS:
+            self.depth += 1
+        elif self.depth == 0:
+            self.cuts.append(self._offset() + len(self.get_starttag_text()))
+
+    def handle_startendtag(self, tag, attrs):
+        if self.depth == 0:
+            self.cuts.append(self._offset() + len(self.get_starttag_text()))
+
+    def handle_endtag(self, tag):
+        if self.depth == 0:
+            return
+        self.depth -= 1
+        if self.depth == 0:
+            self.cuts.append(self.html.index(">", self._offset()) + 1)
+
+
+def split_blocks(html):
+    """
+    Split editor HTML into its top-level blocks (``<p>``, ``<h2>``, ``<ul>``...)
+    so that ``"".join(split_blocks(html)) == html``. Text between blocks stays
+    with the block after it; unbalanced markup ends up in one chunk.
+    """
+    splitter = _TopLevelSplitter(html)
+    splitter.feed(html)
+    splitter.close()
+
+    chunks, start = [], 0
+    for end in splitter.cuts + [len(html)]:
+        if end > start:
+            chunks.append(html[start:end])
+            start = end
+    return chunks
+
+
+async def complete_text(kind, text):
+    """The whole answer for one prompt: cached, shared with a running identical call, or fresh."""
+    key = response_key(kind, text)
+    cached = await ai_cache().aget(key)
+    if cached is not None:
+        await count("hit")
+        return cached
+    running = running_completion(key)
+    if running is not None:
+        await count("coalesced")
+        result = await wait_for_completion(running)
+        if result is None:
+            raise RuntimeError("The completion this request was waiting for failed.")
+        return result
+
+    future = _inflight[key] = asyncio.get_running_loop().create_future()
+    try:
+        await count("miss")
+        # Every backend call counts against AI_MAX_CONCURRENT, blocks included
+        async with limiter.backend_call():
+            chunks = get_backend().stream(build_prompt(kind, text), ai_setting("MODEL", "gpt-4o-mini"))
+            result = "".join([delta async for delta in with_deadline(chunks, ai_setting("TIMEOUT", 60))])
+        await store_result(key, result)
+        future.set_result(result)
+        return result
+    finally:
+        if not future.done():
+            future.set_result(None)
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+async def chunked_fix_events(text, user_id):
+    """
+    Fix a document block by block: up to ``AI_FIX_PARALLEL`` blocks go to the
+    backend at once, each taking its own global limiter slot, and each answer
+    is cached under the block's own hash (so an edited post only pays for the
+    blocks that changed). The fixed blocks are streamed back in document
+    order as they become available, within ``AI_FIX_TIMEOUT`` for the whole
+    document.
+    """
+    parallel = asyncio.Semaphore(ai_setting("FIX_PARALLEL", 4))
+
+    async def fix(block):
+        if not strip_tags(block).strip():
+            # Nothing to proofread (spacing, <p><br></p>, images)
+            return block
+        async with parallel:
+            return await complete_text("fix", block)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + ai_setting("FIX_TIMEOUT", 180)
+    tasks = []
+    try:
+        with limiter.user(user_id):
+            tasks = [asyncio.ensure_future(fix(block)) for block in split_blocks(text)]
+            for task in tasks:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                yield sse("delta", {"text": await asyncio.wait_for(task, remaining)})
+        yield sse("done", {})
+    except AIBusy as exc:
+        yield sse("error", {"error": str(exc), "busy": True})
+    except asyncio.TimeoutError:
+        yield sse("error", {"error": "The AI assistant took too long to answer."})
+    except Exception:
+        logger.exception("AI chunked fix failed")
+        yield sse("error", {"error": "The AI assistant failed, please try again."})
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        # Signal receivers that keep derived data (search index, render cache,
+        # tag suggestions, media references, user stats) in sync
+        from . import cache, media, search, stats, suggest  # noqa: F401
@@ -0,0 +1,133 @@
+"""
+Server-side render cache for the public blog pages.
+
+Anonymous GET renders are stored in the configured Django cache under a
+key that includes a global "generation" number. Any change to the content a
+page can show (posts, comments, categories, tags, profiles) bumps the
+generation, which orphans every stored render at once; stale entries then
+age out on their own timeout. This works the same on one process (locmem)
+and across app nodes (a shared memcached/redis cache).
+"""
+
+import hashlib
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from .models import Category, Comment, Post, Profile, Tag
+
+GENERATION_KEY = "posts:render:generation"
+CSRF_PLACEHOLDER = "__CACHED_CSRF_TOKEN__"
+
+_CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def page_cache_timeout():
+    return getattr(settings, "PAGE_CACHE_TIMEOUT", 600)
+
+
+# ==========================
+# GENERATION (INVALIDATION)
+# ==========================
+
+def current_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Seed from the clock so an evicted counter can never come back at a
+        # value whose renders are still sitting in the cache.
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY, 0)
+    return generation
+
+
+def invalidate_pages(**kwargs):
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        current_generation()
+
+
+for _model in (Post, Comment, Category, Tag, Profile):
+    post_save.connect(invalidate_pages, sender=_model, dispatch_uid=f"render-cache-save-{_model.__name__}")
+    post_delete.connect(invalidate_pages, sender=_model, dispatch_uid=f"render-cache-delete-{_model.__name__}")
+m2m_changed.connect(invalidate_pages, sender=Post.tags.through, dispatch_uid="render-cache-post-tags")
+
+
+def _key(kind, parts):
+    digest = hashlib.md5("|".join(str(p) for p in parts).encode()).hexdigest()
+    return f"posts:render:{kind}:{current_generation()}:{digest}"
+
+
+# ==========================
+# FRAGMENTS
+# ==========================
+
+def cached_fragment(name, parts, build):
+    """
+    Return ``build()`` cached under (name, *parts) for the current generation.
+    Only for output that is the same for every visitor.
+    """
+    key = _key(name, parts)
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, page_cache_timeout())
+    return value
+
+
+# ==========================
+# WHOLE PAGES (ANONYMOUS ONLY)
+# ==========================
+
+def _can_use_cache(request):
+    return (
+        request.method == "GET"
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def cache_anonymous_page(view_func):
+    """
+    Serve anonymous GET requests from the render cache. Logged-in users, POSTs
+    and requests carrying flash messages always hit the view.
+
+    A cached page's CSRF token is swapped for a placeholder on the way in and
+    for the visitor's own token on the way out, so forms keep working.
+    """
+
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if not _can_use_cache(request):
+            return view_func(request, *args, **kwargs)
+
+        key = _key("page", [
+            request.get_full_path(),
+            request.headers.get("x-requested-with", ""),
+        ])
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            if CSRF_PLACEHOLDER in content:
+                content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+            response = HttpResponse(content, content_type=content_type)
+            response["X-Render-Cache"] = "hit"
+            return response
+
+        response = view_func(request, *args, **kwargs)
+
+        if response.status_code == 200 and not response.streaming and not response.cookies:
+            content = response.content.decode(response.charset)
+            content = _CSRF_INPUT_RE.sub(rf"\g<1>{CSRF_PLACEHOLDER}\g<2>", content)
+            cache.set(key, (content, response["Content-Type"]), page_cache_timeout())
+            response["X-Render-Cache"] = "miss"
+        return response
+
+    return _wrapped_view
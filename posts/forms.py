@@ -1,5 +1,3 @@
-import re
-
 from django import forms
 from django.forms import inlineformset_factory
 from django.utils import timezone
@@ -8,6 +6,8 @@ from tinymce.widgets import TinyMCE
 from .models import (
     Post,
     Comment,
+    count_words,
+    html_to_text,
     Profile,
     ProfileEducation,
     ProfileExperience,
@@ -101,15 +101,6 @@ class PostCreateForm(forms.ModelForm):
             ),
         }
 
-    # helpers
-    def _plain_text(self, html):
-        return re.sub(r"<[^>]+>", " ", html or "").strip()
-
-    def _word_count(self, html):
-        if not html:
-            return 0
-        return len(re.findall(r"\w+", self._plain_text(html)))
-
     def clean_publish_at(self):
         publish_at = self.cleaned_data.get("publish_at")
         status = self.cleaned_data.get("status")
@@ -132,7 +123,7 @@ class PostCreateForm(forms.ModelForm):
         tags_raw = (cleaned.get("tags") or "").strip()
         new_tags = (cleaned.get("new_tags") or "").strip()
 
-        words = self._word_count(content_html)
+        words = count_words(html_to_text(content_html))
 
         if words == 0:
             self.add_error("content", "Please write some content before saving.")
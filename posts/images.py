@@ -0,0 +1,276 @@
+"""
+Responsive image variants for uploaded pictures.
+
+Every registered image field gets a companion JSONField describing resized
+variants (``thumb``, ``card``, ``hero``...) of the current file, each encoded
+as the original's format (JPEG, or PNG when there is transparency) plus
+WebP/AVIF where Pillow supports them. Saving a model whose image changed
+schedules the work after the transaction commits, on a small thread pool by
+default (``IMAGE_PROCESSING``), so uploads never wait on the encoder.
+``manage.py process_images`` backfills anything that was missed.
+
+Variant files live next to the upload under ``variants/<name>/`` and are
+reused when they already exist: a source file never changes once stored,
+so rows sharing a file share its variants. A field's default (the stock
+avatar) and files missing from storage are left alone.
+"""
+
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# Longest edge allowed for each variant, in CSS pixels of its widest use
+WIDTHS = {
+    "avatar": 160,
+    "thumb": 320,
+    "card": 640,
+    "hero": 1600,
+}
+
+MODERN_FORMATS = (
+    # (mime, extension, Pillow format, save options)
+    ("image/avif", "avif", "AVIF", {"quality": 55}),
+    ("image/webp", "webp", "WEBP", {"quality": 80, "method": 4}),
+)
+
+
+@dataclass(frozen=True)
+class ImageFieldSpec:
+    model: type
+    field: str
+    variants_field: str
+    sizes: tuple
+
+    def source_name(self, name):
+        """The file variants should be made from: ``name``, or None for none."""
+        field = self.model._meta.get_field(self.field)
+        if not name or name == field.default or not field.storage.exists(name):
+            return None
+        return name
+
+
+_registry = {}
+
+
+def register(model, field, variants_field, sizes=("thumb", "card", "hero")):
+    """Generate ``sizes`` for ``model.field`` and keep them in ``model.variants_field``."""
+    spec = ImageFieldSpec(model, field, variants_field, tuple(sizes))
+    _registry.setdefault(model, []).append(spec)
+    post_save.connect(_image_saved, sender=model, dispatch_uid=f"image-variants-{model._meta.label}")
+    return spec
+
+
+def registered_specs():
+    return [spec for specs in _registry.values() for spec in specs]
+
+
+# ==========================
+# TEMPLATE HELPERS
+# ==========================
+
+class ImageVersions:
+    """
+    Read-side view of a variants field. ``versions.card`` is the card URL (the
+    original's URL until processing has run), ``versions.srcset`` lists every
+    fallback-format variant and ``versions.sources`` the modern formats.
+    """
+
+    def __init__(self, file, data):
+        self.file = file
+        self.data = data or {}
+        if self.data.get("source") != (file.name if file else None):
+            # Stale: the image changed and the new variants are not ready yet
+            self.data = {}
+
+    @property
+    def url(self):
+        return self.file.url if self.file else ""
+
+    @property
+    def ready(self):
+        return bool(self.data.get("variants"))
+
+    def _variants(self):
+        variants = self.data.get("variants", {})
+        return sorted(variants.items(), key=lambda item: item[1]["width"])
+
+    def __getitem__(self, name):
+        if name not in WIDTHS:
+            raise KeyError(name)
+        variant = self.data.get("variants", {}).get(name)
+        if not variant:
+            return self.url
+        return self.file.storage.url(variant["files"][self.data["fallback"]])
+
+    def srcset_for(self, mime):
+        seen, entries = set(), []
+        for _, variant in self._variants():
+            path = variant["files"].get(mime)
+            if path and path not in seen:
+                seen.add(path)
+                entries.append(f"{self.file.storage.url(path)} {variant['width']}w")
+        return ", ".join(entries)
+
+    @property
+    def srcset(self):
+        return self.srcset_for(self.data["fallback"]) if self.ready else ""
+
+    @property
+    def sources(self):
+        """(mime, srcset) for each modern format, best first."""
+        if not self.ready:
+            return []
+        return [
+            (mime, self.srcset_for(mime)) for mime, *_ in MODERN_FORMATS
+            if mime != self.data["fallback"] and self.srcset_for(mime)
+        ]
+
+
+def versions_for(instance, field):
+    spec = next(s for s in _registry[type(instance)] if s.field == field)
+    return ImageVersions(getattr(instance, field), getattr(instance, spec.variants_field))
+
+
+# ==========================
+# RENDERING
+# ==========================
+
+def supported_formats():
+    return [f for f in MODERN_FORMATS if features.check(f[1])]
+
+
+def _encode(image, pil_format, options):
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def render_variants(file, sizes):
+    """Write the variants of ``file`` (reusing existing ones) and describe them."""
+    # Variants keep their own names even when the source lives in blob storage
+    storage = getattr(file.storage, "derived", file.storage)
+    directory, filename = posixpath.split(file.name)
+    base = posixpath.join(directory, "variants", posixpath.splitext(filename)[0])
+
+    with file.open("rb"):
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+
+    if image.mode in ("RGBA", "LA", "P") and (image.mode != "P" or "transparency" in image.info):
+        image = image.convert("RGBA")
+        fallback = ("image/png", "png", "PNG", {"optimize": True})
+    else:
+        image = image.convert("RGB")
+        fallback = ("image/jpeg", "jpg", "JPEG", {"quality": 82, "optimize": True, "progressive": True})
+
+    variants, by_width = {}, {}
+    for name in sizes:
+        width = min(WIDTHS[name], image.width)
+        if width not in by_width:
+            height = max(round(image.height * width / image.width), 1)
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            files = {}
+            for mime, ext, pil_format, options in [fallback] + supported_formats():
+                path = f"{base}/{width}w.{ext}"
+                if not storage.exists(path):
+                    path = storage.save(path, _encode(resized, pil_format, options))
+                files[mime] = path
+            by_width[width] = files
+        variants[name] = {"width": width, "files": by_width[width]}
+
+    return {
+        "source": file.name,
+        "width": image.width,
+        "height": image.height,
+        "fallback": fallback[0],
+        "variants": variants,
+    }
+
+
+def process_image(spec, pk):
+    """Bring one row's variants up to date with its current image."""
+    manager = spec.model._default_manager
+    instance = manager.filter(pk=pk).first()
+    if instance is None:
+        return False
+
+    file = getattr(instance, spec.field)
+    current = getattr(instance, spec.variants_field) or {}
+    source = spec.source_name(file.name)
+    if current.get("source") == source:
+        return False
+
+    data = {}
+    if source:
+        try:
+            data = render_variants(file, spec.sizes)
+        except (OSError, Image.DecompressionBombError, SyntaxError, ValueError):
+            logger.exception("Could not process %s %s.%s", spec.model._meta.label, pk, spec.field)
+            # Remember the failure so it is not retried on every save
+            data = {"source": file.name, "error": True}
+
+    # Only write if the image has not been replaced in the meantime
+    updated = manager.filter(pk=pk, **{spec.field: file.name or ""}).update(**{spec.variants_field: data})
+    if updated:
+        from .cache import invalidate_pages
+
+        invalidate_pages()
+    return bool(updated)
+
+
+# ==========================
+# SCHEDULING
+# ==========================
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "IMAGE_WORKERS", 2),
+                thread_name_prefix="image-variants",
+            )
+    return _executor
+
+
+def _process_in_thread(spec, pk):
+    try:
+        process_image(spec, pk)
+    except Exception:
+        logger.exception("Image processing failed for %s %s", spec.model._meta.label, pk)
+    finally:
+        connection.close()
+
+
+def schedule(spec, pk):
+    mode = getattr(settings, "IMAGE_PROCESSING", "thread")
+    if mode == "sync":
+        transaction.on_commit(lambda: process_image(spec, pk))
+    elif mode == "thread":
+        transaction.on_commit(lambda: _get_executor().submit(_process_in_thread, spec, pk))
+    # "off": left to manage.py process_images
+
+
+def _image_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    for spec in _registry.get(sender, ()):
+        file = getattr(instance, spec.field)
+        current = getattr(instance, spec.variants_field) or {}
+        if current.get("source") != spec.source_name(file.name):
+            schedule(spec, instance.pk)
@@ -0,0 +1,23 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts.ai import cache_stats
+
+
+class Command(BaseCommand):
+    help = "Print the AI response cache hit/miss/coalesced counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true", help="One JSON object, for monitoring scrapers.")
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        lookups = stats["hit"] + stats["miss"] + stats["coalesced"]
+        stats["hit_rate"] = round((stats["hit"] + stats["coalesced"]) / lookups, 3) if lookups else 0.0
+
+        if options["json"]:
+            self.stdout.write(json.dumps(stats))
+            return
+        for name, value in stats.items():
+            self.stdout.write(f"{name:<10} {value}")
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = "Fill plain_text, excerpt, word_count and read_time for existing posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every post, not only those whose plain text is missing.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        fields = ["plain_text", "excerpt", "word_count", "read_time"]
+
+        queryset = Post.objects.only("id", "content").order_by("id")
+        if not options["all"]:
+            # Only rows with content but no derived text. An image-only post
+            # stays in this set, and recomputing it is a harmless no-op.
+            queryset = queryset.filter(plain_text="").exclude(content="")
+
+        last_id = 0
+        total = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+
+            for post in batch:
+                post.refresh_text_fields()
+            # bulk_update bypasses save(), so the search index and updated_at stay untouched
+            Post.objects.bulk_update(batch, fields)
+
+            last_id = batch[-1].id
+            total += len(batch)
+            self.stdout.write(f"  ... {total} posts")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {total} posts."))
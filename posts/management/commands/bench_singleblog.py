@@ -0,0 +1,99 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Post
+
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark singleblog query count and latency against a throwaway test "
+        "database filled with N posts. The real database is never touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=100_000)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--comments-per-post", type=int, default=3)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES=NO_CACHE, DEBUG=False):
+                self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run(self, options):
+        total = options["posts"]
+        author = User.objects.create_user("bench-author", password="bench")
+
+        self.stdout.write(f"Creating {total} posts ...")
+        started = time.perf_counter()
+        now = timezone.now()
+        statuses = ("published", "published", "published", "draft")
+        batch = []
+        for i in range(total):
+            batch.append(Post(
+                title=f"Benchmark post {i}",
+                slug=f"benchmark-post-{i}",
+                content=f"<p>Benchmark body {i}</p>" * 20,
+                excerpt=f"Benchmark body {i}",
+                author=author,
+                status=statuses[i % len(statuses)],
+            ))
+            if len(batch) == 5000:
+                Post.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Post.objects.bulk_create(batch)
+
+        # auto_now_add ignores explicit values, so spread created_at afterwards;
+        # pairs of posts share a timestamp to exercise the id tie-breaker.
+        ids = list(Post.objects.values_list("id", flat=True))
+        for start in range(0, len(ids), 5000):
+            chunk = [
+                Post(id=pk, created_at=now - timedelta(seconds=pk - pk % 2))
+                for pk in ids[start:start + 5000]
+            ]
+            Post.objects.bulk_update(chunk, ["created_at"])
+
+        sample_ids = list(
+            Post.objects.filter(status="published").order_by("?").values_list("id", flat=True)[:options["requests"]]
+        )
+        Comment.objects.bulk_create([
+            Comment(post_id=pk, name="Bench", email="bench@example.com", body="Nice", active=True)
+            for pk in sample_ids
+            for _ in range(options["comments_per_post"])
+        ])
+        self.stdout.write(f"  fixture ready in {time.perf_counter() - started:.1f}s")
+
+        client = Client()
+        timings, query_counts = [], []
+        for pk in sample_ids:
+            url = reverse("singleblog", args=[pk])
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.status_code
+            query_counts.append(len(queries))
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(self.style.SUCCESS(
+            f"singleblog over {len(timings)} requests on {total} posts: "
+            f"queries min/max {min(query_counts)}/{max(query_counts)}, "
+            f"latency p50 {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms"
+        ))
@@ -0,0 +1,89 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from business.models import Business, BusinessLocation, QuoteRequest
+from posts.models import Comment, Post
+
+# SQLite: "SCAN posts_post" is a full table scan; "SCAN ... USING INDEX" walks an
+# index in order and is fine. PostgreSQL reports full scans as "Seq Scan on".
+FULL_SCAN_PATTERNS = (
+    re.compile(r"\bSCAN (?!.*\bUSING\b)(?!CONSTANT ROW)"),
+    re.compile(r"\bSeq Scan on\b"),
+)
+TEMP_SORT_PATTERN = re.compile(r"USE TEMP B-TREE FOR ORDER BY")
+
+
+def hot_queries():
+    """(view, description, queryset) for the queries our busiest views run."""
+    published = Post.objects.published()
+    return [
+        ("index / allblogs", "latest published posts",
+         published.cards().order_by("-created_at", "-id")[:9]),
+        ("allblogs", "published posts in a category",
+         published.filter(category__name__iexact="travel").order_by("-created_at", "-id")[:9]),
+        ("singleblog", "post with neighbour ids",
+         Post.objects.with_neighbor_ids().filter(pk=1)),
+        ("singleblog", "active comments of a post",
+         Comment.objects.filter(post_id=1, active=True).order_by("created_on")),
+        ("profile / dashboard", "posts of an author",
+         Post.objects.filter(author_id=1).order_by("-created_at")),
+        ("profile / dashboard", "comments of a user",
+         Comment.objects.filter(user_id=1).order_by("-created_on")),
+        ("business_list", "publicly visible businesses",
+         Business.objects.filter(is_active=True, is_approved=True, is_locked=False).order_by("name")),
+        ("business_detail", "active locations of a business",
+         BusinessLocation.objects.filter(business_id=1, is_active=True)),
+        ("business_list", "locations in a city",
+         BusinessLocation.objects.filter(city="Goa")),
+        ("owner_dashboard", "latest quotes of a business",
+         QuoteRequest.objects.filter(business_id=1).order_by("-created_at")[:50]),
+    ]
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot view queries and flag full table scans and temp sorts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fail-on-scan",
+            action="store_true",
+            help="Exit non-zero if any query does a full table scan (for CI).",
+        )
+        parser.add_argument("--verbose-plans", action="store_true")
+
+    def handle(self, *args, **options):
+        full_scans = 0
+
+        for view, description, queryset in hot_queries():
+            plan = queryset.explain()
+            scans = [
+                line.strip() for line in plan.splitlines()
+                if any(p.search(line) for p in FULL_SCAN_PATTERNS)
+            ]
+            temp_sort = bool(TEMP_SORT_PATTERN.search(plan))
+
+            label = f"[{view}] {description}"
+            if scans:
+                full_scans += 1
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {label}"))
+                for line in scans:
+                    self.stdout.write(f"           {line}")
+            elif temp_sort:
+                self.stdout.write(self.style.WARNING(f"TEMP SORT  {label}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"OK         {label}"))
+
+            if options["verbose_plans"]:
+                for line in plan.splitlines():
+                    self.stdout.write(f"           | {line}")
+
+        if connection.vendor == "postgresql":
+            self.stdout.write(
+                "Note: PostgreSQL prefers sequential scans on small tables; "
+                "run this against production-sized data."
+            )
+
+        if full_scans and options["fail_on_scan"]:
+            raise CommandError(f"{full_scans} hot queries do full table scans.")
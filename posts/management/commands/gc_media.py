@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts.media import collect_garbage
+from posts.uploads import purge_stale_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete editor uploads no post uses any more and blob files (with their "
+        "image variants) that nothing references, and abandoned chunked uploads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            type=float,
+            default=24,
+            help="Keep anything newer than this; drafts may not be saved yet.",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        uploads, files = collect_garbage(
+            grace=timedelta(hours=options["grace_hours"]),
+            dry_run=options["dry_run"],
+        )
+        verb = "Would remove" if options["dry_run"] else "Removed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {uploads} orphaned editor uploads and {files} unreferenced files."
+        ))
+        if not options["dry_run"]:
+            stale = purge_stale_uploads(max_age=options["grace_hours"] * 3600)
+            self.stdout.write(self.style.SUCCESS(f"Removed {stale} abandoned chunked uploads."))
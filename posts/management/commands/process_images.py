@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import process_image, registered_specs
+
+
+class Command(BaseCommand):
+    help = "Generate missing or stale responsive variants for every registered image field."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        total = 0
+        for spec in registered_specs():
+            rows = (
+                spec.model._default_manager.order_by("pk")
+                .values_list("pk", spec.field, spec.variants_field)
+            )
+            done = 0
+            for pk, name, variants in rows.iterator(chunk_size=options["batch_size"]):
+                if (variants or {}).get("source") != spec.source_name(name):
+                    done += process_image(spec, pk)
+            total += done
+            self.stdout.write(f"{spec.model._meta.label}.{spec.field}: {done} processed")
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} images."))
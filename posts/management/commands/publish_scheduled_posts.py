@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.scheduling import publish_due_posts
+
+
+class Command(BaseCommand):
+    help = (
+        "Publish scheduled posts whose publish_at has passed. Run it from cron, "
+        "or with --loop as a small long-running worker; several copies may run at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--loop", action="store_true", help="Keep running, checking every --interval seconds.")
+        parser.add_argument("--interval", type=int, default=60)
+
+    def handle(self, *args, **options):
+        while True:
+            count = publish_due_posts(batch_size=options["batch_size"])
+            if count or not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(f"Published {count} scheduled posts."))
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
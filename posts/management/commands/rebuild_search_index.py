@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import get_backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Drop and rebuild the full-text search index for published posts."
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} published posts ({type(backend).__name__})."
+        ))
@@ -0,0 +1,18 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from posts.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = "Recount every user's dashboard statistics from their posts and comments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        ids = list(User.objects.order_by("pk").values_list("pk", flat=True))
+        size = options["batch_size"]
+        for start in range(0, len(ids), size):
+            rebuild_user_stats(ids[start:start + size])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {len(ids)} users."))
@@ -0,0 +1,125 @@
+"""
+Reference tracking and garbage collection for uploaded media.
+
+Model file fields reference their blobs directly. Editor images are only
+referenced from post HTML, so every post save records which
+``UploadedImage`` rows its content shows (``Post.uploads``). Posts written
+before that tracking, or changed with ``update()``, never went through the
+signal, so ``collect_garbage`` first re-links every post from its content
+(``sync_post_uploads``). It then drops editor uploads no post uses any more
+and deletes every blob, and every variant, that nothing references.
+"""
+
+import posixpath
+import re
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import FileField, Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import images
+from .models import Post, UploadedImage
+from .storage import BLOB_PREFIX, ContentAddressedStorage, blob_storage
+
+IMG_SRC_RE = re.compile(r'<img\b[^>]*?\bsrc="([^"]+)"[^>]*>', re.IGNORECASE)
+
+
+def media_names_in(html):
+    """Storage names of the media files ``<img>`` tags in ``html`` point at."""
+    return {
+        src[len(settings.MEDIA_URL):]
+        for src in IMG_SRC_RE.findall(html or "")
+        if src.startswith(settings.MEDIA_URL)
+    }
+
+
+@receiver(post_save, sender=Post)
+def track_post_uploads(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    names = media_names_in(instance.content)
+    if created and not names:
+        return
+    upload_ids = UploadedImage.objects.filter(file__in=names).values_list("id", flat=True) if names else []
+    instance.uploads.set(upload_ids)
+
+
+def sync_post_uploads():
+    """Re-link every post that shows, or is linked to, an editor upload."""
+    posts = (
+        Post.objects.filter(Q(content__icontains="<img") | Q(uploads__isnull=False))
+        .distinct().only("id", "content")
+    )
+    shown = {post: media_names_in(post.content) for post in posts.iterator()}
+    upload_ids = dict(
+        UploadedImage.objects.filter(file__in=set().union(*shown.values())).values_list("file", "id")
+    )
+    for post, names in shown.items():
+        post.uploads.set([upload_ids[name] for name in names if name in upload_ids])
+
+
+# ==========================
+# GARBAGE COLLECTION
+# ==========================
+
+def referenced_files():
+    """Every blob and variant name a row still points at."""
+    names = set()
+    for model in apps.get_models():
+        fields = [
+            f.name for f in model._meta.concrete_fields
+            if isinstance(f, FileField) and isinstance(f.storage, ContentAddressedStorage)
+        ]
+        for field in fields:
+            names.update(model._default_manager.exclude(**{field: ""}).values_list(field, flat=True))
+
+    for spec in images.registered_specs():
+        for data in spec.model._default_manager.values_list(spec.variants_field, flat=True).iterator():
+            for variant in (data or {}).get("variants", {}).values():
+                names.update(variant["files"].values())
+
+    names.discard(None)
+    return names
+
+
+def stored_blob_files(storage, path=BLOB_PREFIX):
+    if not storage.exists(path):
+        return
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield posixpath.join(path, name)
+    for directory in directories:
+        yield from stored_blob_files(storage, posixpath.join(path, directory))
+
+
+def collect_garbage(grace=timedelta(hours=24), dry_run=False):
+    """
+    Delete editor uploads no post shows and blob files nothing references.
+    Anything younger than ``grace`` is kept: a draft may not be saved yet.
+    Post links are repaired first, even on a dry run, so an image shown by
+    an untracked post is never counted as orphaned.
+    Returns (uploads removed, files removed).
+    """
+    cutoff = timezone.now() - grace
+    sync_post_uploads()
+
+    orphaned_uploads = UploadedImage.objects.filter(posts__isnull=True, created_at__lt=cutoff)
+    upload_count = orphaned_uploads.count()
+    if not dry_run:
+        orphaned_uploads.delete()
+
+    storage = blob_storage()
+    referenced = referenced_files()
+    file_count = 0
+    for name in list(stored_blob_files(storage)):
+        if name in referenced or storage.get_modified_time(name) >= cutoff:
+            continue
+        file_count += 1
+        if not dry_run:
+            storage.delete(name)
+
+    return upload_count, file_count
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from posts.search import rebuild_index
+
+    rebuild_index(apps.get_model("posts", "Post"), schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from posts.search import get_backend
+
+    get_backend(schema_editor.connection).drop()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0002_alter_profile_avatar'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
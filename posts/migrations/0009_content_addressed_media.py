@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:29
+
+import posts.models
+import posts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='uploads',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='posts', to='posts.uploadedimage'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.blob_storage, upload_to='posts/'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='avatar',
+            field=models.ImageField(blank=True, default='avatars/default.png', storage=posts.storage.blob_storage, upload_to=posts.models.avatar_path),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='profile_picture',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.blob_storage, upload_to=posts.models.avatar_path),
+        ),
+        migrations.AlterField(
+            model_name='uploadedimage',
+            name='file',
+            field=models.ImageField(storage=posts.storage.blob_storage, unique=True, upload_to=posts.models.post_upload_path),
+        ),
+    ]
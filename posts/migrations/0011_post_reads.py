@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_user_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadFlush',
+            fields=[
+                ('batch', models.UUIDField(primary_key=True, serialize=False)),
+                ('flushed_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostReads',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_reads', to='posts.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'post'], name='post_reads_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'day'), name='post_reads_post_day_uniq')],
+            },
+        ),
+    ]
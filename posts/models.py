@@ -1,14 +1,22 @@
 import re
 import uuid
+from html import unescape
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.urls import reverse
-from django.utils.text import slugify
+from django.utils.html import strip_tags
+from django.utils.text import Truncator, slugify
+
+from . import images
+from .slugs import UniqueSlugMixin
+from .storage import blob_storage
 
 User = get_user_model()
 
@@ -26,6 +34,29 @@ def post_upload_path(instance, filename):
     return f"posts/uploads/{uuid.uuid4()}.{ext}"
 
 
+# ==========================
+# TEXT HELPERS
+# ==========================
+
+EXCERPT_LENGTH = 260
+WORDS_PER_MINUTE = 200
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def html_to_text(html):
+    """Quill HTML -> plain text with entities decoded and whitespace collapsed."""
+    return " ".join(unescape(strip_tags(html or "")).split())
+
+
+def count_words(text):
+    return len(_WORD_RE.findall(text or ""))
+
+
+def reading_time(word_count):
+    return max(1, round(word_count / WORDS_PER_MINUTE)) if word_count else 1
+
+
 # ==========================
 # PROFILE MODEL
 # ==========================
@@ -39,9 +70,11 @@ class Profile(models.Model):
 
     avatar = models.ImageField(
         upload_to=avatar_path,
+        storage=blob_storage,
         default='avatars/default.png',
         blank=True
     )
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     full_name = models.CharField(max_length=70, blank=True, null=True)
     designation = models.CharField(max_length=50, blank=True, null=True)
@@ -55,6 +88,7 @@ class Profile(models.Model):
 
     profile_picture = models.ImageField(
         upload_to=avatar_path,
+        storage=blob_storage,
         blank=True,
         null=True
     )
@@ -88,6 +122,10 @@ class Profile(models.Model):
             return self.avatar.url
         return "/static/defaults/avatar.png"
 
+    @property
+    def avatar_versions(self):
+        return images.versions_for(self, "avatar")
+
     def get_absolute_url(self):
         return reverse('resume', kwargs={'id': self.id})
 
@@ -102,40 +140,142 @@ def create_profile_for_user(sender, instance, created, **kwargs):
 # CATEGORY + TAG MODELS + post
 # ==========================
 
-class Category(models.Model):
+class Category(UniqueSlugMixin, models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=120, unique=True, blank=True)
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base = slugify(self.name)
-            slug = base
-            counter = 1
-            while Category.objects.filter(slug=slug).exclude(id=self.id).exists():
-                slug = f"{base}-{counter}"
-                counter += 1
-            self.slug = slug
-
-        super().save(*args, **kwargs)
+    slug_fallback = "category"
 
     def __str__(self):
         return self.name
 
 
-class Tag(models.Model):
+class TagQuerySet(models.QuerySet):
+    def resolve(self, ids=(), names=()):
+        """
+        Tags for ``ids`` followed by tags for ``names``, creating the missing
+        names. Names match case-insensitively; the result keeps input order
+        without duplicates. Three queries at most, however many tags.
+        """
+        wanted = {}
+        for name in names:
+            name = name.strip()[:80]
+            if name:
+                wanted.setdefault(name.lower(), name)
+
+        by_id, by_key = {}, {}
+
+        def fetch(ids, names):
+            # Matching on slug too catches case variants through the unique index
+            slugs = [slugify(name)[:100] for name in names]
+            lookup = Q(id__in=ids) | Q(name__in=names) | Q(slug__in=slugs)
+            for tag in self.filter(lookup):
+                by_id[tag.id] = tag
+                by_key.setdefault(tag.name.lower(), tag)
+
+        fetch(list(ids), list(wanted.values()))
+
+        missing = [name for key, name in wanted.items() if key not in by_key]
+        if missing:
+            taken = {tag.slug for tag in by_id.values()}
+            new_tags = []
+            for name in missing:
+                slug = slugify(name)[:100] or "tag"
+                if slug not in taken:
+                    taken.add(slug)
+                    new_tags.append(self.model(name=name, slug=slug))
+            self.bulk_create(new_tags, ignore_conflicts=True)
+            fetch([], missing)
+
+            # Slug clashes ("C" vs "C++") and lost races go through save()
+            for name in missing:
+                if name.lower() not in by_key:
+                    by_key[name.lower()] = self.create(name=name)
+
+        result = [by_id[pk] for pk in ids if pk in by_id]
+        result += [by_key[key] for key in wanted]
+        return list(dict.fromkeys(result))
+
+
+class Tag(UniqueSlugMixin, models.Model):
     name = models.CharField(max_length=80, unique=True)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)[:100]
-        super().save(*args, **kwargs)
+    objects = TagQuerySet.as_manager()
+
+    slug_fallback = "tag"
 
     def __str__(self):
         return self.name
 
 
-class Post(models.Model):
+# Large columns no listing card renders; cards() leaves them in the database.
+CARD_DEFERRED_FIELDS = (
+    "content",
+    "plain_text",
+    "meta_title",
+    "meta_description",
+    "author__profile__bio",
+    "author__profile__about_author",
+    "author__profile__about_member",
+    "author__profile__address",
+)
+
+
+class PostQuerySet(models.QuerySet):
+    def published(self):
+        return self.filter(status="published")
+
+    def for_listing(self):
+        """
+        Everything a blog card renders (author, avatar, category, tags and the
+        active comment count) in a fixed number of queries per page.
+        """
+        return (
+            self.select_related("author", "author__profile", "category")
+            .annotate(
+                # A correlated count keeps GROUP BY off the outer query, so the
+                # (status, created_at) index can still deliver rows in order.
+                active_comment_count=Coalesce(
+                    Subquery(
+                        Comment.objects.filter(post=OuterRef("pk"), active=True)
+                        .order_by()
+                        .values("post")
+                        .annotate(count=Count("pk"))
+                        .values("count")
+                    ),
+                    0,
+                )
+            )
+            .prefetch_related("tags")
+        )
+
+    def cards(self):
+        """for_listing() without the heavy columns a card never renders."""
+        return self.for_listing().defer(*CARD_DEFERRED_FIELDS)
+
+    def with_neighbor_ids(self):
+        """
+        Annotate ``previous_id`` (the next newer published post) and ``next_id``
+        (the next older one), ordered by (created_at, id) so posts sharing a
+        timestamp are not skipped. Both are index range probes on (status, created_at).
+        """
+        published = Post.objects.published()
+        newer = published.filter(
+            Q(created_at__gt=OuterRef("created_at"))
+            | Q(created_at=OuterRef("created_at"), id__gt=OuterRef("id"))
+        ).order_by("created_at", "id")
+        older = published.filter(
+            Q(created_at__lt=OuterRef("created_at"))
+            | Q(created_at=OuterRef("created_at"), id__lt=OuterRef("id"))
+        ).order_by("-created_at", "-id")
+        return self.annotate(
+            previous_id=Subquery(newer.values("id")[:1]),
+            next_id=Subquery(older.values("id")[:1]),
+        )
+
+
+class Post(UniqueSlugMixin, models.Model):
     STATUS_CHOICES = (
         ("draft", "Draft"),
         ("published", "Published"),
@@ -146,64 +286,88 @@ class Post(models.Model):
     slug = models.SlugField(max_length=260, unique=True, blank=True)
 
     content = models.TextField(blank=True)  # Quill HTML
-    image = models.ImageField(upload_to="posts/", blank=True, null=True)
+    image = models.ImageField(upload_to="posts/", storage=blob_storage, blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     tags = models.ManyToManyField(Tag, blank=True)
+    # Editor images the content currently shows; kept in sync by posts.media
+    uploads = models.ManyToManyField("UploadedImage", blank=True, related_name="posts", editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     publish_at = models.DateTimeField(null=True, blank=True)
 
     read_time = models.PositiveIntegerField(default=1)
+
+    # Derived from content on every save so listings never strip HTML at render time
+    plain_text = models.TextField(blank=True, default="", editable=False)
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, default="", editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="draft")
 
     # SEO
     meta_title = models.CharField(max_length=70, blank=True, default="")
     meta_description = models.CharField(max_length=180, blank=True, default="")
 
+    objects = PostQuerySet.as_manager()
+
+    slug_source = "title"
+    slug_fallback = "post"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="post_status_created_idx"),
+            models.Index(fields=["status", "publish_at"], name="post_status_publish_idx"),
+            # An author's posts, newest first (dashboard timeline pages)
+            models.Index(fields=["author", "created_at"], name="post_author_created_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
     def get_absolute_url(self):
         return reverse("singleblog", kwargs={"id": self.id})
 
+    def neighbors(self):
+        """
+        (previous_post, next_post) for a post loaded through with_neighbor_ids(),
+        fetched together in one query with only the columns the nav cards show.
+        """
+        ids = [pk for pk in (self.previous_id, self.next_id) if pk]
+        found = (
+            Post.objects.only("id", "title", "image", "image_variants").in_bulk(ids) if ids else {}
+        )
+        return found.get(self.previous_id), found.get(self.next_id)
+
     @property
     def estimated_read_time(self):
         return f"{self.read_time} min read"
 
-    def _plain_text(self):
-        """Strip HTML to estimate words & SEO snippets."""
-        return re.sub(r"<[^>]+>", " ", self.content or "").strip()
+    @property
+    def image_versions(self):
+        return images.versions_for(self, "image")
 
-    def _word_count(self):
-        if not self.content:
-            return 0
-        return len(re.findall(r"\w+", self._plain_text()))
+    def refresh_text_fields(self):
+        """Recompute plain text, excerpt, word count and read time from content."""
+        self.plain_text = html_to_text(self.content)
+        self.excerpt = Truncator(self.plain_text).chars(EXCERPT_LENGTH)
+        self.word_count = count_words(self.plain_text)
+        self.read_time = reading_time(self.word_count)
 
     def save(self, *args, **kwargs):
-        # Slug
-        if not self.slug:
-            base_slug = slugify(self.title)[:240]
-            slug = base_slug
-            counter = 1
-            while Post.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-
-        # Read time
-        words = self._word_count()
-        self.read_time = max(1, round(words / 200)) if words else 1
+        # A blank slug is allocated by UniqueSlugMixin on the way down
+
+        # Plain text, excerpt, word count & read time
+        self.refresh_text_fields()
 
         # SEO fallbacks
         if not self.meta_title:
             self.meta_title = (self.title or "")[:70]
 
         if not self.meta_description:
-            pt = self._plain_text()
-            self.meta_description = pt[:175]
+            self.meta_description = self.plain_text[:175]
 
         super().save(*args, **kwargs)
 
@@ -224,11 +388,116 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['created_on']
+        indexes = [
+            # Active comments of a post, in order; also serves the listing counts
+            models.Index(
+                fields=['post', 'created_on'],
+                condition=Q(active=True),
+                name='comment_post_active_idx',
+            ),
+            # A user's comments, newest first (dashboard timeline pages)
+            models.Index(fields=['user', 'created_on'], name='comment_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Comment {self.body} by {self.name}"
 
 
+# ==========================
+# USER STATS
+# ==========================
+
+class UserStats(models.Model):
+    """
+    Per-user counters the dashboard and profile read instead of counting the
+    user's history. Maintained by posts.stats.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+
+    # Plain integers: a delta applied to a drifted row must never fail the
+    # write that triggered it (manage.py rebuild_user_stats repairs drift)
+    draft_posts = models.IntegerField(default=0)
+    published_posts = models.IntegerField(default=0)
+    scheduled_posts = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+    total_reads = models.BigIntegerField(default=0)
+    last_activity = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "user stats"
+
+    def __str__(self):
+        return f"Stats for {self.user_id}"
+
+    @property
+    def total_posts(self):
+        return self.draft_posts + self.published_posts + self.scheduled_posts
+
+    @property
+    def interactions(self):
+        return self.total_posts + self.comments
+
+
+# ==========================
+# READ COUNTS
+# ==========================
+
+class PostReads(models.Model):
+    """Reads of a post on one day, added in batches by posts.reads."""
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="daily_reads")
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["post", "day"], name="post_reads_post_day_uniq"),
+        ]
+        indexes = [
+            # "Most read" sums a window of recent days
+            models.Index(fields=["day", "post"], name="post_reads_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} on {self.day}: {self.count}"
+
+
+class ReadFlush(models.Model):
+    """A batch of reads already applied, so retrying it never counts twice."""
+
+    batch = models.UUIDField(primary_key=True)
+    flushed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+# ==========================
+# EDITOR UPLOADS
+# ==========================
+
+class UploadedImage(models.Model):
+    """
+    An image pasted into the post editor, one row per distinct blob. Its
+    variants back the srcset in post bodies; ``posts`` says who still uses it.
+    """
+
+    file = models.ImageField(upload_to=post_upload_path, storage=blob_storage, unique=True)
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.file.name
+
+    @property
+    def versions(self):
+        return images.versions_for(self, "file")
+
+
+images.register(Post, "image", "image_variants")
+images.register(Profile, "avatar", "avatar_variants", sizes=("avatar", "thumb"))
+images.register(UploadedImage, "file", "variants", sizes=("card", "hero"))
+
+
 # ==========================
 # USER PROFILE DETAILS (WORKS WITH FORMSETS)
 # ==========================
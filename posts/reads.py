@@ -0,0 +1,256 @@
+"""
+Buffered read counting for blog posts.
+
+A hit only bumps an in-process counter; nothing touches the database on the
+request path. A background thread, started by the server entry points
+(``blog/wsgi.py``, ``blog/asgi.py``), writes the buffer every
+``READS_FLUSH_INTERVAL`` seconds as one batch: daily ``PostReads`` rows plus
+the authors' ``UserStats.total_reads``, in a single transaction.
+
+Every batch carries an id that is recorded (``ReadFlush``) in that same
+transaction. A batch whose flush failed, or whose commit outcome is unknown,
+is retried as-is and so applied at most once. Workers flush what they hold
+when they exit; a crash loses at most one interval and never double counts.
+
+Every flush tick also recomputes the "most read" ranking over the last
+``READS_RANKING_DAYS`` days and keeps it in the cache for
+``RANKING_TIMEOUT``, so pages read it without a query; a process that finds
+it missing (fresh worker, no background flush) computes it on the spot.
+When the featured head of the ranking changes, the cached anonymous pages
+are invalidated so the home page shows it at once.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import BigIntegerField, Case, F, Sum, Value, When
+from django.utils import timezone
+
+from .cache import invalidate_pages
+from .models import Post, PostReads, ReadFlush, UserStats
+
+logger = logging.getLogger(__name__)
+
+RANKING_KEY = "posts:reads:most-read"
+RANKING_SIZE = 12
+RANKING_TIMEOUT = 5 * 60
+# How many ranked posts the home page features; a change there invalidates pages
+FEATURED_COUNT = 4
+# Applied batch ids only need to outlive any retry of the same batch
+FLUSH_LOG_RETENTION = timedelta(days=1)
+
+
+def flush_interval():
+    return getattr(settings, "READS_FLUSH_INTERVAL", 10)
+
+
+def ranking_days():
+    return getattr(settings, "READS_RANKING_DAYS", 7)
+
+
+# ==========================
+# WRITING BATCHES
+# ==========================
+
+def _add_to(queryset, field, amounts):
+    """One UPDATE adding ``amounts[pk]`` to ``field`` of each row."""
+    if not amounts:
+        return
+    queryset.filter(pk__in=amounts).update(**{
+        field: F(field) + Case(
+            *(When(pk=pk, then=Value(amount)) for pk, amount in amounts.items()),
+            default=Value(0),
+            output_field=BigIntegerField(),
+        )
+    })
+
+
+def apply_batch(batch, counts):
+    """
+    Add ``counts`` ({(post_id, day): reads}) to the database, once per
+    ``batch`` id. Returns how many reads were applied now.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                ReadFlush.objects.create(batch=batch)
+        except IntegrityError:
+            # An earlier attempt did commit; its outcome just never reached us
+            return 0
+
+        authors = dict(
+            Post.objects.filter(pk__in={post_id for post_id, _ in counts})
+            .values_list("pk", "author_id")
+        )
+        counts = {key: n for key, n in counts.items() if key[0] in authors}
+        if counts:
+            existing = {
+                (row.post_id, row.day): row.pk
+                for row in PostReads.objects.filter(
+                    post_id__in={post_id for post_id, _ in counts},
+                    day__in={day for _, day in counts},
+                ).only("id", "post_id", "day")
+            }
+            _add_to(PostReads.objects, "count", {
+                existing[key]: n for key, n in counts.items() if key in existing
+            })
+            PostReads.objects.bulk_create([
+                PostReads(post_id=post_id, day=day, count=n)
+                for (post_id, day), n in counts.items() if (post_id, day) not in existing
+            ])
+
+            per_author = Counter()
+            for (post_id, _), n in counts.items():
+                per_author[authors[post_id]] += n
+            # Authors without a stats row get these reads when it is counted
+            _add_to(UserStats.objects, "total_reads", per_author)
+
+        ReadFlush.objects.filter(flushed_at__lt=timezone.now() - FLUSH_LOG_RETENTION).delete()
+
+    return sum(counts.values())
+
+
+# ==========================
+# RANKING
+# ==========================
+
+def refresh_ranking():
+    since = timezone.localdate() - timedelta(days=ranking_days() - 1)
+    ids = list(
+        PostReads.objects.filter(day__gte=since, post__status="published")
+        .values("post")
+        .annotate(reads=Sum("count"))
+        .order_by("-reads", "-post")
+        .values_list("post", flat=True)[:RANKING_SIZE]
+    )
+    previous = cache.get(RANKING_KEY)
+    cache.set(RANKING_KEY, ids, timeout=RANKING_TIMEOUT)
+    if previous is not None and previous[:FEATURED_COUNT] != ids[:FEATURED_COUNT]:
+        invalidate_pages()
+    return ids
+
+
+def most_read_ids(limit=FEATURED_COUNT):
+    """Ids of the most read published posts lately, best first (possibly fewer than ``limit``)."""
+    ids = cache.get(RANKING_KEY)
+    if ids is None:
+        ids = refresh_ranking()
+    return ids[:limit]
+
+
+# ==========================
+# BUFFER
+# ==========================
+
+class ReadBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flushing = threading.Lock()
+        self.counts = Counter()
+        # (batch id, counts) of a flush that failed, retried before anything new
+        self.pending = None
+        self.background = False
+        self.thread = None
+        self.pid = None
+
+    def add(self, post_id):
+        with self.lock:
+            self.counts[(post_id, timezone.localdate())] += 1
+        if self.background:
+            self._ensure_thread()
+
+    def flush(self):
+        """Write out everything buffered. Returns the number of reads applied."""
+        if not self.flushing.acquire(blocking=False):
+            return 0
+        applied = 0
+        try:
+            # The retry of a failed batch, then whatever has arrived since
+            for _ in range(2):
+                if self.pending is None:
+                    with self.lock:
+                        if not self.counts:
+                            break
+                        self.pending = (uuid.uuid4(), self.counts)
+                        self.counts = Counter()
+                try:
+                    applied += apply_batch(*self.pending)
+                except DatabaseError:
+                    logger.exception("Could not flush %s post reads", sum(self.pending[1].values()))
+                    break
+                self.pending = None
+            if applied:
+                refresh_ranking()
+        finally:
+            self.flushing.release()
+        return applied
+
+    def _ensure_thread(self):
+        # Started lazily so each forked worker runs its own
+        if self.thread is not None and self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._run, name="post-reads", daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(flush_interval())
+            try:
+                # The ranking also moves with other workers' reads and the date
+                if not self.flush():
+                    refresh_ranking()
+            except Exception:
+                logger.exception("Post read flush failed")
+            finally:
+                connection.close()
+
+
+_buffer = ReadBuffer()
+
+
+def record_read(post_id):
+    _buffer.add(post_id)
+
+
+def flush():
+    return _buffer.flush()
+
+
+def _flush_at_exit():
+    try:
+        _buffer.flush()
+    except Exception:
+        logger.exception("Could not flush post reads at exit")
+
+
+def start_background_flush():
+    """Flush this process's reads on an interval and at exit. Called by the server entry points."""
+    if not _buffer.background:
+        _buffer.background = True
+        atexit.register(_flush_at_exit)
+
+
+def counts_reads(view_func):
+    """Count a read for every successful GET of the post ``id`` (render-cache hits too)."""
+
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        if request.method == "GET" and response.status_code == 200:
+            record_read(kwargs["id"])
+        return response
+
+    return _wrapped_view
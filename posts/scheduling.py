@@ -0,0 +1,69 @@
+"""
+Publishing of scheduled posts.
+
+``publish_due_posts`` flips ``status="scheduled"`` posts whose ``publish_at``
+has passed to ``published``. It is idempotent and safe to run from several
+app nodes at once: each batch is claimed with ``SELECT ... FOR UPDATE SKIP
+LOCKED`` where the database supports it, and the UPDATE itself re-checks the
+status, so a post can only ever be flipped once. The follow-up work (search
+index, render cache) is idempotent too, so a lost race costs nothing.
+"""
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import invalidate_pages
+from .models import Post
+from .search import index_post_ids
+from .stats import status_moved
+
+
+def due_posts(now=None):
+    """Scheduled posts whose time has come; served by the (status, publish_at) index."""
+    now = now or timezone.now()
+    return Post.objects.filter(status="scheduled", publish_at__lte=now)
+
+
+def _claim_batch(now, batch_size):
+    queryset = due_posts(now).order_by("publish_at", "id")
+    if connection.features.has_select_for_update_skip_locked:
+        queryset = queryset.select_for_update(skip_locked=True)
+    return list(queryset.values_list("id", flat=True)[:batch_size])
+
+
+def publish_due_posts(now=None, batch_size=100):
+    """Publish everything that is due, in batches. Returns how many posts this call flipped."""
+    now = now or timezone.now()
+    total = 0
+
+    while True:
+        with transaction.atomic():
+            ids = _claim_batch(now, batch_size)
+            if not ids:
+                break
+            batch = Post.objects.filter(id__in=ids, status="scheduled")
+            author_ids = list(batch.order_by().values_list("author_id", flat=True).distinct())
+            flipped = 0
+            for author_id in author_ids:
+                # created_at becomes the publish time so the post lands at the top of
+                # the listings instead of wherever its draft was first saved. The
+                # counters follow the rows this UPDATE changed, not the ones read
+                # above: without SKIP LOCKED an overlapping run may have won them.
+                count = batch.filter(author_id=author_id).update(
+                    status="published", created_at=F("publish_at"),
+                )
+                if count:
+                    status_moved(author_id, "scheduled", "published", count)
+                flipped += count
+
+        # update() sends no signals, so sync the derived data by hand
+        index_post_ids(ids)
+        invalidate_pages()
+        total += flipped
+
+        if flipped == 0:
+            # Another worker already published this batch and is working through the rest
+            break
+
+    return total
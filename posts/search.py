@@ -0,0 +1,356 @@
+"""
+Full-text search for published posts.
+
+Each published post is mirrored into a search document (title, tag names,
+category name and tag-stripped content). SQLite stores it in an FTS5 virtual
+table, PostgreSQL in a weighted ``tsvector`` table. Both live behind the same
+small backend interface so the views never care which database is in use.
+"""
+
+import re
+
+from django.db import connection as default_connection
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Category, Post, Tag, html_to_text
+from .pagination import CursorPage, decode_cursor, encode_cursor
+
+FTS_TABLE = "posts_post_fts"
+PG_TABLE = "posts_post_search"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# ==========================
+# DOCUMENT HELPERS
+# ==========================
+
+def query_tokens(query: str):
+    return _TOKEN_RE.findall((query or "").lower())
+
+
+def build_document(post) -> dict:
+    """Collect the searchable columns for a post (works with historical models)."""
+    return {
+        "title": post.title or "",
+        "tags": " ".join(post.tags.values_list("name", flat=True)),
+        "category": post.category.name if post.category_id else "",
+        "body": html_to_text(post.content),
+    }
+
+
+# ==========================
+# BACKENDS
+# ==========================
+
+class SearchBackend:
+    """
+    Plain icontains fallback for databases without a full-text engine.
+
+    ``search`` returns ``(post_id, score)`` rows ordered by score ascending
+    (lower is better), then id descending. ``after`` is the ``(score, id)`` of
+    the last row of the previous page, which makes ranked results keyset-paginable.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create(self):
+        pass
+
+    def drop(self):
+        pass
+
+    def upsert(self, post_id, document):
+        pass
+
+    def delete(self, post_ids):
+        pass
+
+    def search(self, query, limit, after=None):
+        from django.db.models import Q
+
+        tokens = query_tokens(query)
+        if not tokens:
+            return []
+
+        qs = Post.objects.using(self.connection.alias).filter(status="published")
+        for token in tokens:
+            qs = qs.filter(Q(title__icontains=token) | Q(content__icontains=token))
+        if after:
+            qs = qs.filter(id__lt=after[1])
+        # No relevance here: every row scores 0, so this is newest (highest id) first.
+        return [(pk, 0.0) for pk in qs.order_by("-id").values_list("id", flat=True)[:limit]]
+
+
+class SQLiteFTSBackend(SearchBackend):
+    # bm25 column weights: title, tags, category, body
+    WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+
+    def create(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                "USING fts5(title, tags, category, body, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def drop(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def upsert(self, post_id, document):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [post_id])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, tags, category, body) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [post_id, document["title"], document["tags"],
+                 document["category"], document["body"]],
+            )
+
+    def delete(self, post_ids):
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(post_ids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", post_ids
+            )
+
+    def search(self, query, limit, after=None):
+        tokens = query_tokens(query)
+        if not tokens:
+            return []
+
+        # Every token must match, each as a prefix ("goa" finds "goan").
+        match = " ".join(f'"{token}"*' for token in tokens)
+        score = f"bm25({FTS_TABLE}, {', '.join(str(w) for w in self.WEIGHTS)})"
+        params = [match]
+        keyset = ""
+        if after:
+            keyset = f"AND ({score} > %s OR ({score} = %s AND rowid < %s)) "
+            params += [after[0], after[0], after[1]]
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, {score} AS score FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s {keyset}"
+                "ORDER BY score, rowid DESC LIMIT %s",
+                params + [limit],
+            )
+            return cursor.fetchall()
+
+
+class PostgresSearchBackend(SearchBackend):
+    CONFIG = "english"
+
+    def create(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {PG_TABLE} ("
+                "post_id bigint PRIMARY KEY REFERENCES posts_post (id) ON DELETE CASCADE, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_document_idx "
+                f"ON {PG_TABLE} USING GIN (document)"
+            )
+
+    def drop(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {PG_TABLE}")
+
+    def upsert(self, post_id, document):
+        vector = " || ".join(
+            f"setweight(to_tsvector('{self.CONFIG}', %s), '{weight}')"
+            for weight in "ABCD"
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {PG_TABLE} (post_id, document) VALUES (%s, {vector}) "
+                "ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document",
+                [post_id, document["title"], document["tags"],
+                 document["category"], document["body"]],
+            )
+
+    def delete(self, post_ids):
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {PG_TABLE} WHERE post_id = ANY(%s)", [post_ids])
+
+    def search(self, query, limit, after=None):
+        tokens = query_tokens(query)
+        if not tokens:
+            return []
+
+        tsquery = " & ".join(f"{token}:*" for token in tokens)
+        # Negated so that, as with bm25, lower scores rank first.
+        score = "(-ts_rank_cd(document, q))"
+        params = [tsquery]
+        keyset = ""
+        if after:
+            keyset = f"AND ({score} > %s OR ({score} = %s AND post_id < %s)) "
+            params += [after[0], after[0], after[1]]
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT post_id, {score} AS score "
+                f"FROM {PG_TABLE}, to_tsquery('{self.CONFIG}', %s) q "
+                f"WHERE document @@ q {keyset}"
+                "ORDER BY score, post_id DESC LIMIT %s",
+                params + [limit],
+            )
+            return cursor.fetchall()
+
+
+_fts5_support = {}
+
+
+def sqlite_has_fts5(connection) -> bool:
+    """Whether this SQLite build has the FTS5 extension (probed once per alias)."""
+    if connection.alias not in _fts5_support:
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            _fts5_support[connection.alias] = any(
+                "FTS5" in row[0] for row in cursor.fetchall()
+            )
+    return _fts5_support[connection.alias]
+
+
+def get_backend(connection=None) -> SearchBackend:
+    connection = connection or default_connection
+    if connection.vendor == "sqlite" and sqlite_has_fts5(connection):
+        return SQLiteFTSBackend(connection)
+    if connection.vendor == "postgresql":
+        return PostgresSearchBackend(connection)
+    return SearchBackend(connection)
+
+
+# ==========================
+# PUBLIC API
+# ==========================
+
+def index_posts(posts, connection=None):
+    """(Re)index the given posts; anything not published is dropped from the index."""
+    backend = get_backend(connection)
+    stale = []
+    for post in posts:
+        if post.status == "published":
+            backend.upsert(post.pk, build_document(post))
+        else:
+            stale.append(post.pk)
+    backend.delete(stale)
+
+
+def index_post_ids(post_ids, connection=None):
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    posts = Post.objects.filter(pk__in=post_ids).select_related("category")
+    found = list(posts)
+    index_posts(found, connection)
+    missing = set(post_ids) - {p.pk for p in found}
+    get_backend(connection).delete(missing)
+
+
+def rebuild_index(post_model=None, connection=None):
+    """Recreate the index from scratch. Used by the migration and the management command."""
+    post_model = post_model or Post
+    backend = get_backend(connection)
+    backend.drop()
+    backend.create()
+
+    published = (
+        post_model.objects.using(backend.connection.alias)
+        .filter(status="published")
+        .select_related("category")
+    )
+    count = 0
+    for post in published.iterator():
+        backend.upsert(post.pk, build_document(post))
+        count += 1
+    return count
+
+
+def search_page(query: str, per_page: int = 8, cursor: str = None) -> CursorPage:
+    """One page of ranked post ids, keyset-paginated on (score, id)."""
+    after = decode_cursor(cursor)
+    try:
+        after = (float(after[0]), int(after[1])) if after and len(after) == 2 else None
+    except (TypeError, ValueError):
+        after = None
+
+    rows = get_backend().search(query, limit=per_page + 1, after=after)
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    next_cursor = None
+    if has_next:
+        last_id, last_score = rows[-1]
+        next_cursor = encode_cursor([last_score, last_id])
+    return CursorPage(
+        [pk for pk, _ in rows],
+        next_cursor=next_cursor,
+        cursor=cursor if after is not None else None,
+    )
+
+
+# ==========================
+# SYNC SIGNALS
+# ==========================
+
+@receiver(post_save, sender=Post)
+def reindex_saved_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_posts([instance])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    get_backend().delete([instance.pk])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def reindex_on_tag_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == "pre_clear":
+        # tag.post_set.clear() sends no pk_set, so remember the posts up front.
+        instance._search_post_ids = list(instance.post_set.values_list("id", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        index_posts([instance])
+    elif action == "post_clear":
+        index_post_ids(getattr(instance, "_search_post_ids", []))
+    else:
+        index_post_ids(pk_set or [])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_posts(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        index_post_ids(instance.post_set.filter(status="published").values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Tag)
+def reindex_tag_posts(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        index_post_ids(instance.post_set.filter(status="published").values_list("id", flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Tag)
+def remember_posts_before_delete(sender, instance, **kwargs):
+    instance._search_post_ids = list(instance.post_set.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def reindex_after_delete(sender, instance, **kwargs):
+    index_post_ids(getattr(instance, "_search_post_ids", []))
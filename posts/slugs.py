@@ -0,0 +1,88 @@
+"""
+Unique slug allocation shared by every model with a unique ``slug`` field.
+
+Instead of probing ``base``, ``base-1``, ``base-2``... with one EXISTS query
+each, the allocator reads every slug of the form ``base`` / ``base-<n>`` in a
+single query. ``base`` itself is used while it is free; otherwise the next
+suffix follows the highest one an earlier allocation appended. A row whose
+own title slugifies to ``base-<n>`` ("Goa 2024") owns that number and does
+not count as a suffix. Two concurrent saves can still pick
+the same slug; the loser's INSERT hits the unique constraint inside a
+savepoint and simply allocates again.
+"""
+
+import re
+
+from django.db import IntegrityError, transaction
+from django.utils.text import slugify
+
+# Room kept at the end of the field for "-<n>"
+SUFFIX_RESERVE = 10
+SAVE_ATTEMPTS = 5
+
+
+def slug_base(source, max_length, fallback="item"):
+    return slugify(source or "")[: max_length - SUFFIX_RESERVE].strip("-") or fallback
+
+
+def allocate_slug(model, source, max_length, exclude_pk=None, fallback="item"):
+    base = slug_base(source, max_length, fallback)
+    source_field = getattr(model, "slug_source", None)
+
+    candidates = model._default_manager.filter(
+        slug__startswith=base,
+        slug__regex=rf"^{re.escape(base)}(-[0-9]+)?$",
+    )
+    if exclude_pk is not None:
+        candidates = candidates.exclude(pk=exclude_pk)
+
+    taken, suffixes = set(), []
+    for slug, row_source in candidates.values_list("slug", source_field or "slug"):
+        taken.add(slug)
+        appended = source_field is None or slug_base(row_source, max_length, fallback) != slug
+        if slug != base and appended:
+            suffixes.append(int(slug[len(base) + 1:]))
+    if base not in taken:
+        return base
+
+    suffix = max(suffixes, default=0) + 1
+    while f"{base}-{suffix}" in taken:
+        suffix += 1
+    return f"{base}-{suffix}"
+
+
+class UniqueSlugMixin:
+    """
+    Fill a blank ``slug`` from ``slug_source`` on save. Put it before
+    ``models.Model`` in the bases; a model's own ``save()`` runs first and
+    its ``super().save()`` lands here.
+    """
+
+    slug_source = "name"
+    slug_fallback = "item"
+
+    def save(self, *args, **kwargs):
+        if self.slug:
+            return super().save(*args, **kwargs)
+
+        max_length = self._meta.get_field("slug").max_length
+        for attempt in range(SAVE_ATTEMPTS):
+            self.slug = allocate_slug(
+                type(self),
+                getattr(self, self.slug_source),
+                max_length,
+                exclude_pk=self.pk,
+                fallback=self.slug_fallback,
+            )
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # Only a lost race on the slug is worth another go
+                slug_taken = (
+                    type(self)._default_manager.filter(slug=self.slug)
+                    .exclude(pk=self.pk)
+                    .exists()
+                )
+                if not slug_taken or attempt == SAVE_ATTEMPTS - 1:
+                    raise
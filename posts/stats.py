@@ -0,0 +1,159 @@
+"""
+Per-user dashboard statistics.
+
+Every post and comment change is applied to the author's ``UserStats`` row as
+an F() delta (reads arrive in batches from posts.reads), so the dashboard
+and profile read one row instead of counting the user's whole history. A
+user without a row yet is counted from scratch on first use;
+``manage.py rebuild_user_stats`` does the same for everybody after bulk
+edits that bypass signals.
+"""
+
+from django.contrib.auth.models import User
+from django.db.models import Count, F, Max, Sum
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Comment, Post, PostReads, UserStats
+
+STATUS_FIELDS = {
+    "draft": "draft_posts",
+    "published": "published_posts",
+    "scheduled": "scheduled_posts",
+}
+COUNTER_FIELDS = [*STATUS_FIELDS.values(), "comments"]
+
+
+def rebuild_user_stats(user_ids):
+    """Recount the stats of ``user_ids`` from their posts, comments and reads."""
+    rows = {
+        pk: UserStats(user_id=pk)
+        for pk in User.objects.filter(pk__in=user_ids).values_list("pk", flat=True)
+    }
+    if not rows:
+        return
+
+    def touch(stats, when):
+        if when and (stats.last_activity is None or when > stats.last_activity):
+            stats.last_activity = when
+
+    posts = (
+        Post.objects.filter(author_id__in=rows).order_by()
+        .values("author_id", "status").annotate(count=Count("id"), last=Max("updated_at"))
+    )
+    for row in posts:
+        stats = rows[row["author_id"]]
+        setattr(stats, STATUS_FIELDS[row["status"]], row["count"])
+        touch(stats, row["last"])
+
+    comments = (
+        Comment.objects.filter(user_id__in=rows).order_by()
+        .values("user_id").annotate(count=Count("id"), last=Max("created_on"))
+    )
+    for row in comments:
+        stats = rows[row["user_id"]]
+        stats.comments = row["count"]
+        touch(stats, row["last"])
+
+    reads = (
+        PostReads.objects.filter(post__author_id__in=rows).order_by()
+        .values("post__author_id").annotate(total=Sum("count"))
+    )
+    for row in reads:
+        rows[row["post__author_id"]].total_reads = row["total"]
+
+    UserStats.objects.bulk_create(
+        rows.values(),
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=[*COUNTER_FIELDS, "total_reads", "last_activity"],
+    )
+
+
+def stats_for(user):
+    """The stats row of ``user``, counted on the spot the first time."""
+    stats = UserStats.objects.filter(user=user).first()
+    if stats is None:
+        rebuild_user_stats([user.pk])
+        stats = UserStats.objects.get(user=user)
+    return stats
+
+
+def apply(user_id, touch=False, create=True, **deltas):
+    """
+    Add ``deltas`` (field=amount) to a user's row and, with ``touch``, record
+    activity now. A missing row is counted from scratch, which includes the
+    change at hand; deletions pass ``create=False`` because the user may be
+    on the way out too.
+    """
+    if user_id is None:
+        return
+    values = {name: F(name) + delta for name, delta in deltas.items() if delta}
+    if touch:
+        values["last_activity"] = timezone.now()
+    if values and not UserStats.objects.filter(user_id=user_id).update(**values) and create:
+        rebuild_user_stats([user_id])
+
+
+def status_moved(author_id, status, new_status, count=1):
+    """Deltas for ``count`` posts of one author moving between statuses."""
+    apply(author_id, touch=True, **{STATUS_FIELDS[status]: -count, STATUS_FIELDS[new_status]: count})
+
+
+# ==========================
+# RECEIVERS
+# ==========================
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._stats_previous = (
+        Post.objects.filter(pk=instance.pk).values_list("author_id", "status").first()
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_stats_previous", None)
+    instance._stats_previous = None
+    current = (instance.author_id, instance.status)
+
+    if created or previous is None:
+        apply(instance.author_id, touch=True, **{STATUS_FIELDS[instance.status]: 1})
+    elif previous == current:
+        apply(instance.author_id, touch=True)
+    elif previous[0] == current[0]:
+        status_moved(instance.author_id, previous[1], instance.status)
+    else:
+        apply(previous[0], create=False, **{STATUS_FIELDS[previous[1]]: -1})
+        apply(instance.author_id, touch=True, **{STATUS_FIELDS[instance.status]: 1})
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_reads(sender, instance, **kwargs):
+    # The daily read rows go with the post, so take their sum first
+    instance._stats_reads = instance.daily_reads.aggregate(total=Sum("count"))["total"] or 0
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    apply(
+        instance.author_id, create=False,
+        total_reads=-getattr(instance, "_stats_reads", 0),
+        **{STATUS_FIELDS[instance.status]: -1},
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        apply(instance.user_id, touch=True, comments=1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    apply(instance.user_id, create=False, comments=-1)
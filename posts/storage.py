@@ -0,0 +1,75 @@
+"""
+Content-addressed storage for user uploads.
+
+An upload is hashed in one streaming pass and stored as
+``blobs/<aa>/<bb>/<sha256><ext>``, the extension coming from the format
+Pillow reads in the content rather than from the client's filename. Uploading the same bytes again costs no
+disk space and returns the name (and so the URL) of the stored copy. Blob
+names never change meaning, which is also what lets image variants be
+shared between every row pointing at the same blob.
+
+Files derived from a blob (image variants) are written through
+``storage.derived``, a plain storage on the same directory.
+"""
+
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from PIL import Image
+
+BLOB_PREFIX = "blobs"
+
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp", "AVIF": ".avif"}
+
+
+def content_extension(content):
+    """Extension for the image format of ``content``; empty when it is no image."""
+    try:
+        with Image.open(content) as image:
+            image_format = image.format
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return ""
+    finally:
+        content.seek(0)
+    return FORMAT_EXTENSIONS.get(image_format, f".{image_format.lower()}")
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def __init__(self, *args, **kwargs):
+        # Writing a blob that already exists rewrites identical bytes, so a
+        # race between two identical uploads is harmless.
+        kwargs["allow_overwrite"] = True
+        super().__init__(*args, **kwargs)
+
+    @property
+    def derived(self):
+        return FileSystemStorage(location=self._location, base_url=self._base_url)
+
+    def blob_name(self, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        extension = content_extension(content)
+        return f"{BLOB_PREFIX}/{hexdigest[:2]}/{hexdigest[2:4]}/{hexdigest}{extension}"
+
+    def _save(self, name, content):
+        name = self.blob_name(content)
+        if self.exists(name):
+            # A re-upload restarts the blob's garbage-collection grace period
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
+
+
+_storage = None
+
+
+def blob_storage():
+    """Callable for ``FileField(storage=...)`` so migrations keep a reference, not an instance."""
+    global _storage
+    if _storage is None:
+        _storage = ContentAddressedStorage()
+    return _storage
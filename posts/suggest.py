@@ -0,0 +1,205 @@
+"""
+Tag autocomplete for the editor's tag manager.
+
+``tag_suggest`` runs on every keystroke, so it is answered from a
+process-local index of tag names instead of an ``icontains`` scan. Each
+process keeps the index next to the version stamp it was built from; the
+stamp lives in the shared Django cache and every tag change bumps it. The
+process that made the change patches its index in place, every other
+process notices the new stamp on its next lookup and rebuilds with one query.
+
+Tags created by ``Tag.objects.resolve()`` (a bulk insert, so no ``post_save``)
+are picked up when they are attached to the post a moment later.
+"""
+
+import bisect
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Post, Tag
+
+VERSION_KEY = "posts:tags:version"
+SUGGEST_LIMIT = 15
+
+# Ranking tiers: whole name starts with the query, a later word does, or it
+# only appears inside a word.
+NAME_PREFIX, WORD_PREFIX, INFIX = 0, 1, 2
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _word_starts(lower):
+    return [
+        i for i, char in enumerate(lower)
+        if char.isalnum() and (i == 0 or not lower[i - 1].isalnum())
+    ]
+
+
+class TagIndex:
+    """Sorted word suffixes for prefix lookups plus trigrams for infix ones."""
+
+    def __init__(self, rows=()):
+        self.tags = {}  # id -> [name, uses]
+        self._keys = []  # sorted (name from a word start on, id)
+        self._trigrams = defaultdict(set)
+        for pk, name, uses in rows:
+            self.add(pk, name, uses)
+
+    def _entries(self, name):
+        lower = name.lower()
+        return [lower[i:] for i in _word_starts(lower)], _trigrams(lower)
+
+    def add(self, pk, name, uses=0):
+        self.remove(pk)
+        self.tags[pk] = [name, uses]
+        keys, trigrams = self._entries(name)
+        for key in keys:
+            bisect.insort(self._keys, (key, pk))
+        for trigram in trigrams:
+            self._trigrams[trigram].add(pk)
+
+    def remove(self, pk):
+        entry = self.tags.pop(pk, None)
+        if entry is None:
+            return
+        keys, trigrams = self._entries(entry[0])
+        for key in keys:
+            i = bisect.bisect_left(self._keys, (key, pk))
+            if i < len(self._keys) and self._keys[i] == (key, pk):
+                del self._keys[i]
+        for trigram in trigrams:
+            self._trigrams[trigram].discard(pk)
+
+    def add_uses(self, pk, delta):
+        if pk in self.tags:
+            self.tags[pk][1] = max(self.tags[pk][1] + delta, 0)
+
+    def suggest(self, query, limit=SUGGEST_LIMIT):
+        """Matching (id, name) pairs: prefixes before infixes, then most used, then by name."""
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        tiers = {}
+        i = bisect.bisect_left(self._keys, (query,))
+        while i < len(self._keys) and self._keys[i][0].startswith(query):
+            key, pk = self._keys[i]
+            tier = NAME_PREFIX if key == self.tags[pk][0].lower() else WORD_PREFIX
+            tiers[pk] = min(tier, tiers.get(pk, INFIX))
+            i += 1
+
+        # One and two letter queries only match at word starts
+        if len(query) >= 3:
+            candidates = set.intersection(*(self._trigrams.get(t, set()) for t in _trigrams(query)))
+            for pk in candidates:
+                if pk not in tiers and query in self.tags[pk][0].lower():
+                    tiers[pk] = INFIX
+
+        ranked = sorted(
+            tiers,
+            key=lambda pk: (tiers[pk], -self.tags[pk][1], self.tags[pk][0].lower()),
+        )
+        return [(pk, self.tags[pk][0]) for pk in ranked[:limit]]
+
+
+# ==========================
+# PER-PROCESS STATE
+# ==========================
+
+_lock = threading.Lock()
+_state = {"version": None, "index": None}
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seeded from the clock, like the render cache generation
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY, 0)
+    return version
+
+
+def suggest_tags(query, limit=SUGGEST_LIMIT):
+    version = current_version()
+    with _lock:
+        if _state["index"] is None or _state["version"] != version:
+            rows = Tag.objects.annotate(uses=Count("post")).values_list("id", "name", "uses")
+            _state.update(index=TagIndex(rows), version=version)
+        return [
+            {"id": pk, "name": name}
+            for pk, name in _state["index"].suggest(query, limit)
+        ]
+
+
+def _tags_changed(apply=None):
+    """
+    Bump the shared version. If this process was current, patch its index with
+    ``apply`` and keep it; otherwise, without ``apply`` or when ``apply``
+    returns False, rebuild lazily.
+    """
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        version = None
+        current_version()
+
+    with _lock:
+        index = _state["index"]
+        current = index is not None and version is not None and _state["version"] == version - 1
+        if current and apply and apply(index) is not False:
+            _state["version"] = version
+        else:
+            _state["index"] = None
+
+
+# ==========================
+# SYNC SIGNALS
+# ==========================
+
+@receiver(post_save, sender=Tag)
+def index_saved_tag(sender, instance, raw=False, **kwargs):
+    if raw:
+        _tags_changed()
+        return
+
+    def apply(index):
+        uses = index.tags.get(instance.pk, [None, 0])[1]
+        index.add(instance.pk, instance.name, uses)
+
+    _tags_changed(apply)
+
+
+@receiver(post_delete, sender=Tag)
+def unindex_deleted_tag(sender, instance, **kwargs):
+    _tags_changed(lambda index: index.remove(instance.pk))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def reweigh_on_tag_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if action == "post_clear":
+        # No pk_set to work from
+        _tags_changed()
+        return
+
+    delta = 1 if action == "post_add" else -1
+
+    def apply(index):
+        tag_ids = [instance.pk] if reverse else pk_set
+        if any(pk not in index.tags for pk in tag_ids):
+            # A bulk-created tag this index has not seen yet
+            return False
+        step = delta * len(pk_set) if reverse else delta
+        for pk in tag_ids:
+            index.add_uses(pk, step)
+
+    _tags_changed(apply)
@@ -0,0 +1,64 @@
+from django import template
+from django.conf import settings
+from django.utils.html import escape, format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from posts.media import IMG_SRC_RE, media_names_in
+from posts.models import UploadedImage
+
+register = template.Library()
+
+
+def _picture(versions, img, sizes):
+    sources = format_html_join(
+        "", '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, srcset, sizes) for mime, srcset in versions.sources),
+    )
+    return format_html("<picture>{}{}</picture>", sources, img)
+
+
+@register.simple_tag
+def picture(versions, size="card", alt="", css_class="", sizes="100vw", loading="lazy"):
+    """
+    <picture> for an ImageVersions: AVIF/WebP sources plus an <img> in the
+    original format. Falls back to a plain <img> of the upload until the
+    variants exist.
+        {% picture post.image_versions "card" alt=post.title css_class="img-fluid" %}
+    """
+    src = versions[size]
+    if not versions.ready:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="{}">', src, alt, css_class, loading)
+
+    img = format_html(
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}">',
+        src, versions.srcset, sizes, alt, css_class, loading,
+    )
+    return _picture(versions, img, sizes)
+
+
+@register.filter
+def responsive_images(html, sizes="(max-width: 900px) 100vw, 900px"):
+    """
+    Give editor-uploaded <img> tags in post HTML their srcset and modern
+    formats. One query per call, for the uploads the HTML references.
+    """
+    html = str(html or "")
+    names = media_names_in(html)
+    if not names:
+        return mark_safe(html)
+
+    uploads = {
+        upload.file.name: upload.versions
+        for upload in UploadedImage.objects.filter(file__in=names)
+    }
+
+    def rewrite(match):
+        tag, src = match.group(0), match.group(1)
+        versions = uploads.get(src[len(settings.MEDIA_URL):])
+        if versions is None or not versions.ready or "srcset=" in tag:
+            return tag
+        img = tag[:-1].rstrip("/ ") + f' srcset="{escape(versions.srcset)}" sizes="{escape(sizes)}">'
+        return _picture(versions, mark_safe(img), sizes)
+
+    # Post HTML is trusted author content (rendered with |safe already)
+    return mark_safe(IMG_SRC_RE.sub(rewrite, html))
@@ -1,3 +1,1070 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from contextlib import contextmanager
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.cache import cache, caches
+from django.db import connection
+from django.db.models import QuerySet
+from django.db.models.query_utils import DeferredAttribute
+from django.template import Context, Template
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import ai, reads
+from .models import Category, Comment, Post, PostReads, Tag, UploadedImage, UserStats
+from .scheduling import publish_due_posts
+from .management.commands.explain_hot_queries import hot_queries
+from .media import collect_garbage
+from .search import SearchBackend, get_backend, search_page
+from .slugs import allocate_slug
+from .stats import rebuild_user_stats
+
+
+@contextmanager
+def forbid_deferred_loads():
+    """
+    Fail loudly when a deferred column is fetched lazily. On a listing that
+    means one extra query per card, which is exactly what cards() is for.
+    """
+    original_get = DeferredAttribute.__get__
+
+    def guarded_get(self, instance, cls=None):
+        if instance is not None and self.field.attname not in instance.__dict__:
+            raise AssertionError(
+                f"Deferred field {type(instance).__name__}.{self.field.attname} "
+                f"was loaded lazily (pk={instance.pk})"
+            )
+        return original_get(self, instance, cls)
+
+    with mock.patch.object(DeferredAttribute, "__get__", guarded_get):
+        yield
+
+
+def make_posts(author, count, category=None, tags=()):
+    posts = []
+    for i in range(count):
+        post = Post.objects.create(
+            title=f"Listing post {i}",
+            content=f"<p>Body of post {i}</p>",
+            author=author,
+            category=category,
+            status="published",
+        )
+        post.tags.set(tags)
+        Comment.objects.create(post=post, name="Reader", email="r@example.com", body="Nice", active=True)
+        Comment.objects.create(post=post, name="Spam", email="s@example.com", body="Buy", active=False)
+        posts.append(post)
+    return posts
+
+
+class ListingQueryCountTests(TestCase):
+    """Blog card pages must cost the same number of queries however many cards they show."""
+
+    def setUp(self):
+        cache.clear()
+        self.enterContext(forbid_deferred_loads())
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("writer", password="pass")
+        cls.category = Category.objects.create(name="Travel")
+        cls.tags = [Tag.objects.create(name="goa"), Tag.objects.create(name="beach")]
+        make_posts(cls.author, 8, cls.category, cls.tags)
+
+    def test_allblogs_page(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("allblogs"))
+        self.assertContains(response, "1 comments", count=8)
+
+    def test_allblogs_infinite_scroll_page(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse("allblogs"), HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+            )
+        self.assertEqual(response.json()["html"].count("1 Comments"), 8)
+
+    def test_index_page(self):
+        # The "most read" ranking normally sits in the cache already
+        reads.refresh_ranking()
+        with self.assertNumQueries(3):
+            self.client.get(reverse("index"))
+
+    def test_search_page(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("search"), {"q": "listing"})
+        self.assertContains(response, "1 comments", count=8)
+
+    def test_dashboard_page(self):
+        self.client.force_login(self.author)
+        make_posts(self.author, 4)
+        with self.assertNumQueries(7):
+            self.client.get(reverse("dashboard"))
+
+
+class CardsQuerySetTests(TestCase):
+    def test_cards_leave_heavy_columns_deferred(self):
+        author = User.objects.create_user("writer", password="pass")
+        make_posts(author, 1)
+        post = Post.objects.cards().get()
+        self.assertEqual(
+            post.get_deferred_fields(),
+            {"content", "plain_text", "meta_title", "meta_description"},
+        )
+
+    def test_guard_rejects_lazy_loads(self):
+        author = User.objects.create_user("writer", password="pass")
+        make_posts(author, 1)
+        post = Post.objects.cards().get()
+        with forbid_deferred_loads(), self.assertRaises(AssertionError):
+            post.content
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user("writer", password="pass")
+        cls.posts = make_posts(author, 20)
+        # Ties on created_at must still page cleanly thanks to the id tie-breaker
+        same_time = cls.posts[0].created_at
+        Post.objects.filter(pk__in=[p.pk for p in cls.posts[5:12]]).update(created_at=same_time)
+
+    def walk(self, fetch):
+        seen, cursor = [], None
+        while True:
+            page_ids, cursor = fetch(cursor)
+            seen.extend(page_ids)
+            if not cursor:
+                return seen
+
+    def setUp(self):
+        cache.clear()
+
+    def test_allblogs_scroll_visits_every_post_once(self):
+        def fetch(cursor):
+            params = {"cursor": cursor} if cursor else {}
+            with self.assertNumQueries(2):
+                data = self.client.get(
+                    reverse("allblogs"), params, HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+                ).json()
+            ids = [int(i) for i in re.findall(r'href="/singleblog/(\d+)/" class="white_bg_btn"', data["html"])]
+            self.assertEqual(bool(data["next_cursor"]), data["has_next"])
+            return ids, data["next_cursor"]
+
+        seen = self.walk(fetch)
+        expected = list(
+            Post.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_search_pages_visit_every_match_once(self):
+        def fetch(cursor):
+            page = search_page("listing", per_page=6, cursor=cursor)
+            return page.object_list, page.next_cursor
+
+        seen = self.walk(fetch)
+        self.assertEqual(sorted(seen), sorted(p.pk for p in self.posts))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_garbled_cursor_falls_back_to_first_page(self):
+        first = search_page("listing", per_page=6)
+        garbled = search_page("listing", per_page=6, cursor="not-a-cursor")
+        self.assertEqual(first.object_list, garbled.object_list)
+
+
+class RenderCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("writer", password="pass")
+        cls.post = make_posts(cls.author, 1)[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        self.assertEqual(self.client.get(reverse("allblogs"))["X-Render-Cache"], "miss")
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("allblogs"))
+        self.assertEqual(response["X-Render-Cache"], "hit")
+        self.assertContains(response, "Listing post 0")
+
+    def test_content_changes_invalidate(self):
+        self.client.get(reverse("index"))
+        Post.objects.filter(pk=self.post.pk).get().save()
+        self.assertEqual(self.client.get(reverse("index"))["X-Render-Cache"], "miss")
+
+        self.client.get(reverse("index"))
+        Comment.objects.create(post=self.post, name="New", email="n@example.com", body="Hi")
+        self.assertEqual(self.client.get(reverse("index"))["X-Render-Cache"], "miss")
+
+    def test_logged_in_users_bypass_cache(self):
+        self.client.force_login(self.author)
+        self.client.get(reverse("allblogs"))
+        self.assertNotIn("X-Render-Cache", self.client.get(reverse("allblogs")))
+
+    def test_cached_page_gets_the_visitors_csrf_token(self):
+        url = reverse("singleblog", args=[self.post.pk])
+        self.client.get(url)
+
+        other = self.client_class(enforce_csrf_checks=True)
+        response = other.get(url)
+        self.assertEqual(response["X-Render-Cache"], "hit")
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode()).group(1)
+
+        response = other.post(url, {
+            "csrfmiddlewaretoken": token,
+            "name": "Reader",
+            "email": "reader@example.com",
+            "body": "Lovely trip",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Comment.objects.filter(body="Lovely trip").exists())
+
+
+class SingleBlogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user("writer", password="pass")
+        cls.posts = make_posts(author, 5)
+        # Middle three share a timestamp; navigation must still step by id
+        Post.objects.filter(pk__in=[p.pk for p in cls.posts[1:4]]).update(
+            created_at=cls.posts[1].created_at
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_neighbors_follow_created_at_then_id(self):
+        ordered = list(Post.objects.order_by("-created_at", "-id"))
+        for i, post in enumerate(ordered):
+            loaded = Post.objects.with_neighbor_ids().get(pk=post.pk)
+            previous_post, next_post = loaded.neighbors()
+            self.assertEqual(previous_post, ordered[i - 1] if i > 0 else None)
+            self.assertEqual(next_post, ordered[i + 1] if i + 1 < len(ordered) else None)
+
+    def test_singleblog_query_count(self):
+        with forbid_deferred_loads(), self.assertNumQueries(3):
+            response = self.client.get(reverse("singleblog", args=[self.posts[2].pk]))
+        self.assertContains(response, "1 Comments")
+
+    def test_neighbor_images_need_no_extra_queries(self):
+        ordered = list(Post.objects.order_by("-created_at", "-id"))
+        Post.objects.filter(pk__in=[ordered[1].pk, ordered[3].pk]).update(
+            image="posts/2026/10/cover.jpg", image_variants={}
+        )
+        with forbid_deferred_loads(), self.assertNumQueries(3):
+            response = self.client.get(reverse("singleblog", args=[ordered[2].pk]))
+        self.assertContains(response, "cover.jpg", count=2)
+
+
+class SearchIndexSyncTests(TestCase):
+    def setUp(self):
+        if type(get_backend()) is SearchBackend:
+            self.skipTest("needs a full-text backend (FTS5 or PostgreSQL)")
+        self.author = User.objects.create_user("writer", password="pass")
+        self.tag = Tag.objects.create(name="beaches")
+        self.category = Category.objects.create(name="Coast")
+        self.post = Post.objects.create(
+            title="Monsoon trip", content="<p>Rain all week</p>", author=self.author,
+            category=self.category, status="published",
+        )
+
+    def found(self, query):
+        return search_page(query).object_list
+
+    def test_post_save_and_delete(self):
+        self.assertEqual(self.found("rain"), [self.post.pk])
+        self.post.status = "draft"
+        self.post.save()
+        self.assertEqual(self.found("rain"), [])
+
+        self.post.status = "published"
+        self.post.save()
+        self.post.delete()
+        self.assertEqual(self.found("rain"), [])
+
+    def test_tag_add_remove_and_clear(self):
+        self.post.tags.add(self.tag)
+        self.assertEqual(self.found("beaches"), [self.post.pk])
+        self.post.tags.remove(self.tag)
+        self.assertEqual(self.found("beaches"), [])
+
+        self.tag.post_set.add(self.post)
+        self.assertEqual(self.found("beaches"), [self.post.pk])
+        self.tag.post_set.clear()
+        self.assertEqual(self.found("beaches"), [])
+
+        self.post.tags.add(self.tag)
+        self.post.tags.clear()
+        self.assertEqual(self.found("beaches"), [])
+
+    def test_tag_rename_and_delete(self):
+        self.post.tags.add(self.tag)
+        self.tag.name = "lagoons"
+        self.tag.save()
+        self.assertEqual(self.found("beaches"), [])
+        self.assertEqual(self.found("lagoons"), [self.post.pk])
+
+        self.tag.delete()
+        self.assertEqual(self.found("lagoons"), [])
+
+    def test_category_rename_and_delete(self):
+        self.assertEqual(self.found("coast"), [self.post.pk])
+        self.category.name = "Backwaters"
+        self.category.save()
+        self.assertEqual(self.found("coast"), [])
+        self.assertEqual(self.found("backwaters"), [self.post.pk])
+
+        self.category.delete()
+        self.assertEqual(self.found("backwaters"), [])
+        self.assertEqual(self.found("rain"), [self.post.pk])
+
+    def test_title_matches_rank_above_body_matches(self):
+        in_title = Post.objects.create(
+            title="Goa on foot", content="<p>Walking the coast</p>", author=self.author, status="published",
+        )
+        in_body = Post.objects.create(
+            title="Beach walks", content="<p>We spent a week in Goa</p>", author=self.author, status="published",
+        )
+        # Newer posts come first on a score tie, so only the rank can put the title match on top
+        self.assertLess(in_title.pk, in_body.pk)
+        self.assertEqual(self.found("goa"), [in_title.pk, in_body.pk])
+
+
+class ScheduledPublishingTests(TestCase):
+    def test_publishes_only_due_posts_once(self):
+        author = User.objects.create_user("writer", password="pass")
+        now = timezone.now()
+        due = Post.objects.create(
+            title="Monsoon in Goa", content="<p>Rain</p>", author=author,
+            status="scheduled", publish_at=now - timedelta(minutes=5),
+        )
+        later = Post.objects.create(
+            title="Winter in Goa", content="<p>Cold</p>", author=author,
+            status="scheduled", publish_at=now + timedelta(days=1),
+        )
+
+        self.assertEqual(publish_due_posts(batch_size=1), 1)
+        self.assertEqual(publish_due_posts(), 0)
+
+        due.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual(due.status, "published")
+        self.assertEqual(due.created_at, due.publish_at)
+        self.assertEqual(later.status, "scheduled")
+        self.assertEqual(search_page("goa").object_list, [due.pk])
+
+    def test_overlapping_run_leaves_counters_alone(self):
+        author = User.objects.create_user("writer", password="pass")
+        due = Post.objects.create(
+            title="Monsoon in Goa", author=author,
+            status="scheduled", publish_at=timezone.now() - timedelta(minutes=5),
+        )
+        stats = UserStats.objects.values_list("scheduled_posts", "published_posts")
+        self.assertEqual(stats.get(user=author), (1, 0))
+
+        original_update = QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            # The other run commits its flip (and its counters) between this
+            # run's read of the batch and its UPDATE
+            original_update(Post.objects.filter(pk=due.pk), status="published")
+            return original_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", racing_update):
+            self.assertEqual(publish_due_posts(), 0)
+        self.assertEqual(stats.get(user=author), (1, 0))
+
+
+class SlugAllocationTests(TestCase):
+    def test_next_suffix_comes_from_one_query(self):
+        author = User.objects.create_user("writer", password="pass")
+        for slug in ("trip-to-goa", "trip-to-goa-1", "trip-to-goa-7", "trip-to-goa-beaches"):
+            Post.objects.create(title="Trip", slug=slug, author=author)
+
+        post = Post(title="Trip to Goa", author=author)
+        with self.assertNumQueries(1):
+            post.slug = allocate_slug(Post, post.title, 260)
+        self.assertEqual(post.slug, "trip-to-goa-8")
+
+    def test_base_is_used_while_free(self):
+        author = User.objects.create_user("writer", password="pass")
+        Post.objects.create(title="Trip", slug="goa-3", author=author)
+        self.assertEqual(Post.objects.create(title="Goa", author=author).slug, "goa")
+
+    def test_numeric_title_tail_is_not_a_suffix(self):
+        author = User.objects.create_user("writer", password="pass")
+        self.assertEqual(Post.objects.create(title="Goa 2024", author=author).slug, "goa-2024")
+        self.assertEqual(Post.objects.create(title="Goa", author=author).slug, "goa")
+        self.assertEqual(Post.objects.create(title="Goa", author=author).slug, "goa-1")
+        self.assertEqual(Post.objects.create(title="Goa!", author=author).slug, "goa-2")
+
+    def test_lost_race_retries_with_a_fresh_slug(self):
+        Category.objects.create(name="Treks")
+        category = Category(name="Treks!")
+        # Simulate a concurrent insert that grabbed the same slug after we looked
+        with mock.patch("posts.slugs.allocate_slug", side_effect=["treks", "treks-1"]):
+            category.save()
+        self.assertEqual(category.slug, "treks-1")
+
+
+class TagResolutionTests(TestCase):
+    def test_resolves_in_bulk_and_dedupes_case_insensitively(self):
+        hiking = Tag.objects.create(name="Hiking")
+        names = ["hiking", "Goa", "GOA"] + [f"Trail {i}" for i in range(20)]
+
+        with self.assertNumQueries(3):
+            tags = Tag.objects.resolve(ids=[hiking.pk], names=names)
+
+        self.assertEqual(tags[0], hiking)
+        self.assertEqual([t.name for t in tags[1:3]], ["Goa", "Trail 0"])
+        self.assertEqual(len(tags), 22)
+        self.assertEqual(Tag.objects.count(), 22)
+
+    def test_slug_clash_gets_its_own_slug(self):
+        Tag.objects.create(name="C")
+        (tag,) = Tag.objects.resolve(names=["C++"])
+        self.assertEqual((tag.name, tag.slug), ("C++", "c-1"))
+
+
+class TagSuggestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user("writer", password="pass")
+        self.goa = Tag.objects.create(name="Goa")
+        self.north_goa = Tag.objects.create(name="North Goa")
+        self.goats = Tag.objects.create(name="Goats")
+        post = Post.objects.create(title="Beaches", author=author)
+        post.tags.add(self.goats)
+
+    def suggest(self, q, **headers):
+        return self.client.get(reverse("tag_suggest"), {"q": q}, **headers)
+
+    def test_prefix_matches_rank_first_and_updates_stay_in_memory(self):
+        response = self.suggest("goa")
+        names = [t["name"] for t in response.json()["results"]]
+        # Name prefixes (most used first) before later-word prefixes
+        self.assertEqual(names, ["Goats", "Goa", "North Goa"])
+
+        Tag.objects.create(name="Goan Food")
+        with self.assertNumQueries(0):
+            names = [t["name"] for t in self.suggest("goan").json()["results"]]
+        self.assertEqual(names, ["Goan Food"])
+
+    def test_etag_revalidates_until_tags_change(self):
+        first = self.suggest("go")
+        self.assertIn("max-age=60", first["Cache-Control"])
+
+        again = self.suggest("go", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+        self.goa.delete()
+        changed = self.suggest("go", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotIn("Goa", [t["name"] for t in changed.json()["results"]])
+
+
+def sse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+@override_settings(AI_BACKEND="posts.ai.FakeBackend", AI_QUEUE_TIMEOUT=0.05)
+class AIStreamingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["ai"].clear()
+
+    async def read(self, response):
+        return "".join([chunk.decode() async for chunk in response.streaming_content])
+
+    async def login(self):
+        self.user = await User.objects.acreate_user("writer", password="pass")
+        await self.async_client.aforce_login(self.user)
+
+    async def post(self, name, payload):
+        return await self.async_client.post(
+            reverse(name), json.dumps(payload), content_type="application/json"
+        )
+
+    async def test_streams_deltas_then_done(self):
+        await self.login()
+        response = await self.post("ai_fix", {"content": "<p>Teh trail to the lake was long</p>"})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        events = sse_events(await self.read(response))
+        self.assertEqual(events[-1], ("done", {}))
+        deltas = [data["text"] for event, data in events if event == "delta"]
+        self.assertGreater(len(deltas), 1)
+        self.assertEqual("".join(deltas), "<p>Teh trail to the lake was long</p>")
+
+    async def test_one_stream_per_user(self):
+        await self.login()
+        async with ai.limiter.slot(self.user.pk):
+            response = await self.post("ai_write", {"prompt": "Monsoon treks"})
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(AI_MAX_CONCURRENT=1)
+    async def test_waits_for_a_global_slot_then_gives_up(self):
+        await self.login()
+        async with ai.limiter.slot("someone-else"):
+            response = await self.post("ai_improve", {"content": "<p>Hi</p>"})
+            events = sse_events(await self.read(response))
+        self.assertEqual(events[-1][0], "error")
+        self.assertTrue(events[-1][1]["busy"])
+
+    async def test_a_stream_that_is_never_read_holds_no_slot(self):
+        await self.login()
+        for kind, chunked in (("write", False), ("fix", True)):
+            events = await ai.open_stream(kind, "<p>Teh lake</p>", self.user.pk, chunked=chunked)
+            del events
+            async with ai.limiter.slot(self.user.pk):
+                pass
+
+    async def test_an_unread_stream_leaves_nothing_in_flight(self):
+        await self.login()
+        events = await ai.open_stream("improve", "<p>Hi there</p>", self.user.pk)
+        del events
+        self.assertEqual(ai._inflight, {})
+
+        response = await self.post("ai_improve", {"content": "<p>Hi there</p>"})
+        self.assertEqual(sse_events(await self.read(response))[-1], ("done", {}))
+        self.assertEqual(ai._inflight, {})
+
+    @override_settings(AI_TIMEOUT=0.05)
+    async def test_followers_stop_waiting_for_a_stuck_completion(self):
+        await self.login()
+        key = ai.response_key("improve", "<p>Hi</p>")
+        stuck = ai._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            response = await self.post("ai_improve", {"content": "<p>Hi</p>"})
+            events = sse_events(await self.read(response))
+        finally:
+            del ai._inflight[key]
+        self.assertEqual(events, [("error", {"error": "The AI assistant failed, please try again."})])
+        self.assertFalse(stuck.done())
+
+    @override_settings(AI_MAX_CONCURRENT=1)
+    async def test_global_limit_holds_across_event_loops(self):
+        async def other_loop():
+            async with ai.limiter.backend_call():
+                pass
+
+        async with ai.limiter.backend_call():
+            with self.assertRaises(ai.AIBusy):
+                await asyncio.to_thread(asyncio.run, other_loop())
+        await asyncio.to_thread(asyncio.run, other_loop())
+
+    @override_settings(AI_TIMEOUT=0.05, AI_FAKE_DELAY=1)
+    async def test_slow_completion_times_out(self):
+        await self.login()
+        response = await self.post("ai_improve", {"content": "<p>Hi</p>"})
+        events = sse_events(await self.read(response))
+        self.assertEqual(events[-1][0], "error")
+        # The slot is free again
+        async with ai.limiter.slot(self.user.pk):
+            pass
+
+    async def test_unchanged_content_is_answered_from_cache(self):
+        await self.login()
+        first = await self.post("ai_fix", {"content": "<p>Teh lake</p>"})
+        await self.read(first)
+
+        with mock.patch.object(ai, "get_backend") as backend:
+            again = await self.post("ai_fix", {"content": "  <p>Teh   lake</p>\n"})
+            body = await self.read(again)
+        backend.assert_not_called()
+        self.assertEqual(sse_events(body), [("delta", {"text": "<p>Teh lake</p>"}), ("done", {})])
+        self.assertEqual(ai.cache_stats(), {"hit": 1, "miss": 1, "coalesced": 0})
+
+    @override_settings(AI_FAKE_DELAY=0.01)
+    async def test_identical_requests_in_flight_share_one_completion(self):
+        await self.login()
+        other = AsyncClient()
+        await other.aforce_login(await User.objects.acreate_user("editor", password="pass"))
+        payload = json.dumps({"content": "<p>Long walk to the fort and back again today</p>"})
+
+        async def request(client):
+            response = await client.post(reverse("ai_improve"), payload, content_type="application/json")
+            return sse_events(await self.read(response))
+
+        first, second = await asyncio.gather(request(self.async_client), request(other))
+        self.assertEqual(first[-1], second[-1])
+        self.assertEqual(
+            "".join(d["text"] for e, d in first if e == "delta"),
+            "".join(d["text"] for e, d in second if e == "delta"),
+        )
+        self.assertEqual(ai.cache_stats(), {"hit": 0, "miss": 1, "coalesced": 1})
+
+    @override_settings(AI_FAKE_DELAY=0.01, AI_FIX_PARALLEL=2)
+    async def test_chunked_fix_only_redoes_changed_blocks(self):
+        await self.login()
+        blocks = ["<h2>Day one</h2>", "<p>We left at dawn for the pass</p>", "<p><br></p>",
+                  "<ul><li>Water</li><li>Snacks</li></ul>", "<p>Camp by the lake</p>"]
+
+        response = await self.post("ai_fix", {"content": "".join(blocks), "chunked": True})
+        events = sse_events(await self.read(response))
+        self.assertEqual(events[-1], ("done", {}))
+        self.assertEqual([d["text"] for e, d in events if e == "delta"], blocks)
+        self.assertEqual(ai.cache_stats(), {"hit": 0, "miss": 4, "coalesced": 0})
+
+        blocks[1] = "<p>We left before dawn for the pass</p>"
+        response = await self.post("ai_fix", {"content": "".join(blocks), "chunked": True})
+        await self.read(response)
+        self.assertEqual(ai.cache_stats(), {"hit": 3, "miss": 5, "coalesced": 0})
+
+    @override_settings(AI_FAKE_DELAY=0.01, AI_FIX_PARALLEL=4, AI_MAX_CONCURRENT=2, AI_QUEUE_TIMEOUT=5)
+    async def test_chunked_fix_blocks_count_against_the_global_limit(self):
+        await self.login()
+        fake, running, peak = ai.FakeBackend(), 0, 0
+
+        class CountingBackend:
+            async def stream(self, prompt, model):
+                nonlocal running, peak
+                running += 1
+                peak = max(peak, running)
+                try:
+                    async for delta in fake.stream(prompt, model):
+                        yield delta
+                finally:
+                    running -= 1
+
+        content = "".join(f"<p>Block number {i} of the walk</p>" for i in range(8))
+        with mock.patch.object(ai, "get_backend", return_value=CountingBackend()):
+            response = await self.post("ai_fix", {"content": content, "chunked": True})
+            events = sse_events(await self.read(response))
+        self.assertEqual(events[-1], ("done", {}))
+        self.assertEqual(peak, 2)
+
+    @override_settings(AI_FAKE_DELAY=0.05, AI_FIX_TIMEOUT=0.1)
+    async def test_chunked_fix_has_a_deadline_for_the_whole_document(self):
+        await self.login()
+        content = "".join(f"<p>Block number {i} of a long walk up the hill</p>" for i in range(6))
+        response = await self.post("ai_fix", {"content": content, "chunked": True})
+        events = sse_events(await self.read(response))
+        self.assertEqual(events[-1], ("error", {"error": "The AI assistant took too long to answer."}))
+        self.assertEqual(ai._inflight, {})
+
+
+def jpeg_upload(name="photo.jpg", size=(2000, 1000)):
+    buffer = BytesIO()
+    Image.new("RGB", size, "teal").save(buffer, "JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(self.settings(MEDIA_ROOT=media_root, IMAGE_PROCESSING="sync"))
+        self.author = User.objects.create_user("writer", password="pass")
+
+    def test_post_image_gets_resized_variants_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(title="Dunes", author=self.author, image=jpeg_upload())
+        post.refresh_from_db()
+
+        versions = post.image_versions
+        self.assertTrue(versions.ready)
+        self.assertEqual(
+            {name: v["width"] for name, v in post.image_variants["variants"].items()},
+            {"thumb": 320, "card": 640, "hero": 1600},
+        )
+        self.assertTrue(versions["card"].endswith("/640w.jpg"))
+        self.assertIn("image/webp", dict(versions.sources))
+
+        html = Template('{% load responsive_images %}{% picture v "card" alt="Dunes" %}').render(Context({"v": versions}))
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn("640w.jpg 640w", html)
+
+    def test_default_avatar_is_not_processed(self):
+        with self.assertNoLogs("posts.images"), self.captureOnCommitCallbacks(execute=True) as callbacks:
+            user = User.objects.create_user("reader", password="pass")
+        self.assertEqual(callbacks, [])
+        user.profile.refresh_from_db()
+        self.assertEqual(user.profile.avatar.name, "avatars/default.png")
+        self.assertEqual(user.profile.avatar_variants, {})
+
+    def test_unprocessed_image_falls_back_to_the_original(self):
+        post = Post.objects.create(title="Dunes", author=self.author, image=jpeg_upload())
+        self.assertFalse(post.image_versions.ready)
+        self.assertEqual(post.image_versions["card"], post.image.url)
+
+    def test_editor_images_in_post_html_get_a_srcset(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            upload = UploadedImage.objects.create(file=jpeg_upload(size=(800, 600)))
+        content = f'<p>Look</p><p><img src="{upload.file.url}"></p>'
+
+        html = Template("{% load responsive_images %}{{ content|responsive_images }}").render(
+            Context({"content": content})
+        )
+        # Never upscaled: the 800px original caps the hero variant
+        self.assertIn("800w.jpg 800w", html)
+        self.assertIn("<picture>", html)
+
+
+class MediaStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.enterContext(self.settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING="sync"))
+        self.author = User.objects.create_user("writer", password="pass")
+        self.client.force_login(self.author)
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.media_root)
+            for root, _, names in os.walk(self.media_root) for name in names
+        )
+
+    def test_identical_uploads_are_stored_once(self):
+        first = Post.objects.create(title="One", author=self.author, image=jpeg_upload("a.jpg"))
+        second = Post.objects.create(title="Two", author=self.author, image=jpeg_upload("b.JPG"))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith("blobs/"))
+        self.assertEqual(len(self.stored_files()), 1)
+
+        urls = [
+            self.client.post(reverse("editor_image_upload"), {"image": jpeg_upload("c.jpg")}).json()["url"]
+            for _ in range(2)
+        ]
+        self.assertEqual(urls[0], urls[1])
+        self.assertEqual(UploadedImage.objects.count(), 1)
+
+    def test_blob_extension_comes_from_the_content(self):
+        post = Post.objects.create(title="One", author=self.author, image=jpeg_upload("photo.html"))
+        self.assertTrue(post.image.name.endswith(".jpg"))
+
+    def test_gc_keeps_images_of_posts_that_were_never_tracked(self):
+        url = self.client.post(reverse("editor_image_upload"), {"image": jpeg_upload()}).json()["url"]
+        post = Post.objects.create(title="Old", author=self.author)
+        # Written before upload tracking existed: no post_save ever saw it
+        Post.objects.filter(pk=post.pk).update(content=f'<p><img src="{url}"></p>')
+        self.assertEqual(post.uploads.count(), 0)
+
+        self.assertEqual(collect_garbage(grace=timedelta(0)), (0, 0))
+        self.assertEqual(post.uploads.count(), 1)
+        self.assertTrue(UploadedImage.objects.exists())
+
+    def test_reupload_restarts_the_grace_period(self):
+        url = self.client.post(reverse("editor_image_upload"), {"image": jpeg_upload()}).json()["url"]
+        # An orphan from two days ago, past the 24h grace period
+        two_days_ago = timezone.now() - timedelta(days=2)
+        UploadedImage.objects.update(created_at=two_days_ago)
+        for name in self.stored_files():
+            os.utime(os.path.join(self.media_root, name), (two_days_ago.timestamp(),) * 2)
+
+        # Pasted into a draft that has not been saved yet
+        again = self.client.post(reverse("editor_image_upload"), {"image": jpeg_upload()}).json()["url"]
+        self.assertEqual(again, url)
+        with self.settings(EDITOR_UPLOAD_STAGING_DIR=self.media_root):
+            call_command("gc_media", stdout=StringIO())
+
+        upload = UploadedImage.objects.get()
+        self.assertIn(upload.file.name, self.stored_files())
+
+    def test_gc_removes_what_deleted_posts_left_behind(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            kept = Post.objects.create(title="Kept", author=self.author, image=jpeg_upload(size=(700, 400)))
+            url = self.client.post(
+                reverse("editor_image_upload"), {"image": jpeg_upload(size=(900, 500))}
+            ).json()["url"]
+            gone = Post.objects.create(
+                title="Gone", author=self.author, content=f'<p><img src="{url}"></p>',
+            )
+        self.assertEqual(gone.uploads.count(), 1)
+        files_before = self.stored_files()
+
+        self.assertEqual(collect_garbage(grace=timedelta(0)), (0, 0))
+        gone.delete()
+        uploads, files = collect_garbage(grace=timedelta(0))
+
+        self.assertEqual(uploads, 1)
+        self.assertEqual(UploadedImage.objects.count(), 0)
+        remaining = self.stored_files()
+        self.assertEqual(len(files_before) - len(remaining), files)
+        self.assertIn(kept.image.name, remaining)
+        self.assertTrue(all("900w" not in name for name in remaining))
+
+
+class EditorUploadTests(TestCase):
+    def setUp(self):
+        media_root, staging = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.addCleanup(shutil.rmtree, staging)
+        self.enterContext(self.settings(
+            MEDIA_ROOT=media_root,
+            IMAGE_PROCESSING="off",
+            EDITOR_UPLOAD_STAGING_DIR=staging,
+            EDITOR_UPLOAD_CHUNK_SIZE=1024,
+        ))
+        self.author = User.objects.create_user("writer", password="pass")
+        self.client.force_login(self.author)
+
+    def test_non_images_are_refused_while_streaming(self):
+        fake = SimpleUploadedFile("evil.jpg", b"<svg onload=alert(1)>" * 100, content_type="image/jpeg")
+        response = self.client.post(reverse("editor_image_upload"), {"image": fake})
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(UploadedImage.objects.exists())
+
+    def test_oversized_uploads_stop_early(self):
+        with self.settings(EDITOR_UPLOAD_MAX_SIZE=1000):
+            response = self.client.post(reverse("editor_image_upload"), {"image": jpeg_upload()})
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(UploadedImage.objects.exists())
+
+    def test_extension_comes_from_the_content(self):
+        response = self.client.post(reverse("editor_image_upload"), {"image": jpeg_upload("photo.html")})
+        self.assertTrue(response.json()["url"].endswith(".jpg"))
+
+    def put_chunk(self, upload_id, data, start, total):
+        return self.client.put(
+            reverse("editor_upload_chunk", args=[upload_id]), data,
+            content_type="application/octet-stream",
+            headers={"Content-Range": f"bytes {start}-{start + len(data) - 1}/{total}"},
+        )
+
+    def test_chunked_upload_resumes_from_the_stored_offset(self):
+        buffer = BytesIO()
+        Image.effect_noise((300, 200), 64).convert("RGB").save(buffer, "JPEG")
+        data = buffer.getvalue()
+        upload_id = self.client.post(
+            reverse("editor_upload_start"), {"size": len(data)}, content_type="application/json",
+        ).json()["upload_id"]
+
+        self.assertEqual(self.put_chunk(upload_id, data[:1024], 0, len(data)).json()["offset"], 1024)
+        # A chunk past the offset is refused with the offset to resume from
+        skipped = self.put_chunk(upload_id, data[2048:3072], 2048, len(data))
+        self.assertEqual((skipped.status_code, skipped.json()["offset"]), (409, 1024))
+        status = self.client.get(reverse("editor_upload_chunk", args=[upload_id])).json()
+        self.assertEqual(status["offset"], 1024)
+
+        offset = status["offset"]
+        while offset < len(data):
+            response = self.put_chunk(upload_id, data[offset:offset + 1024], offset, len(data))
+            offset += 1024
+        self.assertTrue(response.json()["url"].endswith(".jpg"))
+        self.assertEqual(UploadedImage.objects.get().uploaded_by, self.author)
+        self.assertEqual(self.client.get(reverse("editor_upload_chunk", args=[upload_id])).status_code, 404)
+
+    def test_chunked_upload_rejects_bad_first_chunk(self):
+        upload_id = self.client.post(
+            reverse("editor_upload_start"), {"size": 4000}, content_type="application/json",
+        ).json()["upload_id"]
+        self.assertEqual(self.put_chunk(upload_id, b"MZ" + b"\0" * 1000, 0, 4000).status_code, 415)
+        self.assertEqual(self.client.get(reverse("editor_upload_chunk", args=[upload_id])).status_code, 404)
+
+        other = User.objects.create_user("other", password="pass")
+        upload_id = self.client.post(
+            reverse("editor_upload_start"), {"size": 4000}, content_type="application/json",
+        ).json()["upload_id"]
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse("editor_upload_chunk", args=[upload_id])).status_code, 404)
+
+
+class PostTextTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user("writer", password="pass")
+
+    def test_refresh_text_fields(self):
+        post = Post(content="<p>Up the &amp; <b>ridge</b> and down</p>")
+        post.refresh_text_fields()
+        self.assertEqual(
+            (post.plain_text, post.excerpt, post.word_count, post.read_time),
+            ("Up the & ridge and down", "Up the & ridge and down", 5, 1),
+        )
+
+        for content in ("", '<p><img src="/media/blobs/a.jpg"></p>'):
+            post = Post(content=content)
+            post.refresh_text_fields()
+            self.assertEqual((post.plain_text, post.excerpt, post.word_count, post.read_time), ("", "", 0, 1))
+
+    def test_backfill_fills_only_missing_text(self):
+        words = Post.objects.create(title="Words", author=self.author, content="<p>" + "step " * 600 + "</p>")
+        image_only = Post.objects.create(
+            title="Image", author=self.author, content='<p><img src="/media/blobs/a.jpg"></p>',
+        )
+        empty = Post.objects.create(title="Empty", author=self.author)
+        # Rows from before the derived columns existed
+        Post.objects.update(plain_text="", excerpt="", word_count=0, read_time=1)
+        # Already backfilled: plain text present, stale count left alone
+        done = Post.objects.create(title="Done", author=self.author, content="<p>one two</p>")
+        Post.objects.filter(pk=done.pk).update(word_count=0)
+
+        out = StringIO()
+        call_command("backfill_post_text", stdout=out)
+        self.assertIn("Backfilled 2 posts.", out.getvalue())
+
+        words.refresh_from_db()
+        self.assertEqual((words.word_count, words.read_time), (600, 3))
+        self.assertTrue(words.excerpt.startswith("step step"))
+        image_only.refresh_from_db()
+        self.assertEqual((image_only.plain_text, image_only.word_count, image_only.read_time), ("", 0, 1))
+        empty.refresh_from_db()
+        self.assertEqual((empty.plain_text, empty.word_count), ("", 0))
+        done.refresh_from_db()
+        self.assertEqual(done.word_count, 0)
+
+        call_command("backfill_post_text", "--all", stdout=StringIO())
+        done.refresh_from_db()
+        self.assertEqual(done.word_count, 2)
+
+
+class ExplainHotQueriesTests(TestCase):
+    def test_every_hot_query_is_explained_and_uses_its_index(self):
+        out = StringIO()
+        call_command("explain_hot_queries", "--verbose-plans", "--fail-on-scan", stdout=out)
+        output = out.getvalue()
+
+        for view, description, _ in hot_queries():
+            self.assertIn(f"[{view}] {description}", output)
+        verdicts = [line for line in output.splitlines() if not line.startswith(" ")]
+        self.assertEqual(len(verdicts), len(hot_queries()))
+        self.assertTrue(all(line.startswith("OK ") for line in verdicts), output)
+
+        if connection.vendor == "sqlite":
+            for index in (
+                "post_status_created_idx", "post_author_created_idx", "comment_post_active_idx",
+                "comment_user_created_idx", "business_public_name_idx", "location_business_active_idx",
+                "location_city_idx", "quote_business_created_idx",
+            ):
+                self.assertIn(index, output)
+
+
+class UserStatsTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user("writer", password="pass")
+
+    def counters(self):
+        stats = UserStats.objects.get(user=self.author)
+        return stats.draft_posts, stats.published_posts, stats.scheduled_posts, stats.comments
+
+    def test_counters_follow_posts_and_comments(self):
+        posts = make_posts(self.author, 3)
+        Comment.objects.create(post=posts[0], user=self.author, name="w", email="w@example.com", body="Hi")
+        draft = Post.objects.create(title="Draft", author=self.author)
+        self.assertEqual(self.counters(), (1, 3, 0, 1))
+
+        draft.status = "scheduled"
+        draft.publish_at = timezone.now() - timedelta(minutes=1)
+        draft.save()
+        self.assertEqual(self.counters(), (0, 3, 1, 1))
+        publish_due_posts()
+        self.assertEqual(self.counters(), (0, 4, 0, 1))
+
+        posts[0].delete()  # takes the author's comment with it
+        self.assertEqual(self.counters(), (0, 3, 0, 0))
+
+        UserStats.objects.all().delete()
+        rebuild_user_stats([self.author.pk])
+        self.assertEqual(self.counters(), (0, 3, 0, 0))
+
+    def test_deleting_a_user_leaves_no_stats_behind(self):
+        make_posts(self.author, 2)
+        self.author.delete()
+        self.assertFalse(UserStats.objects.exists())
+
+    def test_dashboard_reads_the_stats_row_and_pages_the_timeline(self):
+        make_posts(self.author, 12)
+        self.client.force_login(self.author)
+
+        response = self.client.get(reverse("dashboard"))
+        self.assertContains(response, "Total Posts: 12")
+        posts = response.context["posts"]
+        self.assertEqual(len(posts), 10)
+        self.assertTrue(posts.has_next())
+
+        older = self.client.get(reverse("dashboard"), {"posts": posts.next_cursor}).context["posts"]
+        self.assertEqual([p.title for p in older], ["Listing post 1", "Listing post 0"])
+
+        profile = self.client.get(reverse("profile", args=[self.author.username]))
+        self.assertContains(profile, "Posts: 12")
+        self.assertEqual(len(profile.context["posts"]), 3)
+
+
+class ReadCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enterContext(mock.patch.object(reads, "_buffer", reads.ReadBuffer()))
+        self.author = User.objects.create_user("writer", password="pass")
+        self.posts = make_posts(self.author, 6)
+
+    def read(self, post, times=1):
+        for _ in range(times):
+            self.client.get(reverse("singleblog", args=[post.pk]))
+
+    def test_reads_are_buffered_then_written_in_one_batch(self):
+        self.read(self.posts[0], 3)  # the last two come from the render cache
+        self.assertFalse(PostReads.objects.exists())
+
+        self.assertEqual(reads.flush(), 3)
+        self.assertEqual(PostReads.objects.get().count, 3)
+        self.read(self.posts[0])
+        reads.flush()
+        self.assertEqual(PostReads.objects.get().count, 4)
+        self.assertEqual(UserStats.objects.get(user=self.author).total_reads, 4)
+
+    def test_a_retried_batch_is_not_counted_twice(self):
+        batch = {(self.posts[0].pk, timezone.localdate()): 5}
+        self.assertEqual(reads.apply_batch("8f9c2f4e-0d7a-4c52-9a55-3ff0e6a1b001", batch), 5)
+        self.assertEqual(reads.apply_batch("8f9c2f4e-0d7a-4c52-9a55-3ff0e6a1b001", batch), 0)
+        self.assertEqual(PostReads.objects.get().count, 5)
+
+    def test_failed_flush_keeps_its_batch_for_the_retry(self):
+        self.read(self.posts[0], 2)
+        with mock.patch.object(reads, "apply_batch", side_effect=reads.DatabaseError), \
+                self.assertLogs("posts.reads", "ERROR"):
+            self.assertEqual(reads.flush(), 0)
+        self.read(self.posts[1])
+        self.assertEqual(reads.flush(), 3)
+        self.assertEqual(
+            dict(PostReads.objects.values_list("post_id", "count")),
+            {self.posts[0].pk: 2, self.posts[1].pk: 1},
+        )
+
+    def test_index_features_the_most_read_posts(self):
+        oldest, second = self.posts[0], self.posts[1]
+        self.read(second, 2)
+        self.read(oldest, 3)
+        reads.flush()
+        self.assertEqual(reads.most_read_ids(), [oldest.pk, second.pk])
+
+        featured = self.client.get(reverse("index")).context["object_list"]
+        self.assertEqual(
+            [post.pk for post in featured],
+            [oldest.pk, second.pk, self.posts[5].pk, self.posts[4].pk],
+        )
+
+    def test_a_worker_without_the_ranking_counts_it_itself(self):
+        today = timezone.localdate()
+        PostReads.objects.create(post=self.posts[2], day=today, count=4)
+        PostReads.objects.create(post=self.posts[3], day=today, count=9)
+        cache.clear()
+        self.assertEqual(reads.most_read_ids(), [self.posts[3].pk, self.posts[2].pk])
+        self.assertEqual(cache.get(reads.RANKING_KEY), [self.posts[3].pk, self.posts[2].pk])
+
+    def test_a_new_featured_post_invalidates_the_cached_home_page(self):
+        self.read(self.posts[0])
+        reads.flush()
+        self.assertEqual(self.client.get(reverse("index"))["X-Render-Cache"], "miss")
+        self.assertEqual(self.client.get(reverse("index"))["X-Render-Cache"], "hit")
+
+        self.read(self.posts[1], 2)
+        reads.flush()
+        response = self.client.get(reverse("index"))
+        self.assertEqual(response["X-Render-Cache"], "miss")
+        self.assertEqual(response.context["object_list"][0].pk, self.posts[1].pk)
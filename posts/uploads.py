@@ -0,0 +1,312 @@
+"""
+Editor image uploads, checked while the bytes arrive.
+
+``ImageUploadHandler`` sits in front of Django's temporary-file handler for
+single-request uploads: it sniffs the file's first bytes and counts the rest,
+and halts the request as soon as the upload is not an image or grows past
+``EDITOR_UPLOAD_MAX_SIZE``. Nothing is held in memory beyond one chunk.
+
+Bigger images use a resumable chunked upload (``ChunkedUpload``): the client
+declares the size, then PUTs ranges of at most ``EDITOR_UPLOAD_CHUNK_SIZE``
+bytes that are written straight to a staging file. The staging file's size is
+the upload offset, so a client that lost its connection asks for the offset
+and carries on from there, even across a server restart.
+"""
+
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.utils import timezone
+from PIL import Image
+
+from .models import UploadedImage, post_upload_path
+
+# Enough of the header to tell every accepted format apart
+SNIFF_BYTES = 16
+READ_SIZE = 64 * 1024
+# Room for the multipart boundaries, headers and CSRF field around the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class UploadRejected(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def max_upload_size():
+    return getattr(settings, "EDITOR_UPLOAD_MAX_SIZE", 10 * 1024 * 1024)
+
+
+def max_chunked_size():
+    return getattr(settings, "EDITOR_UPLOAD_CHUNKED_MAX_SIZE", 50 * 1024 * 1024)
+
+
+def chunk_size():
+    return getattr(settings, "EDITOR_UPLOAD_CHUNK_SIZE", 2 * 1024 * 1024)
+
+
+def content_length(request):
+    try:
+        return int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return 0
+
+
+# ==========================
+# SNIFFING
+# ==========================
+
+def sniff_image(head):
+    """File extension for the image format ``head`` starts with, or None."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis"):
+        return "avif"
+    return None
+
+
+def store_image(file, user=None):
+    """Check ``file`` is a whole image and store it as an editor upload."""
+    extension = sniff_image(file.read(SNIFF_BYTES))
+    if extension is None:
+        raise UploadRejected("Unsupported image type", 415)
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            image.verify()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise UploadRejected("The image is damaged or too large to decode", 415)
+    file.seek(0)
+
+    # Stored once per distinct content; a re-upload gets the existing URL
+    # (and variants) back. Resized variants follow in the background.
+    storage = UploadedImage._meta.get_field("file").storage
+    name = storage.save(post_upload_path(None, f"image.{extension}"), file)
+    upload, created = UploadedImage.objects.get_or_create(
+        file=name,
+        defaults={"uploaded_by": user if user is not None and user.is_authenticated else None},
+    )
+    if not created:
+        # Pasted into a draft again: give it a fresh grace period in gc_media
+        upload.created_at = timezone.now()
+        UploadedImage.objects.filter(pk=upload.pk).update(created_at=upload.created_at)
+    return upload
+
+
+# ==========================
+# SINGLE-REQUEST UPLOADS
+# ==========================
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Validates each file while it streams in and passes the bytes on to the
+    next handler. On bad input the upload stops without reading the rest of
+    the body; ``error`` then holds the UploadRejected for the view.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = max_upload_size()
+        self.error = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.head = b""
+
+    def reject(self, message, status):
+        self.error = UploadRejected(message, status)
+        raise StopUpload(connection_reset=True)
+
+    def check_head(self):
+        if sniff_image(self.head) is None:
+            self.reject("Unsupported image type", 415)
+        self.head = None
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.reject("Image is too large", 413)
+        if self.head is not None:
+            self.head += raw_data[:SNIFF_BYTES]
+            if len(self.head) >= SNIFF_BYTES:
+                self.check_head()
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.head is not None:
+            self.check_head()
+        return None
+
+
+# ==========================
+# RESUMABLE CHUNKED UPLOADS
+# ==========================
+
+def staging_dir():
+    default = os.path.join(settings.FILE_UPLOAD_TEMP_DIR or tempfile.gettempdir(), "editor-uploads")
+    return getattr(settings, "EDITOR_UPLOAD_STAGING_DIR", default)
+
+
+def parse_content_range(request, total):
+    """(start, length) of the chunk a PUT carries, checked against the upload."""
+    match = CONTENT_RANGE_RE.match(request.headers.get("Content-Range", ""))
+    if not match:
+        raise UploadRejected("Content-Range: bytes <start>-<end>/<size> is required")
+    start, end, size = (int(value) for value in match.groups())
+    length = end - start + 1
+    if size != total or length < 1 or end >= total:
+        raise UploadRejected("Content-Range does not fit this upload", 416)
+    if length > chunk_size():
+        raise UploadRejected("Chunk is too large", 413)
+    if length != content_length(request):
+        raise UploadRejected("Content-Length does not match Content-Range")
+    return start, length
+
+
+def _read_exactly(stream, size):
+    data = b""
+    while len(data) < size:
+        more = stream.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+
+class ChunkedUpload:
+    """
+    An upload in progress: ``<id>.part`` holds the bytes received so far and
+    ``<id>.json`` who is uploading what.
+    """
+
+    def __init__(self, upload_id, meta):
+        self.id = upload_id
+        self.meta = meta
+        base = os.path.join(staging_dir(), upload_id)
+        self.part_path = f"{base}.part"
+        self.meta_path = f"{base}.json"
+
+    @property
+    def size(self):
+        return self.meta["size"]
+
+    @property
+    def offset(self):
+        try:
+            return os.path.getsize(self.part_path)
+        except FileNotFoundError:
+            return 0
+
+    @classmethod
+    def start(cls, user, size):
+        if size < 1:
+            raise UploadRejected("Upload size must be positive")
+        if size > max_chunked_size():
+            raise UploadRejected("Image is too large", 413)
+
+        os.makedirs(staging_dir(), exist_ok=True)
+        upload = cls(str(uuid.uuid4()), {"user": user.pk, "size": size})
+        open(upload.part_path, "xb").close()
+        with open(upload.meta_path, "x") as meta:
+            json.dump(upload.meta, meta)
+        return upload
+
+    @classmethod
+    def load(cls, upload_id, user):
+        """The upload ``user`` started as ``upload_id``, or None."""
+        upload = cls(upload_id, {})
+        try:
+            with open(upload.meta_path) as meta:
+                upload.meta = json.load(meta)
+        except (FileNotFoundError, ValueError):
+            return None
+        if upload.meta.get("user") != user.pk:
+            return None
+        return upload
+
+    def write(self, start, stream, length):
+        """
+        Write ``length`` bytes from ``stream`` at ``start``. Chunks may repeat
+        (a retry rewrites the same bytes) but not skip ahead of the offset.
+        Returns the stored UploadedImage once the last byte has arrived.
+        """
+        if start > self.offset:
+            raise UploadRejected("Chunk is ahead of the upload offset", 409)
+
+        with open(self.part_path, "r+b") as part:
+            part.seek(start)
+            remaining = length
+            if start == 0:
+                head = _read_exactly(stream, min(SNIFF_BYTES, length))
+                if sniff_image(head) is None:
+                    self.discard()
+                    raise UploadRejected("Unsupported image type", 415)
+                part.write(head)
+                remaining -= len(head)
+            while remaining:
+                data = stream.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                part.write(data)
+                remaining -= len(data)
+
+        if self.offset < self.size:
+            return None
+        return self.finish()
+
+    def finish(self):
+        user = User.objects.filter(pk=self.meta["user"]).first()
+        try:
+            with open(self.part_path, "rb") as part:
+                return store_image(File(part), user)
+        except FileNotFoundError:
+            # A concurrent retry of the last chunk finished it first
+            raise UploadRejected("Unknown upload", 404)
+        finally:
+            self.discard()
+
+    def discard(self):
+        for path in (self.part_path, self.meta_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def purge_stale_uploads(max_age):
+    """Remove chunked uploads untouched for ``max_age`` seconds. Returns how many."""
+    directory = staging_dir()
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - max_age
+    purged = 0
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        upload = ChunkedUpload(name[:-len(".json")], {})
+        touched = max(
+            os.path.getmtime(path) for path in (upload.part_path, upload.meta_path)
+            if os.path.exists(path)
+        )
+        if touched < cutoff:
+            upload.discard()
+            purged += 1
+    return purged
@@ -1,12 +1,8 @@
 # posts/views.py
 
-import os
-import uuid
-import math
 import json
 from functools import wraps
 
-from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import (
     authenticate,
@@ -16,30 +12,24 @@ from django.contrib.auth import (
 )
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import Q
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import JsonResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect, reverse
 from django.template.loader import render_to_string
-from django.utils.html import strip_tags
-from django.views.decorators.cache import never_cache
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
-
-import openai
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import condition, require_http_methods, require_POST
 
+from . import ai, uploads
+from .cache import cache_anonymous_page, cached_fragment
 from .forms import CommentForm, PostCreateForm
 from .models import Post, Profile, Comment, Category, Tag
-
-# ============================================================
-# OPENAI CONFIG (uses .env -> settings.OPENAI_API_KEY)
-# ============================================================
-
-openai.api_key = os.getenv("OPENAI_API_KEY") or getattr(
-    settings, "OPENAI_API_KEY", None
-)
-
+from .pagination import CursorPage, KeysetPaginator
+from .reads import counts_reads, most_read_ids
+from .search import search_page
+from .stats import stats_for
+from .suggest import current_version as current_tag_version, suggest_tags
 
 # ============================================================
 # PERMISSION HELPERS
@@ -89,26 +79,6 @@ def paginate_queryset(request, queryset, per_page=8):
         return paginator.page(paginator.num_pages)
 
 
-def calculate_reading_time_from_html(html_content: str) -> int:
-    """Estimate reading time from HTML content."""
-    text = strip_tags(html_content or "").strip()
-    words = len([w for w in text.split() if w])
-    return max(1, math.ceil(words / 200)) if words else 1
-
-
-def generate_unique_slug(base_title: str) -> str:
-    """Generate a unique slug from a title."""
-    from django.utils.text import slugify
-
-    base_slug = slugify(base_title) or "post"
-    slug = base_slug
-    idx = 1
-    while Post.objects.filter(slug=slug).exists():
-        slug = f"{base_slug}-{idx}"
-        idx += 1
-    return slug
-
-
 def ensure_tags_from_payload(existing_ids_str: str, new_tags_str: str):
     """
     Build a list of Tag instances from:
@@ -116,39 +86,14 @@ def ensure_tags_from_payload(existing_ids_str: str, new_tags_str: str):
       - CSV of new tag names (hidden: name="new_tags")
     Used with your Medium-style tag manager.
     """
-    tags = []
-
-    # Existing tag IDs
-    if existing_ids_str:
-        try:
-            ids = [int(pk) for pk in existing_ids_str.split(",") if pk.strip()]
-            tags.extend(list(Tag.objects.filter(id__in=ids)))
-        except ValueError:
-            # If parsing fails, just ignore bad IDs
-            pass
-
-    # New tag names
-    from django.utils.text import slugify
-
-    if new_tags_str:
-        for raw in new_tags_str.split(","):
-            name = raw.strip()
-            if not name:
-                continue
-            tag, _ = Tag.objects.get_or_create(
-                name=name,
-                defaults={"slug": slugify(name)[:100]},
-            )
-            tags.append(tag)
+    ids = []
+    for pk in (existing_ids_str or "").split(","):
+        # Ignore anything that is not an id
+        if pk.strip().isdigit():
+            ids.append(int(pk))
 
-    # Remove duplicates while preserving order
-    seen = set()
-    unique = []
-    for t in tags:
-        if t.id not in seen:
-            seen.add(t.id)
-            unique.append(t)
-    return unique
+    names = (new_tags_str or "").split(",")
+    return Tag.objects.resolve(ids=ids, names=names)
 
 
 def _json_body(request):
@@ -162,23 +107,37 @@ def _json_body(request):
 # USER PROFILE / EDIT / PASSWORD / DASHBOARD
 # ============================================================
 
+TIMELINE_PAGE_SIZE = 10
+
+
+def _timeline_posts(user):
+    return Post.objects.filter(author=user).cards().order_by("-created_at", "-id")
+
+
+def _timeline_comments(user):
+    return (
+        Comment.objects.filter(user=user)
+        .select_related("post")
+        .only("id", "body", "created_on", "post__id", "post__title")
+        .order_by("-created_on", "-id")
+    )
+
+
 @login_required
 @never_cache
 def profile(request, username):
     user_obj = get_object_or_404(User, username=username)
     profile_obj, _ = Profile.objects.get_or_create(user=user_obj)
 
-    posts = Post.objects.filter(author=user_obj).order_by("-created_at")
-    comments = Comment.objects.filter(user=user_obj).order_by("-created_on")
-
     return render(
         request,
         "profile.html",
         {
             "user_obj": user_obj,
             "profile": profile_obj,
-            "posts": posts,
-            "comments": comments,
+            "stats": stats_for(user_obj),
+            "posts": _timeline_posts(user_obj)[:3],
+            "comments": _timeline_comments(user_obj)[:3],
         },
     )
 
@@ -287,9 +246,15 @@ def change_password(request, username):
 def dashboard(request):
     user = request.user
     profile_obj, _ = Profile.objects.get_or_create(user=user)
+    user.profile = profile_obj  # the header's avatar reuses it
 
-    posts = Post.objects.filter(author=user).order_by("-created_at")
-    comments = Comment.objects.filter(user=user).order_by("-created_on")
+    # Counters come from one stats row; the timeline is paged by cursor
+    posts = KeysetPaginator(
+        _timeline_posts(user), ("-created_at", "-id"), per_page=TIMELINE_PAGE_SIZE
+    ).page(request.GET.get("posts"))
+    comments = KeysetPaginator(
+        _timeline_comments(user), ("-created_on", "-id"), per_page=TIMELINE_PAGE_SIZE
+    ).page(request.GET.get("comments"))
 
     return render(
         request,
@@ -297,6 +262,7 @@ def dashboard(request):
         {
             "user": user,
             "profile": profile_obj,
+            "stats": stats_for(user),
             "posts": posts,
             "comments": comments,
         },
@@ -374,10 +340,26 @@ def custom_logout(request):
 #  INDEX PAGE (Homepage)
 # ============================================================
 
+def _featured_posts(latest, count=4):
+    """The most read posts lately, topped up from ``latest`` when there are too few."""
+    ids = most_read_ids(count)
+    by_id = {post.pk: post for post in latest}
+    missing = [pk for pk in ids if pk not in by_id]
+    if missing:
+        by_id.update(Post.objects.published().cards().in_bulk(missing))
+
+    featured = [by_id[pk] for pk in ids if pk in by_id]
+    featured += [post for post in latest if post not in featured][: count - len(featured)]
+    return featured
+
+
 @never_cache
+@cache_anonymous_page
 def index(request):
-    featured = Post.objects.filter(status="published").order_by("-created_at")[:4]
-    latest = Post.objects.filter(status="published").order_by("-created_at")[:8]
+    latest = list(
+        Post.objects.published().cards().order_by("-created_at")[:8]
+    )
+    featured = _featured_posts(latest)
 
     # Use your team profiles on homepage
     main_team = Profile.objects.filter(show_in_team=True)[:4]
@@ -398,8 +380,9 @@ def index(request):
 # ============================================================
 
 @never_cache
+@cache_anonymous_page
 def allblogs(request):
-    post_list = Post.objects.filter(status="published").order_by("-created_at")
+    post_list = Post.objects.published().cards().order_by("-created_at")
 
     # CATEGORY FILTER
     active_category = request.GET.get("category")
@@ -408,20 +391,32 @@ def allblogs(request):
     if cleaned_category and cleaned_category != "all":
         post_list = post_list.filter(category__name__iexact=cleaned_category)
 
-    paginated_queryset = paginate_queryset(request, post_list, per_page=8)
-
-    # AJAX INFINITE SCROLL HANDLER
+    # AJAX INFINITE SCROLL HANDLER (keyset pages: no COUNT, no OFFSET)
     if request.headers.get("x-requested-with") == "XMLHttpRequest":
-        html = render_to_string(
-            "components/blog_cards.html", {"queryset": paginated_queryset}, request=request
-        )
-        return JsonResponse(
-            {
-                "html": html,
-                "has_next": paginated_queryset.has_next(),
+        cursor = request.GET.get("cursor")
+
+        def build_cards():
+            cursor_page = KeysetPaginator(post_list, per_page=8).page(cursor)
+            return {
+                "html": render_to_string(
+                    "components/blog_cards.html", {"queryset": cursor_page}
+                ),
+                "has_next": cursor_page.has_next(),
+                "next_cursor": cursor_page.next_cursor,
             }
+
+        # The cards are the same for every reader, so this is shared with logged-in users too
+        return JsonResponse(
+            cached_fragment("blog_cards", [cleaned_category or "all", cursor], build_cards)
         )
 
+    paginated_queryset = paginate_queryset(request, post_list, per_page=8)
+
+    # Hand-off point for infinite scroll: the cursor after the last card shown
+    next_cursor = None
+    if paginated_queryset.has_next():
+        next_cursor = KeysetPaginator(post_list).cursor_for(paginated_queryset[-1])
+
     if cleaned_category and cleaned_category != "all":
         breadcrumb_title = f"Category: {cleaned_category.title()}"
     else:
@@ -436,6 +431,7 @@ def allblogs(request):
             "active_category": cleaned_category,
             "breadcrumb_title": breadcrumb_title,
             "page_request_var": "page",
+            "next_cursor": next_cursor,
         },
     )
 
@@ -445,22 +441,12 @@ def allblogs(request):
 # ============================================================
 
 @never_cache
+@counts_reads
+@cache_anonymous_page
 def singleblog(request, id):
-    post = get_object_or_404(Post, id=id)
-    comments = post.comments.filter(active=True)
-
-    # Previous Post (newer)
-    previous_post = (
-        Post.objects.filter(status="published", created_at__gt=post.created_at)
-        .order_by("created_at")
-        .first()
-    )
-
-    # Next Post (older)
-    next_post = (
-        Post.objects.filter(status="published", created_at__lt=post.created_at)
-        .order_by("-created_at")
-        .first()
+    # Post, author, category and both neighbour ids in one query
+    post = get_object_or_404(
+        Post.objects.select_related("author", "category").with_neighbor_ids(), id=id
     )
 
     new_comment = None
@@ -480,6 +466,11 @@ def singleblog(request, id):
     else:
         form = CommentForm()
 
+    previous_post, next_post = post.neighbors()
+    comments = list(
+        post.comments.filter(active=True).select_related("user", "user__profile")
+    )
+
     breadcrumb_title = post.title
     breadcrumb_category = (
         post.category.name if hasattr(post, "category") and post.category else None
@@ -509,14 +500,19 @@ def singleblog(request, id):
 def search(request):
     query = request.GET.get("q", "").strip()
 
+    # Ranked ids come from the full-text index, one keyset page at a time;
+    # only the posts on that page are loaded.
     if query:
-        queryset = Post.objects.filter(status="published").filter(
-            Q(title__icontains=query) | Q(content__icontains=query)
-        ).distinct()
+        paginated_queryset = search_page(query, per_page=8, cursor=request.GET.get("cursor"))
     else:
-        queryset = Post.objects.none()
+        paginated_queryset = CursorPage([])
 
-    paginated_queryset = paginate_queryset(request, queryset, per_page=8)
+    posts_by_id = Post.objects.published().cards().in_bulk(
+        paginated_queryset.object_list
+    )
+    paginated_queryset.object_list = [
+        posts_by_id[pk] for pk in paginated_queryset.object_list if pk in posts_by_id
+    ]
 
     breadcrumb_title = (
         f"Search Results for: '{query}'" if query else "Search Results"
@@ -529,7 +525,6 @@ def search(request):
             "queryset": paginated_queryset,
             "query": query,
             "breadcrumb_title": breadcrumb_title,
-            "page_request_var": "page",
         },
     )
 
@@ -538,99 +533,72 @@ def search(request):
 # AI ENDPOINTS (WRITE / IMPROVE / FIX)
 # ============================================================
 
-@login_required
-@require_POST
-def ai_write(request):
+async def _ai_stream(request, kind, field):
     """
-    Draft from title: expects JSON { "prompt": "..." }
-    Returns: { "result": "<p>...</p>" }
+    Shared body of the AI endpoints: validate, then stream the answer back as
+    server-sent events (cached, shared with an identical running request, or
+    freshly generated under a concurrency slot).
     """
     data = _json_body(request)
     if data is None:
         return HttpResponseBadRequest("Invalid JSON")
 
-    prompt = (data.get("prompt") or "").strip()
-    if not prompt:
-        return JsonResponse({"error": "No prompt provided."}, status=400)
-
-    full_prompt = (
-        "Write a detailed, engaging blog article section in HTML. "
-        "Use <p>, <h2>, <h3>, and <ul>/<li> where helpful. "
-        "Do NOT include <html> or <body> tags.\n\n"
-        f"Title: {prompt}"
-    )
+    text = (data.get(field) or "").strip()
+    if not text:
+        return JsonResponse({"error": f"No {field} provided."}, status=400)
 
-    completion = openai.ChatCompletion.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": full_prompt}],
-    )
-    text = completion["choices"][0]["message"]["content"]
+    user = await request.auser()
+    try:
+        events = await ai.open_stream(kind, text, user.pk, chunked=bool(data.get("chunked")))
+    except ai.AIBusy as exc:
+        return JsonResponse({"error": str(exc)}, status=429)
 
-    return JsonResponse({"result": text})
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
 @login_required
 @require_POST
-def ai_improve(request):
+async def ai_write(request):
     """
-    Improve writing: expects JSON { "content": "<html...>" }
+    Draft from title: expects JSON { "prompt": "..." }
+    Streams: "delta" events { "text": "<p>..." }, then "done" or "error"
     """
-    data = _json_body(request)
-    if data is None:
-        return HttpResponseBadRequest("Invalid JSON")
-
-    content = (data.get("content") or "").strip()
-    if not content:
-        return JsonResponse({"error": "No content provided."}, status=400)
-
-    prompt = (
-        "Improve the following blog post HTML for clarity, structure, and tone. "
-        "Keep the same structure and return HTML only (no <html> or <body> tags):\n\n"
-        f"{content}"
-    )
-
-    completion = openai.ChatCompletion.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-    )
-    text = completion["choices"][0]["message"]["content"]
-
-    return JsonResponse({"result": text})
+    return await _ai_stream(request, "write", "prompt")
 
 
 @login_required
 @require_POST
-def ai_fix(request):
+async def ai_improve(request):
     """
-    Fix grammar: expects JSON { "content": "<html...>" }
+    Improve writing: expects JSON { "content": "<html...>" }
     """
-    data = _json_body(request)
-    if data is None:
-        return HttpResponseBadRequest("Invalid JSON")
-
-    content = (data.get("content") or "").strip()
-    if not content:
-        return JsonResponse({"error": "No content provided."}, status=400)
-
-    prompt = (
-        "Fix grammar, punctuation, and typos in the following blog HTML. "
-        "Do NOT change meaning. Return HTML only (no <html> or <body> tags):\n\n"
-        f"{content}"
-    )
+    return await _ai_stream(request, "improve", "content")
 
-    completion = openai.ChatCompletion.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-    )
-    text = completion["choices"][0]["message"]["content"]
 
-    return JsonResponse({"result": text})
+@login_required
+@require_POST
+async def ai_fix(request):
+    """
+    Fix grammar: expects JSON { "content": "<html...>", "chunked": true }
+    With "chunked", paragraphs are fixed (and cached) one by one.
+    """
+    return await _ai_stream(request, "fix", "content")
 
 
 # ============================================================
 # TAG SUGGEST API (for tag autocomplete)
 # ============================================================
 
+def _tag_suggest_etag(request):
+    # Same URL + same tag version = same answer
+    return f"tags-{current_tag_version()}"
+
+
+@cache_control(max_age=60)
+@condition(etag_func=_tag_suggest_etag)
 def tag_suggest(request):
     """
     GET /tags/suggest/?q=travel
@@ -640,9 +608,7 @@ def tag_suggest(request):
     if not q:
         return JsonResponse({"results": []})
 
-    tags = Tag.objects.filter(name__icontains=q).order_by("name")[:15]
-    data = [{"id": t.id, "name": t.name} for t in tags]
-    return JsonResponse({"results": data})
+    return JsonResponse({"results": suggest_tags(q)})
 
 
 # ============================================================
@@ -679,12 +645,8 @@ def create_post(request):
 
             # Category: existing or create new
             if not category_obj and new_category_name:
-                from django.utils.text import slugify
-
-                category_obj, _ = Category.objects.get_or_create(
-                    name=new_category_name,
-                    defaults={"slug": slugify(new_category_name)},
-                )
+                # Slug is allocated in Category.save
+                category_obj, _ = Category.objects.get_or_create(name=new_category_name)
 
             # Build post instance
             post = Post(
@@ -697,24 +659,13 @@ def create_post(request):
                 category=category_obj,
             )
 
-            # Reading time
-            post.read_time = calculate_reading_time_from_html(content_html)
-
-            # Auto slug
-            post.slug = generate_unique_slug(title)
+            # Slug is allocated in Post.save
 
-            # SEO defaults
-            if not meta_title:
-                post.meta_title = (title or "")[:70]
-            else:
-                post.meta_title = meta_title
-
-            if not meta_description:
-                plain = strip_tags(content_html or "").strip()
-                post.meta_description = plain[:175]
-            else:
-                post.meta_description = meta_description
+            # SEO (blank values fall back to title / plain text in Post.save)
+            post.meta_title = meta_title
+            post.meta_description = meta_description
 
+            # Read time, excerpt and word count are derived in Post.save
             post.save()
 
             # Tags from hidden fields (CSV)
@@ -724,10 +675,9 @@ def create_post(request):
             tag_objects = ensure_tags_from_payload(
                 existing_tag_ids_str, new_tags_str
             )
+            # A new post has no tags yet, so there is nothing to diff against
             if tag_objects:
-                post.tags.set(tag_objects)
-            else:
-                post.tags.clear()
+                post.tags.add(*tag_objects)
 
             messages.success(request, "Post created successfully!")
             return redirect("singleblog", id=post.id)
@@ -773,12 +723,8 @@ def edit_post(request, post):
             new_category_name = (cleaned.get("new_category") or "").strip()
 
             if not category_obj and new_category_name:
-                from django.utils.text import slugify
-
-                category_obj, _ = Category.objects.get_or_create(
-                    name=new_category_name,
-                    defaults={"slug": slugify(new_category_name)},
-                )
+                # Slug is allocated in Category.save
+                category_obj, _ = Category.objects.get_or_create(name=new_category_name)
 
             post.title = title
             post.content = content_html
@@ -787,25 +733,13 @@ def edit_post(request, post):
             post.publish_at = cleaned.get("publish_at")
             post.category = category_obj
 
-            # Reading time
-            post.read_time = calculate_reading_time_from_html(content_html)
+            # Slug stays the same; Post.save fills it in if missing
 
-            # Slug stays same unless missing
-            if not post.slug:
-                post.slug = generate_unique_slug(title)
-
-            # SEO defaults
-            if not meta_title:
-                post.meta_title = (title or "")[:70]
-            else:
-                post.meta_title = meta_title
-
-            if not meta_description:
-                plain = strip_tags(content_html or "").strip()
-                post.meta_description = plain[:175]
-            else:
-                post.meta_description = meta_description
+            # SEO (blank values fall back to title / plain text in Post.save)
+            post.meta_title = meta_title
+            post.meta_description = meta_description
 
+            # Read time, excerpt and word count are derived in Post.save
             post.save()
 
             # Tags
@@ -865,12 +799,14 @@ def videos(request):
 
 
 @never_cache
+@cache_anonymous_page
 def ourteam(request):
     team_list = Profile.objects.filter(show_in_team=True)
     return render(request, "ourteam.html", {"team_list": team_list})
 
 
 @never_cache
+@cache_anonymous_page
 def resume(request, id):
     member = get_object_or_404(Profile, id=id)
 
@@ -894,23 +830,87 @@ def resume(request, id):
 # QUILL IMAGE UPLOAD ENDPOINT
 # ============================================================
 
+def _upload_error(error, **extra):
+    return JsonResponse({"success": 0, "error": str(error), **extra}, status=error.status)
+
+
 @csrf_exempt
 def editor_image_upload(request):
-    if request.method == "POST" and request.FILES.get("image"):
-        image = request.FILES["image"]
+    # Upload handlers can only be swapped before anything reads the body,
+    # the CSRF check included, so that check runs in the inner view.
+    if uploads.content_length(request) > uploads.max_upload_size() + uploads.MULTIPART_OVERHEAD:
+        return _upload_error(uploads.UploadRejected("Image is too large", 413))
+    request.upload_handlers = [
+        uploads.ImageUploadHandler(request),
+        TemporaryFileUploadHandler(request),
+    ]
+    return _editor_image_upload(request)
+
+
+@csrf_protect
+def _editor_image_upload(request):
+    checker = request.upload_handlers[0]
+    image = request.FILES.get("image") if request.method == "POST" else None
+    if checker.error:
+        return _upload_error(checker.error)
+    if image is None:
+        return JsonResponse({"success": 0, "error": "No image uploaded"})
 
-        # unique filename
-        ext = image.name.split(".")[-1]
-        filename = f"{uuid.uuid4()}.{ext}"
+    try:
+        upload = uploads.store_image(image, request.user)
+    except uploads.UploadRejected as error:
+        return _upload_error(error)
+    return JsonResponse({"success": 1, "url": upload.file.url})
 
-        file_path = os.path.join("posts/uploads/", filename)
-        saved_path = default_storage.save(file_path, image)
 
-        return JsonResponse(
-            {
-                "success": 1,
-                "url": settings.MEDIA_URL + saved_path,
-            }
-        )
+@login_required
+@require_POST
+def editor_upload_start(request):
+    """Begin a resumable upload: ``{"size": <bytes>}`` -> upload id and chunk size."""
+    try:
+        size = int(json.loads(request.body)["size"])
+    except (ValueError, KeyError, TypeError):
+        return _upload_error(uploads.UploadRejected("Expected JSON with the upload size"))
+
+    try:
+        upload = uploads.ChunkedUpload.start(request.user, size)
+    except uploads.UploadRejected as error:
+        return _upload_error(error)
+
+    return JsonResponse(
+        {
+            "success": 1,
+            "upload_id": upload.id,
+            "chunk_size": uploads.chunk_size(),
+            "offset": 0,
+        },
+        status=201,
+    )
 
-    return JsonResponse({"success": 0, "error": "No image uploaded"})
+
+@login_required
+@require_http_methods(["GET", "PUT", "DELETE"])
+def editor_upload_chunk(request, upload_id):
+    """
+    GET reports the offset to resume from, PUT stores the chunk given by its
+    Content-Range and DELETE abandons the upload. The PUT carrying the last
+    byte answers with the image URL.
+    """
+    upload = uploads.ChunkedUpload.load(str(upload_id), request.user)
+    if upload is None:
+        return _upload_error(uploads.UploadRejected("Unknown upload", 404))
+
+    if request.method == "DELETE":
+        upload.discard()
+        return JsonResponse({"success": 1})
+
+    if request.method == "PUT":
+        try:
+            start, length = uploads.parse_content_range(request, upload.size)
+            stored = upload.write(start, request, length)
+        except uploads.UploadRejected as error:
+            return _upload_error(error, offset=upload.offset)
+        if stored is not None:
+            return JsonResponse({"success": 1, "url": stored.file.url})
+
+    return JsonResponse({"success": 1, "offset": upload.offset, "size": upload.size})
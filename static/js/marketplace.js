@@ -0,0 +1,67 @@
+// ============================================================
+// MARKETPLACE INFINITE SCROLL
+// ============================================================
+// The "More businesses" link keeps working without JS; with it, the next
+// page of cards is fetched as JSON from business_cards as the pager comes
+// into view, and the pager follows the returned cursor. A failed request
+// leaves the cursor (and the link) where it was.
+document.addEventListener("DOMContentLoaded", function () {
+
+    const grid = document.querySelector(".market-grid");
+    const pager = document.querySelector(".market-pager[data-cards-url]");
+
+    if (!grid || !pager || !("IntersectionObserver" in window)) return;
+
+    let nextUrl = new URL(pager.dataset.cardsUrl, window.location.href);
+    let loading = false;
+    const PRELOAD_MARGIN = 300;
+
+    // The observer only fires on changes, so a page that did not push the
+    // pager out of reach would otherwise stall the scroll
+    function pagerNearViewport() {
+        return pager.getBoundingClientRect().top < window.innerHeight + PRELOAD_MARGIN;
+    }
+
+    function loadMoreBusinesses() {
+        if (loading || !nextUrl) return;
+        loading = true;
+
+        fetch(nextUrl, {headers: {"X-Requested-With": "XMLHttpRequest"}})
+            .then(res => {
+                if (!res.ok) throw new Error(`business cards: HTTP ${res.status}`);
+                return res.json();
+            })
+            .then(data => {
+                grid.insertAdjacentHTML("beforeend", data.html);
+
+                if (data.has_next) {
+                    nextUrl.searchParams.set("cursor", data.next_cursor);
+                    const link = pager.querySelector(".market-pager-next");
+                    if (link) {
+                        const pageUrl = new URL(link.href);
+                        pageUrl.searchParams.set("cursor", data.next_cursor);
+                        link.href = pageUrl;
+                    }
+                } else {
+                    nextUrl = null;
+                    observer.disconnect();
+                    pager.querySelector(".market-pager-next")?.remove();
+                }
+            })
+            .then(() => {
+                loading = false;
+                if (nextUrl && pagerNearViewport()) loadMoreBusinesses();
+            }, err => {
+                loading = false;
+                console.error(err);
+            });
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadMoreBusinesses();
+        }
+    }, {rootMargin: `${PRELOAD_MARGIN}px`});
+
+    observer.observe(pager);
+});
@@ -261,6 +261,24 @@ function setAIStatus(text, error = false) {
     aiStatusEl.classList.toggle("ai-status-error", error);
 }
 
+/* Parse a server-sent events buffer; returns [events, leftover] */
+function parseSSE(buffer) {
+    const events = [];
+    const blocks = buffer.split("\n\n");
+    const leftover = blocks.pop();
+
+    blocks.forEach(block => {
+        let event = "message";
+        let data = "";
+        block.split("\n").forEach(line => {
+            if (line.startsWith("event: ")) event = line.slice(7);
+            else if (line.startsWith("data: ")) data += line.slice(6);
+        });
+        events.push({event, data: data ? JSON.parse(data) : {}});
+    });
+    return [events, leftover];
+}
+
 async function aiCall(url, payload, mode) {
     try {
         setAIStatus("Thinking…");
@@ -274,18 +292,45 @@ async function aiCall(url, payload, mode) {
             body: JSON.stringify(payload)
         });
 
-        const data = await res.json();
+        if (!res.ok) {
+            const data = await res.json().catch(() => ({}));
+            setAIStatus(data.error || "AI error", true);
+            return;
+        }
+
+        // Tokens arrive as "delta" events; show them as they come in
+        const base = mode === "append" ? editor.root.innerHTML : "";
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        let result = "";
+        let finished = false;
+
+        setAIStatus("Writing…");
+        while (!finished) {
+            const {value, done} = await reader.read();
+            if (done) break;
+
+            let events;
+            [events, buffer] = parseSSE(buffer + decoder.decode(value, {stream: true}));
+            for (const {event, data} of events) {
+                if (event === "delta") {
+                    result += data.text;
+                    editor.root.innerHTML = base + result;
+                } else if (event === "error") {
+                    setAIStatus(data.error || "AI error", true);
+                    return;
+                } else if (event === "done") {
+                    finished = true;
+                }
+            }
+        }
 
-        if (!data.result) {
+        if (!finished || !result) {
             setAIStatus("AI error", true);
             return;
         }
 
-        editor.root.innerHTML =
-            mode === "append"
-                ? editor.root.innerHTML + data.result
-                : data.result;
-
         updateMetrics();
         setAIStatus("Done ✓");
         setTimeout(() => setAIStatus(""), 1500);
@@ -308,7 +353,8 @@ document.getElementById("ai-improve-btn")?.addEventListener("click", () => {
 });
 
 document.getElementById("ai-fix-btn")?.addEventListener("click", () => {
-    aiCall(AI_FIX_URL, {content: editor.root.innerHTML}, "replace");
+    // Paragraph by paragraph: re-fixing an edited post only redoes what changed
+    aiCall(AI_FIX_URL, {content: editor.root.innerHTML, chunked: true}, "replace");
 });
 
 /* =====================================================